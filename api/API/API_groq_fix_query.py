@@ -1,6 +1,8 @@
 import os
+import httpx
 import requests
 import re
+import hashlib
 from dotenv import load_dotenv
 from supabase import create_client, Client
 
@@ -9,6 +11,7 @@ load_dotenv()
 # Groq API - MIỄN PHÍ & CỰC NHANH
 GROQ_FIX_TEXT_API_KEY = os.getenv("GROQ_FIX_TEXT_API_KEY")
 MODEL = "llama-3.3-70b-versatile"  # Model mạnh nhất, free
+GROQ_API_URL = os.getenv("GROQ_API_URL", "https://api.groq.com/openai/v1/chat/completions")
 
 # Supabase
 DATA_BASE_SECRET_KEY_SUPABASE = os.getenv("DATA_BASE_SECRET_KEY_SUPABASE")
@@ -37,6 +40,8 @@ def fetch_product_names():
 
 PRODUCTS = fetch_product_names()
 PRODUCT_SCOPE = ", ".join(PRODUCTS)
+# Version của danh sách sản phẩm gửi cho LLM (sắp xếp để giống nhau giữa các worker)
+PRODUCT_SCOPE_VERSION = hashlib.md5("\n".join(sorted(PRODUCTS)).encode()).hexdigest()[:12]
 
 def looks_like_foreign(text: str):
     """
@@ -46,15 +51,8 @@ def looks_like_foreign(text: str):
                               r"ìíịỉĩòóọỏõôồốộổỗơờớợởỡ"
                               r"ùúụủũưừứựửữỳýỵỷỹđ]", text.lower()))
 
-def groq_fix_query(query: str):
-    """
-    Dùng Groq API (FREE & FAST) để fix query và match products
-    """
-    # Lưu query gốc để so sánh
-    original_query = query
-    
-    url = "https://api.groq.com/openai/v1/chat/completions"
-
+def build_fix_query_request(query: str):
+    """(headers, body) của request gửi Groq, dùng chung cho bản sync và async"""
     if looks_like_foreign(query):
         prompt = (
             f"Extract and match Vietnamese product names from: '{query}'\n\n"
@@ -99,46 +97,63 @@ def groq_fix_query(query: str):
         "temperature": 0.1,
         "max_tokens": 200
     }
+    return headers, data
+
+def parse_fix_query_response(query: str, response):
+    """
+    Lấy query đã sửa từ response của Groq (requests.Response hoặc httpx.Response).
+    Lỗi/response rỗng → trả lại query gốc.
+    """
+    original_query = query
+
+    print(f"🔍 Status: {response.status_code}")
+    
+    if response.status_code != 200:
+        print(f"⚠️ API error {response.status_code}: {response.text}")
+        print(f"📝 Query cũ: '{original_query}' → Query mới: '{original_query}' (không thay đổi)")
+        return query
+    
+    res = response.json()
+    # print(f"🔍 Full response: {res}")  # Comment out để giảm log
+
+    # Groq response structure (OpenAI-compatible)
+    if "choices" not in res or not res["choices"]:
+        print("⚠️ Không có choices trong response")
+        print(f"📝 Query cũ: '{original_query}' → Query mới: '{original_query}' (không thay đổi)")
+        return query
+
+    text = res["choices"][0]["message"]["content"].strip()
+
+    if not text:
+        print("⚠️ Groq trả về text rỗng")
+        print(f"📝 Query cũ: '{original_query}' → Query mới: '{original_query}' (không thay đổi)")
+        return query
+
+    # Làm sạch
+    text = text.replace('"', '').replace('*', '').strip()
+
+    # Xóa prefix nếu có
+    if ":" in text:
+        tmp = text.split(":")[-1].strip()
+        if tmp:
+            text = tmp
+
+    # IN RA SO SÁNH CŨ VÀ MỚI
+    print(f"📝 Query cũ: '{original_query}' → Query mới: '{text}'")
+    
+    return text
+
+def groq_fix_query(query: str):
+    """
+    Dùng Groq API (FREE & FAST) để fix query và match products
+    """
+    # Lưu query gốc để so sánh
+    original_query = query
+    headers, data = build_fix_query_request(query)
 
     try:
-        response = requests.post(url, headers=headers, json=data, timeout=10)
-        
-        print(f"🔍 Status: {response.status_code}")
-        
-        if response.status_code != 200:
-            print(f"⚠️ API error {response.status_code}: {response.text}")
-            print(f"📝 Query cũ: '{original_query}' → Query mới: '{original_query}' (không thay đổi)")
-            return query
-        
-        res = response.json()
-        # print(f"🔍 Full response: {res}")  # Comment out để giảm log
-
-        # Groq response structure (OpenAI-compatible)
-        if "choices" not in res or not res["choices"]:
-            print("⚠️ Không có choices trong response")
-            print(f"📝 Query cũ: '{original_query}' → Query mới: '{original_query}' (không thay đổi)")
-            return query
-
-        text = res["choices"][0]["message"]["content"].strip()
-
-        if not text:
-            print("⚠️ Groq trả về text rỗng")
-            print(f"📝 Query cũ: '{original_query}' → Query mới: '{original_query}' (không thay đổi)")
-            return query
-
-        # Làm sạch
-        text = text.replace('"', '').replace('*', '').strip()
-
-        # Xóa prefix nếu có
-        if ":" in text:
-            tmp = text.split(":")[-1].strip()
-            if tmp:
-                text = tmp
-
-        # IN RA SO SÁNH CŨ VÀ MỚI
-        print(f"📝 Query cũ: '{original_query}' → Query mới: '{text}'")
-        
-        return text
+        response = requests.post(GROQ_API_URL, headers=headers, json=data, timeout=10)
+        return parse_fix_query_response(query, response)
 
     except requests.exceptions.Timeout:
         print(f"⚠️ Timeout - dùng query gốc: {query}")
@@ -150,6 +165,28 @@ def groq_fix_query(query: str):
         print(f"📝 Query cũ: '{original_query}' → Query mới: '{original_query}' (lỗi)")
         return query
 
+async def async_groq_fix_query(query: str, client: httpx.AsyncClient, timeout: float = 10):
+    """
+    Bản async của groq_fix_query (cùng prompt, cùng cách xử lý kết quả).
+    Task bị hủy (hết deadline của request) → request HTTP tới Groq bị ngắt ngay.
+    """
+    original_query = query
+    headers, data = build_fix_query_request(query)
+
+    try:
+        response = await client.post(GROQ_API_URL, headers=headers, json=data, timeout=timeout)
+        return parse_fix_query_response(query, response)
+
+    except httpx.TimeoutException:
+        print(f"⚠️ Timeout - dùng query gốc: {query}")
+        print(f"📝 Query cũ: '{original_query}' → Query mới: '{original_query}' (timeout)")
+        return query
+
+    except Exception as e:
+        print(f"⚠️ Lỗi ({type(e).__name__}): {str(e)}")
+        print(f"📝 Query cũ: '{original_query}' → Query mới: '{original_query}' (lỗi)")
+        return query
+
 
 # Test function
 if __name__ == "__main__":
@@ -1,4 +1,6 @@
+import asyncio
 import os
+import httpx
 import requests
 import base64
 import re
@@ -6,11 +8,14 @@ from dotenv import load_dotenv
 from supabase import create_client, Client
 from difflib import SequenceMatcher
 
+from database.async_fetch_data import fetch_product_names_async
+
 load_dotenv()
 
 # Groq Llama 4 Scout Vision - MODEL MỚI NHẤT 2025
 GROQ_SEARCH_IMAGE_API_KEY = os.getenv("GROQ_SEARCH_IMAGE_API_KEY")
 VISION_MODEL = "meta-llama/llama-4-scout-17b-16e-instruct"  # Llama 4 Scout - Vision model mới nhất
+GROQ_API_URL = os.getenv("GROQ_API_URL", "https://api.groq.com/openai/v1/chat/completions")
 # Các model khác:
 # - "llama-3.2-90b-vision-preview" (Vision 3.2 - 90B)
 # - "llama-3.2-11b-vision-preview" (Vision 3.2 - 11B)
@@ -235,43 +240,9 @@ def clean_detected_text(text: str) -> str:
 
 # ==================== MAIN FUNCTION ====================
 
-def groq_search_product_by_image(image_data: str):
-    """
-    Tìm sản phẩm bằng hình ảnh sử dụng Groq Llama 4 Scout Vision API
-    
-    Args:
-        image_data: URL ảnh, base64 string, hoặc data URL
-    
-    Returns:
-        str: Tên sản phẩm tìm được, hoặc None nếu không tìm thấy
-    """
-    print("\n" + "="*70)
-    print("🚀 GROQ LLAMA 4 SCOUT VISION - PRODUCT SEARCH")
-    print("="*70)
-    
-    # Bước 1: Lấy danh sách sản phẩm
-    print("\n📦 [1/7] Đang lấy danh sách sản phẩm từ Supabase...")
-    products = fetch_product_names()
-    
-    if not products:
-        print("❌ Danh sách sản phẩm rỗng")
-        return None
-    
-    print(f"✅ Đã load {len(products)} sản phẩm")
-    
-    if not GROQ_SEARCH_IMAGE_API_KEY:
-        print("❌ Thiếu GROQ_SEARCH_IMAGE_API_KEY trong .env")
-        return None
-    
-    # Bước 2: Chuẩn bị image data
-    print("\n🖼️ [2/7] Đang xử lý image data...")
-    base64_image, mime_type = prepare_image_data(image_data)
-    
-    if not base64_image:
-        print("❌ Không thể xử lý image data")
-        return None
-    
-    # Bước 3: Tạo prompt tối ưu cho Llama 4 Scout
+def build_vision_request(products: list, base64_image: str, mime_type: str):
+    """(headers, payload) gửi Groq Vision: prompt chứa danh sách sản phẩm + ảnh (dùng chung cho sync/async)"""
+    # Tạo prompt tối ưu cho Llama 4 Scout
     print("\n✍️ [3/7] Đang tạo prompt...")
     
     # Chia nhỏ danh sách nếu quá dài (tránh vượt token limit)
@@ -310,11 +281,6 @@ Bún bò Huế
 Trà sữa trân châu
 Áo thun basic"""
     
-    # Bước 4: Gọi Groq Llama 4 Scout Vision API
-    print(f"\n🤖 [4/7] Đang gọi Groq API với model: {VISION_MODEL}...")
-    
-    api_url = "https://api.groq.com/openai/v1/chat/completions"
-    
     headers = {
         "Authorization": f"Bearer {GROQ_SEARCH_IMAGE_API_KEY}",
         "Content-Type": "application/json"
@@ -344,9 +310,104 @@ Trà sữa trân châu
         "top_p": 0.9,
         "stream": False
     }
+    return headers, payload
+
+
+def match_vision_response(res: dict, products: list):
+    """Lấy tên sản phẩm từ response Groq Vision rồi so khớp với danh sách sản phẩm (None nếu không khớp)"""
+    # Bước 5: Trích xuất text
+    print("\n📝 [5/7] Đang trích xuất kết quả...")
+    text = safe_extract_text_from_groq_response(res)
+    
+    if not text:
+        print("❌ Không trích xuất được text từ response")
+        return None
+    
+    # Bước 6: Làm sạch text
+    print("\n🧹 [6/7] Đang làm sạch output...")
+    text = clean_detected_text(text)
+    print(f"🎯 Llama 4 Scout detected: '{text}'")
+    
+    # Bước 7: Fuzzy matching
+    print("\n🔍 [7/7] Đang so khớp với database...")
+    matched_product = fuzzy_match_product(text, products)
+    
+    if matched_product:
+        print("\n" + "="*70)
+        print(f"✅ SUCCESS! Found product: '{matched_product}'")
+        print("="*70)
+        return matched_product
+    
+    # Bước 8: Fallback strategy - keyword matching
+    print("\n⚠️ Fuzzy matching failed, trying fallback strategy...")
+    
+    keywords = [
+        # Đồ ăn
+        "cơm", "phở", "bún", "bánh", "chả", "gà", "bò", "heo", "tôm", "cá",
+        "mì", "canh", "lẩu", "nem", "gỏi", "xôi", "cháo",
+        # Đồ uống  
+        "trà", "cà phê", "nước", "sinh tố", "sữa", "bia", "rượu", "chanh",
+        # Đồ dùng
+        "bút", "vở", "sách", "balo", "túi", "áo", "quần"
+    ]
+    
+    text_lower = text.lower()
+    for keyword in keywords:
+        if keyword in text_lower:
+            print(f"🔑 Found keyword: '{keyword}'")
+            for product in products:
+                if keyword in product.lower():
+                    print(f"⚠️ Fallback match: '{product}'")
+                    return product
+    
+    print("\n" + "="*70)
+    print(f"❌ FAILED: Không tìm thấy sản phẩm phù hợp cho '{text}'")
+    print("="*70)
+    return None
+
+
+def groq_search_product_by_image(image_data: str):
+    """
+    Tìm sản phẩm bằng hình ảnh sử dụng Groq Llama 4 Scout Vision API
+    
+    Args:
+        image_data: URL ảnh, base64 string, hoặc data URL
+    
+    Returns:
+        str: Tên sản phẩm tìm được, hoặc None nếu không tìm thấy
+    """
+    print("\n" + "="*70)
+    print("🚀 GROQ LLAMA 4 SCOUT VISION - PRODUCT SEARCH")
+    print("="*70)
+    
+    # Bước 1: Lấy danh sách sản phẩm
+    print("\n📦 [1/7] Đang lấy danh sách sản phẩm từ Supabase...")
+    products = fetch_product_names()
+    
+    if not products:
+        print("❌ Danh sách sản phẩm rỗng")
+        return None
+    
+    print(f"✅ Đã load {len(products)} sản phẩm")
+    
+    if not GROQ_SEARCH_IMAGE_API_KEY:
+        print("❌ Thiếu GROQ_SEARCH_IMAGE_API_KEY trong .env")
+        return None
+    
+    # Bước 2: Chuẩn bị image data
+    print("\n🖼️ [2/7] Đang xử lý image data...")
+    base64_image, mime_type = prepare_image_data(image_data)
+    
+    if not base64_image:
+        print("❌ Không thể xử lý image data")
+        return None
+    
+    # Bước 3: Tạo prompt; Bước 4: Gọi Groq Llama 4 Scout Vision API
+    headers, payload = build_vision_request(products, base64_image, mime_type)
+    print(f"\n🤖 [4/7] Đang gọi Groq API với model: {VISION_MODEL}...")
     
     try:
-        response = requests.post(api_url, headers=headers, json=payload, timeout=30)
+        response = requests.post(GROQ_API_URL, headers=headers, json=payload, timeout=30)
         
         print(f"📡 Vision API Status: {response.status_code}")
         
@@ -354,57 +415,7 @@ Trà sữa trân châu
             print(f"❌ API error {response.status_code}: {response.text[:200]}")
             return None
         
-        res = response.json()
-        
-        # Bước 5: Trích xuất text
-        print("\n📝 [5/7] Đang trích xuất kết quả...")
-        text = safe_extract_text_from_groq_response(res)
-        
-        if not text:
-            print("❌ Không trích xuất được text từ response")
-            return None
-        
-        # Bước 6: Làm sạch text
-        print("\n🧹 [6/7] Đang làm sạch output...")
-        text = clean_detected_text(text)
-        print(f"🎯 Llama 4 Scout detected: '{text}'")
-        
-        # Bước 7: Fuzzy matching
-        print("\n🔍 [7/7] Đang so khớp với database...")
-        matched_product = fuzzy_match_product(text, products)
-        
-        if matched_product:
-            print("\n" + "="*70)
-            print(f"✅ SUCCESS! Found product: '{matched_product}'")
-            print("="*70)
-            return matched_product
-        
-        # Bước 8: Fallback strategy - keyword matching
-        print("\n⚠️ Fuzzy matching failed, trying fallback strategy...")
-        
-        keywords = [
-            # Đồ ăn
-            "cơm", "phở", "bún", "bánh", "chả", "gà", "bò", "heo", "tôm", "cá",
-            "mì", "canh", "lẩu", "nem", "gỏi", "xôi", "cháo",
-            # Đồ uống  
-            "trà", "cà phê", "nước", "sinh tố", "sữa", "bia", "rượu", "chanh",
-            # Đồ dùng
-            "bút", "vở", "sách", "balo", "túi", "áo", "quần"
-        ]
-        
-        text_lower = text.lower()
-        for keyword in keywords:
-            if keyword in text_lower:
-                print(f"🔑 Found keyword: '{keyword}'")
-                for product in products:
-                    if keyword in product.lower():
-                        print(f"⚠️ Fallback match: '{product}'")
-                        return product
-        
-        print("\n" + "="*70)
-        print(f"❌ FAILED: Không tìm thấy sản phẩm phù hợp cho '{text}'")
-        print("="*70)
-        return None
+        return match_vision_response(response.json(), products)
         
     except requests.exceptions.Timeout:
         print("❌ Timeout: API không phản hồi trong 30 giây")
@@ -419,6 +430,69 @@ Trà sữa trân châu
         return None
 
 
+async def async_prepare_image_data(image_data: str, client: httpx.AsyncClient):
+    """Như prepare_image_data; ảnh dạng URL được tải bằng client async"""
+    if not (image_data.startswith('http://') or image_data.startswith('https://')):
+        return prepare_image_data(image_data)
+    try:
+        print(f"📥 Đang tải ảnh từ URL: {image_data[:50]}...")
+        response = await client.get(image_data, timeout=15)
+        if response.status_code != 200:
+            print(f"⚠️ Lỗi tải ảnh: HTTP {response.status_code}")
+            return None, None
+        base64_data = base64.b64encode(response.content).decode('utf-8')
+        mime_type = response.headers.get('Content-Type', 'image/jpeg')
+        print(f"✅ Đã tải ảnh thành công, MIME type: {mime_type}")
+        return base64_data, mime_type
+    except httpx.HTTPError as e:
+        print(f"⚠️ Lỗi prepare_image_data: {str(e)}")
+        return None, None
+
+
+async def async_groq_search_product_by_image(image_data: str, client: httpx.AsyncClient):
+    """
+    Bản async của groq_search_product_by_image.
+    Lấy danh sách sản phẩm và tải/giải mã ảnh là 2 việc độc lập → chạy song song.
+    """
+    if not GROQ_SEARCH_IMAGE_API_KEY:
+        print("❌ Thiếu GROQ_SEARCH_IMAGE_API_KEY trong .env")
+        return None
+
+    print("\n📦 Đang lấy danh sách sản phẩm + xử lý image data (song song)...")
+    products, (base64_image, mime_type) = await asyncio.gather(
+        fetch_product_names_async(client), async_prepare_image_data(image_data, client)
+    )
+    if not products:
+        print("❌ Danh sách sản phẩm rỗng")
+        return None
+    if not base64_image:
+        print("❌ Không thể xử lý image data")
+        return None
+
+    headers, payload = build_vision_request(products, base64_image, mime_type)
+    print(f"\n🤖 Đang gọi Groq API với model: {VISION_MODEL}...")
+    try:
+        response = await client.post(GROQ_API_URL, headers=headers, json=payload, timeout=30)
+        print(f"📡 Vision API Status: {response.status_code}")
+        if response.status_code != 200:
+            print(f"❌ API error {response.status_code}: {response.text[:200]}")
+            return None
+        return match_vision_response(response.json(), products)
+
+    except httpx.TimeoutException:
+        print("❌ Timeout: API không phản hồi trong 30 giây")
+        return None
+
+    except httpx.HTTPError as e:
+        print(f"❌ Request error: {str(e)}")
+        return None
+
+    except Exception as e:
+        print(f"❌ Unexpected error: {type(e).__name__} - {str(e)}")
+        return None
+
+
+
 # ==================== TEST FUNCTION ====================
 
 if __name__ == "__main__":
@@ -0,0 +1,28 @@
+from database.async_queries import run_async, select_table
+from database.fetch_data import products_by_ids_params, split_search_terms
+
+# Bản async của các hàm trong fetch_data mà luồng tìm kiếm cần (cùng tham số, cùng kết quả)
+
+
+async def fetch_products_by_search_async(client, search_text):
+    return await run_async(client, "shoppy_products_nested_by_search", p_terms=split_search_terms(search_text))
+
+
+async def fetch_products_by_ids_async(client, product_ids, price_range=None, store_ids=None):
+    params = products_by_ids_params(product_ids, price_range, store_ids)
+    if params is None:
+        return []
+    return await run_async(client, "shoppy_products_nested_by_ids", **params)
+
+
+async def fetch_product_names_async(client):
+    """Danh sách tên product (không trùng), như fetch_product_names của API image search."""
+    try:
+        rows = await select_table(client, "product", "name")
+    except Exception as e:
+        print(f"⚠️ Exception fetch_product_names_async: {e}")
+        return []
+    if not rows:
+        print("⚠️ Dữ liệu rỗng từ Supabase")
+        return []
+    return list({row["name"].strip() for row in rows if row.get("name")})
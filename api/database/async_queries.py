@@ -0,0 +1,69 @@
+import ssl
+
+import certifi
+import httpx
+
+from database.queries import (
+    DATA_BASE_URL_SUPABASE, DATA_BASE_SECRET_KEY_SUPABASE, FUNCTION_NOT_FOUND, STATEMENTS, _missing_functions,
+)
+
+# Bản async của database.queries.run: gọi thẳng PostgREST (/rest/v1/rpc/<tên hàm>) bằng httpx.AsyncClient
+REST_URL = f"{(DATA_BASE_URL_SUPABASE or '').rstrip('/')}/rest/v1"
+HEADERS = {
+    "apikey": DATA_BASE_SECRET_KEY_SUPABASE or "",
+    "Authorization": f"Bearer {DATA_BASE_SECRET_KEY_SUPABASE or ''}",
+    "Content-Type": "application/json",
+}
+
+# Tạo SSL context 1 lần cho cả process (nạp CA bundle tốn ~40ms, không nên lặp lại ở mỗi request)
+SSL_CONTEXT = ssl.create_default_context(cafile=certifi.where())
+
+
+class UpstreamError(Exception):
+    """PostgREST trả về lỗi (status >= 400)."""
+
+    def __init__(self, status_code, payload):
+        self.status_code = status_code
+        self.payload = payload if isinstance(payload, dict) else {"message": str(payload)}
+        self.code = self.payload.get("code")
+        super().__init__(f"[{status_code}] {self.code}: {self.payload.get('message')}")
+
+
+def upstream_client(timeout):
+    """
+    Client dùng cho 1 request (Flask chạy mỗi view async trong event loop riêng,
+    client không dùng lại được giữa các loop). Các lời gọi trong cùng request dùng chung kết nối.
+    """
+    return httpx.AsyncClient(timeout=timeout, verify=SSL_CONTEXT, limits=httpx.Limits(max_connections=20))
+
+
+async def post_rpc(client, function_name, args):
+    response = await client.post(f"{REST_URL}/rpc/{function_name}", headers=HEADERS, json=args)
+    if response.status_code >= 400:
+        try:
+            payload = response.json()
+        except ValueError:
+            payload = response.text
+        raise UpstreamError(response.status_code, payload)
+    return response.json()
+
+
+async def run_async(client, name, **args):
+    """Như database.queries.run: ưu tiên hàm RPC, chưa cài trên DB → exec_sql (dùng chung danh sách hàm thiếu)."""
+    if name not in _missing_functions:
+        try:
+            return await post_rpc(client, name, args)
+        except UpstreamError as e:
+            if e.code != FUNCTION_NOT_FOUND:
+                raise
+            _missing_functions.add(name)
+            print(f"⚠️ [QUERY] Chưa có hàm {name} trên DB (chạy `python -m database.queries --sql`), dùng exec_sql")
+    return await post_rpc(client, "exec_sql", {"sql": STATEMENTS[name].literal_sql(args)})
+
+
+async def select_table(client, table, columns):
+    """SELECT columns FROM table (như supabase.table(table).select(columns).execute().data)."""
+    response = await client.get(f"{REST_URL}/{table}", headers=HEADERS, params={"select": columns})
+    if response.status_code >= 400:
+        raise UpstreamError(response.status_code, response.text)
+    return response.json()
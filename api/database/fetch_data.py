@@ -1,205 +1,135 @@
-import os
 import re
-from supabase import create_client, Client
-from dotenv import load_dotenv
 
-load_dotenv()
-
-DATA_BASE_SECRET_KEY_SUPABASE = os.getenv("DATA_BASE_SECRET_KEY_SUPABASE")
-DATA_BASE_URL_SUPABASE = os.getenv("DATA_BASE_URL_SUPABASE")
-
-url = DATA_BASE_URL_SUPABASE
-key = DATA_BASE_SECRET_KEY_SUPABASE
-supabase: Client = create_client(url, key)
+from database.queries import supabase, run, to_int_ids
 
 def sanitize_input(text):
     """Loại ký tự nguy hiểm để tránh SQL injection đơn giản"""
     return re.sub(r"[\"';]", "", text).strip()
 
-def fetch_rows_by_search(search_text):
+def split_search_terms(search_text):
     """
-    Tìm kiếm sản phẩm, hỗ trợ nhiều tên phân cách bởi: , . -
-    VD: "Cơm tấm, Cơm cháy" hoặc "món 1. món 2" hoặc "món 3 - món 4"
+    Tách chuỗi tìm kiếm thành các term, phân cách bởi: , . -
+    Chỉ có 1 món -> trả về nguyên chuỗi (đã làm sạch) như 1 term duy nhất.
     """
     # Tách theo các dấu phân cách: , . -
     products = re.split(r'[,.\-]', search_text)
     products = [sanitize_input(p).lower().strip() for p in products if p.strip()]
-    
-    # Nếu có nhiều món → tạo điều kiện OR
+
     if len(products) > 1:
-        conditions = " OR ".join([
-            f"unaccent(lower(p.name)) LIKE '%' || unaccent(lower('{prod}')) || '%'"
-            for prod in products
-        ])
-        where_clause = f"WHERE ({conditions})"
-    else:
-        # Chỉ có 1 món
-        safe_search = sanitize_input(search_text).lower()
-        where_clause = f"WHERE unaccent(lower(p.name)) LIKE '%' || unaccent(lower('{safe_search}')) || '%'"
-
-    query = f"""
-        SELECT 
-            p.product_id, 
-            p.name AS product_name, 
-            p.des AS product_des,
-            p.image_url AS product_image_url,
-            p.location_id AS product_location_id,
-            p.tag AS product_tag,
-            p.min_cost AS product_min_cost,
-            p.max_cost AS product_max_cost,
-                
-            l.location_id,
-            l.name AS location_name,
-            l.max_long AS location_max_long,
-            l.min_long AS location_min_long,
-            l.max_lat AS location_max_lat,
-            l.min_lat AS location_min_lat,
-                
-            s.store_id,
-            s.name AS store_name,
-            s.address AS store_address,
-            s.lat AS store_lat,
-            s.long AS store_long,
-            s.location_id AS store_location_id,
-            
-            ps.ps_id,
-            ps.store_id AS ps_store_id,
-            ps.product_id AS ps_product_id,
-            ps.average_rating AS ps_average_rating,
-            ps.total_reviews AS ps_total_reviews,
-            ps.min_price_store AS ps_min_price_store,
-            ps.max_price_store AS ps_max_price_store,
-                
-            pi.ps_id,
-            pi.image_id AS ps_image_id,
-            pi.image_url AS ps_image_url,
-            pi.type AS ps_type
-
-        FROM product p
-        LEFT JOIN location l ON p.location_id = l.location_id
-        LEFT JOIN product_store ps ON ps.product_id = p.product_id
-        LEFT JOIN store s ON s.store_id = ps.store_id
-        LEFT JOIN product_images pi ON pi.ps_id = ps.ps_id
-        {where_clause}
-    """
-    result = supabase.rpc("exec_sql", {"sql": query}).execute()
-    return result.data
-
-def fetch_data_by_product_store_id(product_id: str, store_id: str = None):
-    """
-    Tìm kiếm chi tiết sản phẩm.
-    - Nếu có store_id: Lấy chi tiết sản phẩm tại cửa hàng đó (1 dòng).
-    - Nếu KHÔNG có store_id: Lấy chi tiết sản phẩm tại TẤT CẢ cửa hàng (n dòng).
-    """
-    # 1. Bảo vệ đầu vào product_id (Bắt buộc)
-    safe_product_id = sanitize_input(product_id)
-    
-    # 2. Xây dựng danh sách điều kiện
-    conditions = [f"p.product_id = '{safe_product_id}'"]
-
-    # 3. Kiểm tra store_id có tồn tại không
-    if store_id:
-        safe_store_id = sanitize_input(store_id)
-        conditions.append(f"s.store_id = '{safe_store_id}'")
-
-    # Nối các điều kiện bằng AND
-    where_clause = "WHERE " + " AND ".join(conditions)
-
-    query = f"""
-        SELECT 
-            p.product_id, 
-            p.name AS product_name, 
-            p.des AS product_des,
-            p.image_url AS product_image_url,
-            p.location_id AS product_location_id,
-            p.tag AS product_tag,
-            p.min_cost AS product_min_cost,
-            p.max_cost AS product_max_cost,
-                
-            l.location_id,
-            l.name AS location_name,
-            l.max_long AS location_max_long,
-            l.min_long AS location_min_long,
-            l.max_lat AS location_max_lat,
-            l.min_lat AS location_min_lat,
-                
-            s.store_id,
-            s.name AS store_name,
-            s.address AS store_address,
-            s.lat AS store_lat,
-            s.long AS store_long,
-            s.location_id AS store_location_id,
-            
-            ps.ps_id,
-            ps.store_id AS ps_store_id,
-            ps.product_id AS ps_product_id,
-            ps.average_rating AS ps_average_rating,
-            ps.total_reviews AS ps_total_reviews,
-            ps.min_price_store AS ps_min_price_store,
-            ps.max_price_store AS ps_max_price_store,
-                
-            pi.ps_id,
-            pi.image_id AS ps_image_id,
-            pi.image_url AS ps_image_url,
-            pi.type AS ps_type
-
-        FROM product p
-        LEFT JOIN location l ON p.location_id = l.location_id
-        LEFT JOIN product_store ps ON ps.product_id = p.product_id
-        LEFT JOIN store s ON s.store_id = ps.store_id
-        LEFT JOIN product_images pi ON pi.ps_id = ps.ps_id
-        {where_clause}
-    """
-    
-    # Supabase RPC để thực thi truy vấn
-    result = supabase.rpc("exec_sql", {"sql": query}).execute()
-    
-    return result.data
-
-def fetch_full_data():
-    query = """
-        SELECT 
-            p.product_id, 
-            p.name AS product_name, 
-            p.des AS product_des,
-            p.image_url AS product_image_url,
-            p.location_id AS product_location_id,
-            p.tag AS product_tag,
-            p.min_cost AS product_min_cost,
-            p.max_cost AS product_max_cost,
-                
-            l.location_id,
-            l.name AS location_name,
-            l.max_long AS location_max_long,
-            l.min_long AS location_min_long,
-            l.max_lat AS location_max_lat,
-            l.min_lat AS location_min_lat,
-                
-            s.store_id,
-            s.name AS store_name,
-            s.address AS store_address,
-            s.lat AS store_lat,
-            s.long AS store_long,
-            s.location_id AS store_location_id,
-            
-            ps.ps_id,
-            ps.store_id AS ps_store_id,
-            ps.product_id AS ps_product_id,
-            ps.average_rating AS ps_average_rating,
-            ps.total_reviews AS ps_total_reviews,
-            ps.min_price_store AS ps_min_price_store,
-            ps.max_price_store AS ps_max_price_store,
-                
-            pi.ps_id,
-            pi.image_id AS ps_image_id,
-            pi.image_url AS ps_image_url,
-            pi.type AS ps_type
-
-        FROM product p
-        LEFT JOIN location l ON p.location_id = l.location_id
-        LEFT JOIN product_store ps ON ps.product_id = p.product_id
-        LEFT JOIN store s ON s.store_id = ps.store_id
-        LEFT JOIN product_images pi ON pi.ps_id = ps.ps_id
-    """
-    result = supabase.rpc("exec_sql", {"sql": query}).execute()
-    return result.data
\ No newline at end of file
+        return products
+    return [sanitize_input(search_text).lower()]
+
+def price_range_params(price_range=None):
+    """
+    (low, high) -> tham số p_price_low/p_price_high; high = inf -> NULL (không có cận trên).
+    Khoảng giá của store [min_price_store, max_price_store] phải giao với [low, high].
+    """
+    if price_range is None:
+        return None, None
+    low, high = price_range
+    return low, (None if high == float("inf") else high)
+
+# ----------------------------------------------------
+# Dạng gom nhóm: 1 phần tử / product
+#   {"product": {...}, "location": {...}, "store": [{..., "product_images": [...]}]}
+# ----------------------------------------------------
+def fetch_full_catalog():
+    return run("shoppy_catalog_nested")
+
+def fetch_products_by_search(search_text):
+    """
+    Tìm kiếm sản phẩm, hỗ trợ nhiều tên phân cách bởi: , . -
+    VD: "Cơm tấm, Cơm cháy" hoặc "món 1. món 2" hoặc "món 3 - món 4"
+    """
+    return run("shoppy_products_nested_by_search", p_terms=split_search_terms(search_text))
+
+def fetch_product_detail(product_id, store_id=None):
+    """
+    Chi tiết sản phẩm (0 hoặc 1 phần tử).
+    - Nếu có store_id: chỉ giữ cửa hàng đó.
+    - Nếu KHÔNG có store_id: kèm TẤT CẢ cửa hàng.
+    """
+    product_ids = to_int_ids([product_id])
+    if not product_ids:
+        return []
+
+    store_ids = to_int_ids([store_id]) if store_id else [None]
+    if not store_ids:
+        return []
+
+    return run("shoppy_product_nested", p_product_id=product_ids[0], p_store_id=store_ids[0])
+
+def fetch_products_by_ids(product_ids, price_range=None, store_ids=None):
+    """
+    Lấy dữ liệu cho một tập product_id: nạp lại một phần catalog (các sản phẩm vừa thay đổi)
+    hoặc nạp các sản phẩm đã tìm được qua chỉ mục trong RAM.
+    Có bộ lọc → chỉ giữ store thỏa bộ lọc, product không còn store nào bị bỏ.
+    """
+    params = products_by_ids_params(product_ids, price_range, store_ids)
+    if params is None:
+        return []
+    return run("shoppy_products_nested_by_ids", **params)
+
+def fetch_data_by_product_store_pairs(pairs):
+    """
+    Chi tiết nhiều cặp (product_id, store_id) trong 1 truy vấn, dạng gom nhóm: mỗi product
+    chỉ chứa các store có trong danh sách cặp. Cặp có id không hợp lệ bị bỏ.
+    """
+    product_ids, store_ids = [], []
+    for product_id, store_id in pairs:
+        ids = to_int_ids([product_id, store_id])
+        if len(ids) == 2:
+            product_ids.append(ids[0])
+            store_ids.append(ids[1])
+    if not product_ids:
+        return []
+
+    return run("shoppy_product_store_pairs", p_product_ids=product_ids, p_store_ids=store_ids)
+
+def products_by_ids_params(product_ids, price_range=None, store_ids=None):
+    """Tham số cho shoppy_products_nested_by_ids; None nếu chắc chắn không có dòng nào."""
+    ids = to_int_ids(product_ids)
+    if not ids:
+        return None
+    if store_ids is not None:
+        store_ids = to_int_ids(store_ids)
+        if not store_ids:
+            return None
+
+    price_low, price_high = price_range_params(price_range)
+    return {"p_product_ids": ids, "p_price_low": price_low, "p_price_high": price_high, "p_store_ids": store_ids}
+
+def fetch_product_fingerprints():
+    """
+    Trả về dấu vân tay (md5) cho từng product: gộp nội dung product, location,
+    product_store, store và product_images của product đó.
+    Chỉ 1 dòng nhỏ / product -> rẻ hơn nhiều so với kéo toàn bộ join về.
+    """
+    return run("shoppy_product_fingerprints")
+
+def fetch_stores(client=None):
+    """
+    Lấy danh sách cửa hàng kèm tag sản phẩm (cùng nguồn dữ liệu với /map/api/stores).
+    client: Supabase client khác client mặc định (VD client riêng của module map).
+    """
+    response = (client or supabase).table("store").select(
+        "store_id, name, address, lat, long, product_store(product(tag))"
+    ).execute()
+
+    stores = []
+    for item in response.data or []:
+        tags = set()
+        for relation in item.get("product_store") or []:
+            product = relation.get("product") or {}
+            if product.get("tag"):
+                tags.add(product["tag"].strip().lower())
+
+        stores.append({
+            "store_id": item["store_id"],
+            "name": item["name"],
+            "address": item["address"],
+            "lat": item["lat"],
+            "long": item["long"],
+            "tags": sorted(tags)
+        })
+    return stores
@@ -0,0 +1,478 @@
+-- Sinh từ api/database/queries.py, chạy lại sau mỗi lần sửa câu truy vấn
+
+CREATE EXTENSION IF NOT EXISTS unaccent;
+
+CREATE OR REPLACE FUNCTION shoppy_product_fingerprints()
+RETURNS SETOF json
+LANGUAGE plpgsql STABLE
+AS $fn$
+BEGIN
+    RETURN QUERY SELECT row_to_json(t) FROM (
+        SELECT
+            p.product_id,
+            md5(p::text || coalesce(l::text, '') || coalesce(agg.body, '')) AS fingerprint
+        FROM product p
+        LEFT JOIN location l ON p.location_id = l.location_id
+        LEFT JOIN (
+            SELECT
+                ps.product_id,
+                string_agg(
+                    ps::text || coalesce(s::text, '') || coalesce(pi::text, ''),
+                    '|' ORDER BY ps.ps_id, pi.image_id
+                ) AS body
+            FROM product_store ps
+            LEFT JOIN store s ON s.store_id = ps.store_id
+            LEFT JOIN product_images pi ON pi.ps_id = ps.ps_id
+            GROUP BY ps.product_id
+        ) agg ON agg.product_id = p.product_id
+    ) t;
+END;
+$fn$;
+
+CREATE OR REPLACE FUNCTION shoppy_catalog_nested()
+RETURNS SETOF json
+LANGUAGE plpgsql STABLE
+AS $fn$
+BEGIN
+    RETURN QUERY SELECT row_to_json(t) FROM (
+        SELECT
+            json_build_object(
+                'product_id', p.product_id,
+                'product_name', p.name,
+                'product_des', p.des,
+                'product_image_url', p.image_url,
+                'product_location_id', p.location_id,
+                'product_tag', p.tag,
+                'product_min_cost', p.min_cost,
+                'product_max_cost', p.max_cost
+            ) AS product,
+            json_build_object(
+                'location_id', l.location_id,
+                'location_name', l.name,
+                'location_max_long', l.max_long,
+                'location_min_long', l.min_long,
+                'location_max_lat', l.max_lat,
+                'location_min_lat', l.min_lat
+            ) AS location,
+            coalesce(stores.items, '[]'::json) AS store
+        FROM product p
+        LEFT JOIN location l ON p.location_id = l.location_id
+        LEFT JOIN LATERAL (
+            SELECT json_agg(json_build_object(
+                'store_id', s.store_id,
+                'store_name', s.name,
+                'store_address', s.address,
+                'store_lat', s.lat,
+                'store_long', s.long,
+                'store_location_id', s.location_id,
+                'ps_id', ps.ps_id,
+                'ps_average_rating', ps.average_rating,
+                'ps_total_reviews', ps.total_reviews,
+                'ps_min_price_store', ps.min_price_store,
+                'ps_max_price_store', ps.max_price_store,
+                'product_images', coalesce(images.items, '[]'::json)
+            ) ORDER BY ps.ps_id) AS items
+            FROM product_store ps
+            JOIN store s ON s.store_id = ps.store_id
+            LEFT JOIN LATERAL (
+                SELECT json_agg(json_build_object(
+                    'ps_id', pi.ps_id,
+                    'ps_image_id', pi.image_id,
+                    'ps_image_url', pi.image_url,
+                    'ps_type', pi.type
+                ) ORDER BY pi.image_id) AS items
+                FROM product_images pi
+                WHERE pi.ps_id = ps.ps_id AND coalesce(pi.image_url, '') <> ''
+            ) images ON TRUE
+            WHERE ps.product_id = p.product_id AND TRUE
+        ) stores ON TRUE
+        WHERE TRUE
+    ) t;
+END;
+$fn$;
+
+CREATE OR REPLACE FUNCTION shoppy_products_nested_by_search(p_terms text[] DEFAULT NULL)
+RETURNS SETOF json
+LANGUAGE plpgsql STABLE
+AS $fn$
+BEGIN
+    RETURN QUERY SELECT row_to_json(t) FROM (
+        SELECT
+            json_build_object(
+                'product_id', p.product_id,
+                'product_name', p.name,
+                'product_des', p.des,
+                'product_image_url', p.image_url,
+                'product_location_id', p.location_id,
+                'product_tag', p.tag,
+                'product_min_cost', p.min_cost,
+                'product_max_cost', p.max_cost
+            ) AS product,
+            json_build_object(
+                'location_id', l.location_id,
+                'location_name', l.name,
+                'location_max_long', l.max_long,
+                'location_min_long', l.min_long,
+                'location_max_lat', l.max_lat,
+                'location_min_lat', l.min_lat
+            ) AS location,
+            coalesce(stores.items, '[]'::json) AS store
+        FROM product p
+        LEFT JOIN location l ON p.location_id = l.location_id
+        LEFT JOIN LATERAL (
+            SELECT json_agg(json_build_object(
+                'store_id', s.store_id,
+                'store_name', s.name,
+                'store_address', s.address,
+                'store_lat', s.lat,
+                'store_long', s.long,
+                'store_location_id', s.location_id,
+                'ps_id', ps.ps_id,
+                'ps_average_rating', ps.average_rating,
+                'ps_total_reviews', ps.total_reviews,
+                'ps_min_price_store', ps.min_price_store,
+                'ps_max_price_store', ps.max_price_store,
+                'product_images', coalesce(images.items, '[]'::json)
+            ) ORDER BY ps.ps_id) AS items
+            FROM product_store ps
+            JOIN store s ON s.store_id = ps.store_id
+            LEFT JOIN LATERAL (
+                SELECT json_agg(json_build_object(
+                    'ps_id', pi.ps_id,
+                    'ps_image_id', pi.image_id,
+                    'ps_image_url', pi.image_url,
+                    'ps_type', pi.type
+                ) ORDER BY pi.image_id) AS items
+                FROM product_images pi
+                WHERE pi.ps_id = ps.ps_id AND coalesce(pi.image_url, '') <> ''
+            ) images ON TRUE
+            WHERE ps.product_id = p.product_id AND TRUE
+        ) stores ON TRUE
+        WHERE EXISTS (
+            SELECT 1 FROM unnest(p_terms) AS term
+            WHERE unaccent(lower(p.name)) LIKE '%' || unaccent(lower(term)) || '%'
+        )
+    ) t;
+END;
+$fn$;
+
+CREATE OR REPLACE FUNCTION shoppy_product_nested(p_product_id bigint DEFAULT NULL, p_store_id bigint DEFAULT NULL)
+RETURNS SETOF json
+LANGUAGE plpgsql STABLE
+AS $fn$
+BEGIN
+    RETURN QUERY SELECT row_to_json(t) FROM (
+        SELECT
+            json_build_object(
+                'product_id', p.product_id,
+                'product_name', p.name,
+                'product_des', p.des,
+                'product_image_url', p.image_url,
+                'product_location_id', p.location_id,
+                'product_tag', p.tag,
+                'product_min_cost', p.min_cost,
+                'product_max_cost', p.max_cost
+            ) AS product,
+            json_build_object(
+                'location_id', l.location_id,
+                'location_name', l.name,
+                'location_max_long', l.max_long,
+                'location_min_long', l.min_long,
+                'location_max_lat', l.max_lat,
+                'location_min_lat', l.min_lat
+            ) AS location,
+            coalesce(stores.items, '[]'::json) AS store
+        FROM product p
+        LEFT JOIN location l ON p.location_id = l.location_id
+        LEFT JOIN LATERAL (
+            SELECT json_agg(json_build_object(
+                'store_id', s.store_id,
+                'store_name', s.name,
+                'store_address', s.address,
+                'store_lat', s.lat,
+                'store_long', s.long,
+                'store_location_id', s.location_id,
+                'ps_id', ps.ps_id,
+                'ps_average_rating', ps.average_rating,
+                'ps_total_reviews', ps.total_reviews,
+                'ps_min_price_store', ps.min_price_store,
+                'ps_max_price_store', ps.max_price_store,
+                'product_images', coalesce(images.items, '[]'::json)
+            ) ORDER BY ps.ps_id) AS items
+            FROM product_store ps
+            JOIN store s ON s.store_id = ps.store_id
+            LEFT JOIN LATERAL (
+                SELECT json_agg(json_build_object(
+                    'ps_id', pi.ps_id,
+                    'ps_image_id', pi.image_id,
+                    'ps_image_url', pi.image_url,
+                    'ps_type', pi.type
+                ) ORDER BY pi.image_id) AS items
+                FROM product_images pi
+                WHERE pi.ps_id = ps.ps_id AND coalesce(pi.image_url, '') <> ''
+            ) images ON TRUE
+            WHERE ps.product_id = p.product_id AND (p_store_id IS NULL OR s.store_id = p_store_id)
+        ) stores ON TRUE
+        WHERE p.product_id = p_product_id
+    ) t;
+END;
+$fn$;
+
+CREATE OR REPLACE FUNCTION shoppy_products_nested_by_ids(p_product_ids bigint[] DEFAULT NULL, p_price_low numeric DEFAULT NULL, p_price_high numeric DEFAULT NULL, p_store_ids bigint[] DEFAULT NULL)
+RETURNS SETOF json
+LANGUAGE plpgsql STABLE
+AS $fn$
+BEGIN
+    RETURN QUERY SELECT row_to_json(t) FROM (
+        SELECT
+            json_build_object(
+                'product_id', p.product_id,
+                'product_name', p.name,
+                'product_des', p.des,
+                'product_image_url', p.image_url,
+                'product_location_id', p.location_id,
+                'product_tag', p.tag,
+                'product_min_cost', p.min_cost,
+                'product_max_cost', p.max_cost
+            ) AS product,
+            json_build_object(
+                'location_id', l.location_id,
+                'location_name', l.name,
+                'location_max_long', l.max_long,
+                'location_min_long', l.min_long,
+                'location_max_lat', l.max_lat,
+                'location_min_lat', l.min_lat
+            ) AS location,
+            coalesce(stores.items, '[]'::json) AS store
+        FROM product p
+        LEFT JOIN location l ON p.location_id = l.location_id
+        LEFT JOIN LATERAL (
+            SELECT json_agg(json_build_object(
+                'store_id', s.store_id,
+                'store_name', s.name,
+                'store_address', s.address,
+                'store_lat', s.lat,
+                'store_long', s.long,
+                'store_location_id', s.location_id,
+                'ps_id', ps.ps_id,
+                'ps_average_rating', ps.average_rating,
+                'ps_total_reviews', ps.total_reviews,
+                'ps_min_price_store', ps.min_price_store,
+                'ps_max_price_store', ps.max_price_store,
+                'product_images', coalesce(images.items, '[]'::json)
+            ) ORDER BY ps.ps_id) AS items
+            FROM product_store ps
+            JOIN store s ON s.store_id = ps.store_id
+            LEFT JOIN LATERAL (
+                SELECT json_agg(json_build_object(
+                    'ps_id', pi.ps_id,
+                    'ps_image_id', pi.image_id,
+                    'ps_image_url', pi.image_url,
+                    'ps_type', pi.type
+                ) ORDER BY pi.image_id) AS items
+                FROM product_images pi
+                WHERE pi.ps_id = ps.ps_id AND coalesce(pi.image_url, '') <> ''
+            ) images ON TRUE
+            WHERE ps.product_id = p.product_id AND (p_price_low IS NULL OR (
+                ps.min_price_store IS NOT NULL AND ps.max_price_store IS NOT NULL AND (
+                    (ps.min_price_store >= p_price_low AND (p_price_high IS NULL OR ps.min_price_store <= p_price_high))
+                    OR (ps.max_price_store >= p_price_low AND (p_price_high IS NULL OR ps.max_price_store <= p_price_high))
+                    OR (p_price_high IS NOT NULL AND ps.min_price_store <= p_price_low AND ps.max_price_store >= p_price_high)
+                )
+          ))
+          AND (p_store_ids IS NULL OR s.store_id = ANY(p_store_ids))
+        ) stores ON TRUE
+        WHERE p.product_id = ANY(p_product_ids)
+          AND ((p_price_low IS NULL AND p_store_ids IS NULL) OR stores.items IS NOT NULL)
+    ) t;
+END;
+$fn$;
+
+CREATE OR REPLACE FUNCTION shoppy_product_store_pairs(p_product_ids bigint[] DEFAULT NULL, p_store_ids bigint[] DEFAULT NULL)
+RETURNS SETOF json
+LANGUAGE plpgsql STABLE
+AS $fn$
+BEGIN
+    RETURN QUERY SELECT row_to_json(t) FROM (
+        SELECT
+            json_build_object(
+                'product_id', p.product_id,
+                'product_name', p.name,
+                'product_des', p.des,
+                'product_image_url', p.image_url,
+                'product_location_id', p.location_id,
+                'product_tag', p.tag,
+                'product_min_cost', p.min_cost,
+                'product_max_cost', p.max_cost
+            ) AS product,
+            json_build_object(
+                'location_id', l.location_id,
+                'location_name', l.name,
+                'location_max_long', l.max_long,
+                'location_min_long', l.min_long,
+                'location_max_lat', l.max_lat,
+                'location_min_lat', l.min_lat
+            ) AS location,
+            coalesce(stores.items, '[]'::json) AS store
+        FROM product p
+        LEFT JOIN location l ON p.location_id = l.location_id
+        LEFT JOIN LATERAL (
+            SELECT json_agg(json_build_object(
+                'store_id', s.store_id,
+                'store_name', s.name,
+                'store_address', s.address,
+                'store_lat', s.lat,
+                'store_long', s.long,
+                'store_location_id', s.location_id,
+                'ps_id', ps.ps_id,
+                'ps_average_rating', ps.average_rating,
+                'ps_total_reviews', ps.total_reviews,
+                'ps_min_price_store', ps.min_price_store,
+                'ps_max_price_store', ps.max_price_store,
+                'product_images', coalesce(images.items, '[]'::json)
+            ) ORDER BY ps.ps_id) AS items
+            FROM product_store ps
+            JOIN store s ON s.store_id = ps.store_id
+            LEFT JOIN LATERAL (
+                SELECT json_agg(json_build_object(
+                    'ps_id', pi.ps_id,
+                    'ps_image_id', pi.image_id,
+                    'ps_image_url', pi.image_url,
+                    'ps_type', pi.type
+                ) ORDER BY pi.image_id) AS items
+                FROM product_images pi
+                WHERE pi.ps_id = ps.ps_id AND coalesce(pi.image_url, '') <> ''
+            ) images ON TRUE
+            WHERE ps.product_id = p.product_id AND (ps.product_id, ps.store_id) IN (
+                SELECT pair.product_id, pair.store_id
+                FROM unnest(p_product_ids, p_store_ids) AS pair(product_id, store_id)
+            )
+        ) stores ON TRUE
+        WHERE p.product_id = ANY(p_product_ids) AND stores.items IS NOT NULL
+    ) t;
+END;
+$fn$;
+
+CREATE OR REPLACE FUNCTION shoppy_location_by_name(p_name text DEFAULT NULL)
+RETURNS SETOF json
+LANGUAGE plpgsql STABLE
+AS $fn$
+BEGIN
+    RETURN QUERY SELECT row_to_json(t) FROM (
+        
+        SELECT
+            location_id,
+            name AS location_name,
+            max_long AS location_max_long,
+            min_long AS location_min_long,
+            max_lat AS location_max_lat,
+            min_lat AS location_min_lat
+        FROM location
+
+        WHERE unaccent(lower(name)) LIKE '%' || unaccent(lower(p_name)) || '%'
+        LIMIT 1
+    ) t;
+END;
+$fn$;
+
+CREATE OR REPLACE FUNCTION shoppy_locations()
+RETURNS SETOF json
+LANGUAGE plpgsql STABLE
+AS $fn$
+BEGIN
+    RETURN QUERY SELECT row_to_json(t) FROM (
+        
+        SELECT
+            location_id,
+            name AS location_name,
+            max_long AS location_max_long,
+            min_long AS location_min_long,
+            max_lat AS location_max_lat,
+            min_lat AS location_min_lat
+        FROM location
+
+        ORDER BY location_id
+    ) t;
+END;
+$fn$;
+
+CREATE OR REPLACE FUNCTION shoppy_location_by_gps(p_lat double precision DEFAULT NULL, p_lon double precision DEFAULT NULL)
+RETURNS SETOF json
+LANGUAGE plpgsql STABLE
+AS $fn$
+BEGIN
+    RETURN QUERY SELECT row_to_json(t) FROM (
+        
+        SELECT
+            location_id,
+            name AS location_name,
+            max_long AS location_max_long,
+            min_long AS location_min_long,
+            max_lat AS location_max_lat,
+            min_lat AS location_min_lat
+        FROM location
+
+        WHERE p_lat BETWEEN min_lat AND max_lat
+          AND p_lon BETWEEN min_long AND max_long
+        LIMIT 1
+    ) t;
+END;
+$fn$;
+
+CREATE OR REPLACE FUNCTION shoppy_products_by_location(p_location_id bigint DEFAULT NULL, p_limit integer DEFAULT NULL)
+RETURNS SETOF json
+LANGUAGE plpgsql STABLE
+AS $fn$
+BEGIN
+    RETURN QUERY SELECT row_to_json(t) FROM (
+        SELECT DISTINCT
+            p.product_id,
+            p.name AS product_name,
+            p.image_url AS product_image_url,
+            p.tag AS product_tag,
+            p.min_cost AS product_min_cost,
+            p.max_cost AS product_max_cost
+        FROM product p
+        WHERE p.location_id = p_location_id
+        LIMIT p_limit
+    ) t;
+END;
+$fn$;
+
+CREATE OR REPLACE FUNCTION shoppy_product_stores(p_product_id bigint DEFAULT NULL)
+RETURNS SETOF json
+LANGUAGE plpgsql STABLE
+AS $fn$
+BEGIN
+    RETURN QUERY SELECT row_to_json(t) FROM (
+        SELECT
+            p.product_id,
+            p.name AS product_name,
+            p.des AS product_des,
+            p.image_url AS product_image_url,
+
+            s.store_id,
+            s.name AS store_name,
+            s.address AS store_address,
+            s.lat AS store_lat,
+            s.long AS store_long,
+
+            ps.ps_id,
+            ps.average_rating AS ps_average_rating,
+            ps.total_reviews AS ps_total_reviews,
+            ps.min_price_store AS ps_min_price_store,
+            ps.max_price_store AS ps_max_price_store,
+
+            pi.image_id AS pi_image_id,
+            pi.image_url AS pi_image_url,
+            pi.type AS pi_type
+
+        FROM product p
+        INNER JOIN product_store ps ON ps.product_id = p.product_id
+        INNER JOIN store s ON s.store_id = ps.store_id
+        LEFT JOIN product_images pi ON pi.ps_id = ps.ps_id
+        WHERE p.product_id = p_product_id
+    ) t;
+END;
+$fn$;
+
@@ -0,0 +1,368 @@
+import json
+import os
+import re
+from supabase import create_client, Client
+from postgrest.exceptions import APIError
+from dotenv import load_dotenv
+
+load_dotenv()
+
+DATA_BASE_SECRET_KEY_SUPABASE = os.getenv("DATA_BASE_SECRET_KEY_SUPABASE")
+DATA_BASE_URL_SUPABASE = os.getenv("DATA_BASE_URL_SUPABASE")
+
+url = DATA_BASE_URL_SUPABASE
+key = DATA_BASE_SECRET_KEY_SUPABASE
+supabase: Client = create_client(url, key)
+
+# PostgREST trả mã này khi chưa có hàm RPC tương ứng trong schema
+FUNCTION_NOT_FOUND = "PGRST202"
+
+LOCATION_SELECT = """
+        SELECT
+            location_id,
+            name AS location_name,
+            max_long AS location_max_long,
+            min_long AS location_min_long,
+            max_lat AS location_max_lat,
+            min_lat AS location_min_lat
+        FROM location
+"""
+
+
+# Điều kiện ở mức store: khoảng giá [min_price_store, max_price_store] phải giao với
+# [p_price_low, p_price_high] (p_price_high NULL = không có cận trên); p_store_ids NULL = không lọc store
+STORE_FILTER = """(p_price_low IS NULL OR (
+                ps.min_price_store IS NOT NULL AND ps.max_price_store IS NOT NULL AND (
+                    (ps.min_price_store >= p_price_low AND (p_price_high IS NULL OR ps.min_price_store <= p_price_high))
+                    OR (ps.max_price_store >= p_price_low AND (p_price_high IS NULL OR ps.max_price_store <= p_price_high))
+                    OR (p_price_high IS NOT NULL AND ps.min_price_store <= p_price_low AND ps.max_price_store >= p_price_high)
+                )
+          ))
+          AND (p_store_ids IS NULL OR s.store_id = ANY(p_store_ids))"""
+
+
+def nested_product_select(product_where, store_where="TRUE"):
+    """
+    1 dòng / product: {"product": {...}, "location": {...}, "store": [{..., "product_images": [...]}]}.
+    Store và ảnh được gom bằng json_agg ngay trên DB → không lặp lại ~30 cột
+    product/location/store cho mỗi ảnh như khi join phẳng.
+    """
+    return f"""
+        SELECT
+            json_build_object(
+                'product_id', p.product_id,
+                'product_name', p.name,
+                'product_des', p.des,
+                'product_image_url', p.image_url,
+                'product_location_id', p.location_id,
+                'product_tag', p.tag,
+                'product_min_cost', p.min_cost,
+                'product_max_cost', p.max_cost
+            ) AS product,
+            json_build_object(
+                'location_id', l.location_id,
+                'location_name', l.name,
+                'location_max_long', l.max_long,
+                'location_min_long', l.min_long,
+                'location_max_lat', l.max_lat,
+                'location_min_lat', l.min_lat
+            ) AS location,
+            coalesce(stores.items, '[]'::json) AS store
+        FROM product p
+        LEFT JOIN location l ON p.location_id = l.location_id
+        LEFT JOIN LATERAL (
+            SELECT json_agg(json_build_object(
+                'store_id', s.store_id,
+                'store_name', s.name,
+                'store_address', s.address,
+                'store_lat', s.lat,
+                'store_long', s.long,
+                'store_location_id', s.location_id,
+                'ps_id', ps.ps_id,
+                'ps_average_rating', ps.average_rating,
+                'ps_total_reviews', ps.total_reviews,
+                'ps_min_price_store', ps.min_price_store,
+                'ps_max_price_store', ps.max_price_store,
+                'product_images', coalesce(images.items, '[]'::json)
+            ) ORDER BY ps.ps_id) AS items
+            FROM product_store ps
+            JOIN store s ON s.store_id = ps.store_id
+            LEFT JOIN LATERAL (
+                SELECT json_agg(json_build_object(
+                    'ps_id', pi.ps_id,
+                    'ps_image_id', pi.image_id,
+                    'ps_image_url', pi.image_url,
+                    'ps_type', pi.type
+                ) ORDER BY pi.image_id) AS items
+                FROM product_images pi
+                WHERE pi.ps_id = ps.ps_id AND coalesce(pi.image_url, '') <> ''
+            ) images ON TRUE
+            WHERE ps.product_id = p.product_id AND {store_where}
+        ) stores ON TRUE
+        WHERE {product_where}"""
+
+
+class Statement:
+    """
+    Câu truy vấn có tên + tham số (tên tham số luôn bắt đầu bằng p_).
+    - Trên DB: là 1 hàm plpgsql cùng tên → Postgres parse 1 lần, cache plan theo session
+      và dùng lại cho mọi lần gọi với tham số khác nhau.
+    - Chưa cài hàm (chưa chạy migration): dựng lại SQL với literal đã escape và gửi qua exec_sql.
+    """
+
+    def __init__(self, name, params, sql):
+        self.name = name
+        self.params = params    # [(tên, kiểu Postgres)]
+        self.sql = sql
+
+    def create_sql(self):
+        """Câu CREATE FUNCTION cho migration."""
+        args = ", ".join(f"{name} {pg_type} DEFAULT NULL" for name, pg_type in self.params)
+        return (
+            f"CREATE OR REPLACE FUNCTION {self.name}({args})\n"
+            f"RETURNS SETOF json\n"
+            f"LANGUAGE plpgsql STABLE\n"
+            f"AS $fn$\n"
+            f"BEGIN\n"
+            f"    RETURN QUERY SELECT row_to_json(t) FROM ({self.sql}\n    ) t;\n"
+            f"END;\n"
+            f"$fn$;\n"
+        )
+
+    def literal_sql(self, args):
+        """SQL thuần (tham số thay bằng literal có ép kiểu) cho đường exec_sql."""
+        types = dict(self.params)
+
+        def replace(match):
+            name = match.group(0)
+            if name not in types:
+                return name
+            return to_literal(args.get(name), types[name])
+
+        return re.sub(r"\bp_\w+\b", replace, self.sql)
+
+
+def to_literal(value, pg_type):
+    if value is None:
+        return f"NULL::{pg_type}"
+    if isinstance(value, (list, tuple, set)):
+        element_type = pg_type[:-2]
+        items = ", ".join(to_literal(item, element_type) for item in value)
+        return f"ARRAY[{items}]::{pg_type}"
+    if isinstance(value, bool):
+        return "TRUE" if value else "FALSE"
+    if isinstance(value, (int, float)):
+        return f"{value!r}::{pg_type}"
+    # standard_conforming_strings = on → chỉ cần nhân đôi dấu nháy đơn
+    return "'" + str(value).replace("'", "''") + f"'::{pg_type}"
+
+
+STATEMENTS = {}
+
+
+def statement(name, params, sql):
+    STATEMENTS[name] = Statement(name, params, sql)
+    return STATEMENTS[name]
+
+
+statement("shoppy_product_fingerprints", [], """
+        SELECT
+            p.product_id,
+            md5(p::text || coalesce(l::text, '') || coalesce(agg.body, '')) AS fingerprint
+        FROM product p
+        LEFT JOIN location l ON p.location_id = l.location_id
+        LEFT JOIN (
+            SELECT
+                ps.product_id,
+                string_agg(
+                    ps::text || coalesce(s::text, '') || coalesce(pi::text, ''),
+                    '|' ORDER BY ps.ps_id, pi.image_id
+                ) AS body
+            FROM product_store ps
+            LEFT JOIN store s ON s.store_id = ps.store_id
+            LEFT JOIN product_images pi ON pi.ps_id = ps.ps_id
+            GROUP BY ps.product_id
+        ) agg ON agg.product_id = p.product_id""")
+
+# Dạng gom nhóm (json_agg): 1 dòng / product
+statement("shoppy_catalog_nested", [], nested_product_select("TRUE"))
+
+statement("shoppy_products_nested_by_search", [("p_terms", "text[]")], nested_product_select("""EXISTS (
+            SELECT 1 FROM unnest(p_terms) AS term
+            WHERE unaccent(lower(p.name)) LIKE '%' || unaccent(lower(term)) || '%'
+        )"""))
+
+statement("shoppy_product_nested", [("p_product_id", "bigint"), ("p_store_id", "bigint")], nested_product_select(
+    "p.product_id = p_product_id",
+    "(p_store_id IS NULL OR s.store_id = p_store_id)",
+))
+
+# Có bộ lọc mà không còn store nào thỏa → bỏ luôn product (giống bản phẳng)
+statement("shoppy_products_nested_by_ids", [
+    ("p_product_ids", "bigint[]"),
+    ("p_price_low", "numeric"),
+    ("p_price_high", "numeric"),
+    ("p_store_ids", "bigint[]"),
+], nested_product_select(
+    """p.product_id = ANY(p_product_ids)
+          AND ((p_price_low IS NULL AND p_store_ids IS NULL) OR stores.items IS NOT NULL)""",
+    STORE_FILTER,
+))
+
+# Nhiều cặp (product_id, store_id) trong 1 lần gọi: p_product_ids[i] đi cùng p_store_ids[i];
+# mỗi product chỉ giữ các store nằm trong danh sách cặp, product không còn store nào bị bỏ
+statement("shoppy_product_store_pairs", [
+    ("p_product_ids", "bigint[]"),
+    ("p_store_ids", "bigint[]"),
+], nested_product_select(
+    "p.product_id = ANY(p_product_ids) AND stores.items IS NOT NULL",
+    """(ps.product_id, ps.store_id) IN (
+                SELECT pair.product_id, pair.store_id
+                FROM unnest(p_product_ids, p_store_ids) AS pair(product_id, store_id)
+            )""",
+))
+
+statement("shoppy_location_by_name", [("p_name", "text")], f"""
+        {LOCATION_SELECT}
+        WHERE unaccent(lower(name)) LIKE '%' || unaccent(lower(p_name)) || '%'
+        LIMIT 1""")
+
+statement("shoppy_locations", [], f"""
+        {LOCATION_SELECT}
+        ORDER BY location_id""")
+
+statement("shoppy_location_by_gps", [("p_lat", "double precision"), ("p_lon", "double precision")], f"""
+        {LOCATION_SELECT}
+        WHERE p_lat BETWEEN min_lat AND max_lat
+          AND p_lon BETWEEN min_long AND max_long
+        LIMIT 1""")
+
+statement("shoppy_products_by_location", [("p_location_id", "bigint"), ("p_limit", "integer")], """
+        SELECT DISTINCT
+            p.product_id,
+            p.name AS product_name,
+            p.image_url AS product_image_url,
+            p.tag AS product_tag,
+            p.min_cost AS product_min_cost,
+            p.max_cost AS product_max_cost
+        FROM product p
+        WHERE p.location_id = p_location_id
+        LIMIT p_limit""")
+
+statement("shoppy_product_stores", [("p_product_id", "bigint")], """
+        SELECT
+            p.product_id,
+            p.name AS product_name,
+            p.des AS product_des,
+            p.image_url AS product_image_url,
+
+            s.store_id,
+            s.name AS store_name,
+            s.address AS store_address,
+            s.lat AS store_lat,
+            s.long AS store_long,
+
+            ps.ps_id,
+            ps.average_rating AS ps_average_rating,
+            ps.total_reviews AS ps_total_reviews,
+            ps.min_price_store AS ps_min_price_store,
+            ps.max_price_store AS ps_max_price_store,
+
+            pi.image_id AS pi_image_id,
+            pi.image_url AS pi_image_url,
+            pi.type AS pi_type
+
+        FROM product p
+        INNER JOIN product_store ps ON ps.product_id = p.product_id
+        INNER JOIN store s ON s.store_id = ps.store_id
+        LEFT JOIN product_images pi ON pi.ps_id = ps.ps_id
+        WHERE p.product_id = p_product_id""")
+
+
+# Các hàm chưa có trên DB (đã thử RPC và bị báo thiếu) → đi thẳng exec_sql
+_missing_functions = set()
+
+
+def run_exec_sql(name, **args):
+    stmt = STATEMENTS[name]
+    result = supabase.rpc("exec_sql", {"sql": stmt.literal_sql(args)}).execute()
+    return result.data
+
+
+def run_rpc(name, **args):
+    result = supabase.rpc(name, args).execute()
+    return result.data
+
+
+def run(name, **args):
+    """
+    Chạy câu truy vấn có tên với tham số (tên tham số = tên trong định nghĩa, VD p_terms=[...]).
+    Ưu tiên hàm RPC đã cài sẵn trên DB; chưa cài → fallback exec_sql (in cảnh báo 1 lần).
+    """
+    if name not in _missing_functions:
+        try:
+            return run_rpc(name, **args)
+        except APIError as e:
+            if e.code != FUNCTION_NOT_FOUND:
+                raise
+            _missing_functions.add(name)
+            print(f"⚠️ [QUERY] Chưa có hàm {name} trên DB (chạy `python -m database.queries --sql`), dùng exec_sql")
+    return run_exec_sql(name, **args)
+
+
+def to_int_ids(values):
+    """Ép danh sách id sang int, bỏ các giá trị không hợp lệ."""
+    ids = []
+    for value in values:
+        try:
+            ids.append(int(value))
+        except (TypeError, ValueError):
+            continue
+    return ids
+
+
+# Chạy từ thư mục api/:
+#   python -m database.queries --sql  → in migration (CREATE FUNCTION) để chạy trong SQL editor
+#   python -m database.queries        → so sánh độ trễ exec_sql vs RPC (nên trỏ .env vào Supabase local: `supabase start`)
+if __name__ == "__main__":
+    import sys
+    import time
+
+    if "--sql" in sys.argv:
+        print("-- Sinh từ api/database/queries.py, chạy lại sau mỗi lần sửa câu truy vấn\n")
+        # plpgsql chỉ resolve tên hàm lúc gọi: thiếu unaccent thì migration vẫn chạy được
+        # nhưng RPC tìm kiếm/tên location lỗi (DB mới, VD `supabase start`, chưa bật sẵn)
+        print("CREATE EXTENSION IF NOT EXISTS unaccent;\n")
+        for stmt in STATEMENTS.values():
+            print(stmt.create_sql())
+        sys.exit(0)
+
+    sample_ids = [row["product_id"] for row in (run_exec_sql("shoppy_product_fingerprints") or [])][:50]
+    cases = [
+        ("shoppy_products_nested_by_search", {"p_terms": ["com tam", "bun"]}),
+        ("shoppy_product_nested", {"p_product_id": sample_ids[0] if sample_ids else 1}),
+        ("shoppy_products_nested_by_ids", {"p_product_ids": sample_ids, "p_price_low": 30000, "p_price_high": 50000}),
+        ("shoppy_location_by_gps", {"p_lat": 21.0285, "p_lon": 105.8542}),
+        ("shoppy_products_by_location", {"p_location_id": 1, "p_limit": 20}),
+    ]
+    rounds = 30
+
+    def measure(fn, name, args):
+        fn(name, **args)  # khởi động (kết nối, cache plan)
+        t0 = time.perf_counter()
+        for _ in range(rounds):
+            rows = fn(name, **args)
+        return (time.perf_counter() - t0) / rounds * 1000, rows
+
+    def canonical(rows):
+        return sorted(json.dumps(row, sort_keys=True, default=str) for row in rows or [])
+
+    for name, args in cases:
+        exec_ms, exec_rows = measure(run_exec_sql, name, args)
+        try:
+            rpc_ms, rpc_rows = measure(run_rpc, name, args)
+        except APIError as e:
+            print(f"{name:30} exec_sql {exec_ms:7.2f} ms | RPC lỗi: {e.code} {e.message}")
+            continue
+        same = "khớp" if canonical(exec_rows) == canonical(rpc_rows) else "KHÁC"
+        print(f"{name:30} exec_sql {exec_ms:7.2f} ms | RPC {rpc_ms:7.2f} ms | {len(rpc_rows or [])} dòng, {same}")
@@ -24,6 +24,10 @@ from routes.location_routes import location_bp
 from routes.cart_routes import cart_bp
 from routes.product_summary_routes import product_summary_bp
 from routes.suggest_routes import suggest_bp
+from routes.store_routes import store_bp
+from services.search_service import query_fix_cache, search_cache
+from services.location_service import location_fix_cache
+from services.product_store_cache import product_store_cache
 
 # -----------------------------------------------------
 # KHỞI TẠO APP
@@ -45,7 +49,7 @@ CORS(
             "origins": "*", 
             "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
             "allow_headers": ["Content-Type", "Authorization"],
-            "expose_headers": ["Content-Type", "Authorization"],
+            "expose_headers": ["Content-Type", "Authorization", "X-Next-Cursor", "ETag"],
             "supports_credentials": True, 
         }
     },
@@ -66,6 +70,7 @@ app.register_blueprint(location_bp)
 app.register_blueprint(cart_bp)
 app.register_blueprint(product_summary_bp)
 app.register_blueprint(suggest_bp)
+app.register_blueprint(store_bp)
 
 # -----------------------------------------------------
 # [QUAN TRỌNG] ROUTE KIỂM TRA
@@ -75,7 +80,14 @@ app.register_blueprint(suggest_bp)
 def health_check():
     return jsonify({
         "status": "active",
-        "message": "Backend Flask đang chạy ngon lành trên Vercel!"
+        "message": "Backend Flask đang chạy ngon lành trên Vercel!",
+        # Thống kê hit/miss của các cache trong worker này
+        "caches": {
+            "groq_fix_query": query_fix_cache.stats(),
+            "groq_fix_location": location_fix_cache.stats(),
+            "search_results": search_cache.stats(),
+            "product_store": product_store_cache.stats(),
+        }
     })
 
 # [SỬA 2] Đã XOÁ hoàn toàn các route @app.route("/") và serve_static
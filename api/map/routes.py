@@ -5,6 +5,11 @@ from supabase import create_client, Client
 from dotenv import load_dotenv
 from pathlib import Path
 
+from database.fetch_data import fetch_stores
+from services.store_index_service import StoreIndex
+from services.search_service import catalog
+from services.conditional_get import make_etag, not_modified, add_etag
+
 # Import blueprint đã tạo ở __init__.py
 from . import map_bp
 
@@ -31,6 +36,12 @@ if SUPABASE_URL and SUPABASE_KEY:
     except Exception as e:
         print(f"[Map Module] Error init Supabase: {e}")
 
+# Danh sách store của map giữ trong RAM (tự nạp lại theo chu kỳ), đọc bằng client riêng của module map
+map_store_index = StoreIndex(fetch=lambda: fetch_stores(supabase))
+# Catalog phát hiện thay đổi (fingerprint gồm cả store của product) → nạp lại ngay, không đợi hết chu kỳ
+# → ETag của map đổi cùng lúc với /api/products
+catalog.on_change(lambda product_ids: map_store_index.invalidate())
+
 # ----------------------------
 # 2) Các API Routes (Gắn vào map_bp)
 # ----------------------------
@@ -42,33 +53,15 @@ def get_stores():
         return jsonify({"error": "Supabase connection failed"}), 500
 
     try:
-        response = supabase.table('store').select(
-            'store_id, name, address, lat, long, product_store(product(tag))'
-        ).execute()
-        
-        raw_data = response.data
-        stores_list = []
-
-        for item in raw_data:
-            tags = []
-            if item.get('product_store'):
-                for relation in item['product_store']:
-                    if relation.get('product') and relation['product'].get('tag'):
-                        tag_val = relation['product']['tag']
-                        if tag_val:
-                            tags.append(tag_val.strip().lower())
-
-            store_obj = {
-                "store_id": item['store_id'],
-                "name": item['name'],
-                "address": item['address'],
-                "lat": item['lat'],
-                "long": item['long'],
-                "tags": list(set(tags))
-            }
-            stores_list.append(store_obj)
-
-        return jsonify(stores_list)
+        map_store_index.ensure_loaded()
+
+        # Danh sách store chưa đổi → 304, không gửi lại toàn bộ payload
+        etag = make_etag(map_store_index.version)
+        cached = not_modified(etag)
+        if cached is not None:
+            return cached
+
+        return add_etag(jsonify(map_store_index.stores()), etag)
 
     except Exception as e:
         print(f"[Map API Error] {e}")
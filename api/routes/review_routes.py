@@ -1,6 +1,7 @@
 import sqlite3
 from flask import Blueprint, request, jsonify
 import os 
+from services.product_store_cache import cached_product_store
 
 # Khai báo Blueprint cho Reviews
 review_bp = Blueprint('review_bp', __name__, url_prefix='/api')
@@ -60,24 +61,17 @@ def ps_id_lookup():
 def get_product_details(ps_id):
     conn = get_db_connection()
     try:
+        # Giá và rating/số review (bảng reviews chỉ có ở DB này)
         query = """
             SELECT 
                 ps.ps_id,
-                p.product_id,       /* BỔ SUNG CHO GIỎ HÀNG */
-                s.store_id,         /* BỔ SUNG CHO GIỎ HÀNG */
+                ps.product_id,      /* BỔ SUNG CHO GIỎ HÀNG */
+                ps.store_id,        /* BỔ SUNG CHO GIỎ HÀNG */
                 ps.cost AS price,
-                p.name AS original_product_name,
-                p.des AS description,
-                s.name AS store_name,       
-                s.address AS store_address,
-                (SELECT image_url FROM product_images WHERE ps_id = ps.ps_id LIMIT 1) AS real_img,
-                p.image_url AS fallback_img,
                 /* BỔ SUNG: Lấy Rating và Review Count */
                 COALESCE(AVG(r.rating), 0) AS average_rating,
                 COUNT(r.review_id) AS review_count
             FROM product_store ps
-            JOIN product p ON ps.product_id = p.product_id
-            JOIN store s ON ps.store_id = s.store_id
             LEFT JOIN reviews r ON ps.ps_id = r.ps_id
             WHERE ps.ps_id = ?
             GROUP BY ps.ps_id
@@ -87,19 +81,26 @@ def get_product_details(ps_id):
         if row is None:
             return jsonify({"error": "Không tìm thấy sản phẩm"}), 404
 
-        # Logic chọn ảnh
-        final_img = row['real_img'] if row['real_img'] else row['fallback_img']
+        # Tên, mô tả, địa chỉ, ảnh: JOIN trên DB này; chỉ dùng lại cache product-store
+        # (giỏ hàng / product_summary đã nạp) khi đang có sẵn, không gọi sang Supabase.
+        # Cache dùng id của Supabase → chỉ nhận khi ps_id cũng khớp (cùng 1 bản ghi product_store)
+        detail = cached_product_store(row['product_id'], row['store_id'])
+        if detail and detail["store"][0].get("ps_id") != row['ps_id']:
+            detail = None
+        info = detail_fields(detail) if detail else detail_fields_from_db(conn, ps_id)
+        if info is None:
+            return jsonify({"error": "Không tìm thấy sản phẩm"}), 404
 
         return jsonify({
             "id": row['ps_id'],
             "product_id": row['product_id'],   
             "store_id": row['store_id'],    
-            "name": row['store_name'],                 
-            "sub_name": row['original_product_name'],  
+            "name": info['store_name'],                 
+            "sub_name": info['original_product_name'],  
             "price": row['price'] if row['price'] else 0,
-            "img": final_img,                          
-            "description": row['description'] if row['description'] else "",
-            "address": row['store_address'],
+            "img": info['img'],                          
+            "description": info['description'] if info['description'] else "",
+            "address": info['store_address'],
             "rating": round(row['average_rating'], 1), 
             "review_count": row['review_count']       
         })
@@ -108,6 +109,49 @@ def get_product_details(ps_id):
     finally:
         conn.close()
 
+
+def detail_fields(detail):
+    """Các field hiển thị của /product_detail từ chi tiết product-store đã gom nhóm."""
+    product = detail["product"]
+    store = detail["store"][0]
+    # Logic chọn ảnh: ảnh của cửa hàng, không có thì ảnh gốc của sản phẩm
+    images = [image for image in store.get("product_images") or [] if image.get("ps_image_url")]
+    return {
+        "store_name": store.get("store_name"),
+        "original_product_name": product.get("product_name"),
+        "description": product.get("product_des"),
+        "store_address": store.get("store_address"),
+        "img": images[0]["ps_image_url"] if images else product.get("product_image_url"),
+    }
+
+
+def detail_fields_from_db(conn, ps_id):
+    """Như detail_fields nhưng JOIN product/store/product_images trên DB này (None nếu không có)."""
+    row = conn.execute("""
+        SELECT
+            p.name AS original_product_name,
+            p.des AS description,
+            s.name AS store_name,       
+            s.address AS store_address,
+            (SELECT image_url FROM product_images WHERE ps_id = ps.ps_id LIMIT 1) AS real_img,
+            p.image_url AS fallback_img
+        FROM product_store ps
+        JOIN product p ON ps.product_id = p.product_id
+        JOIN store s ON ps.store_id = s.store_id
+        WHERE ps.ps_id = ?
+    """, (ps_id,)).fetchone()
+    if row is None:
+        return None
+
+    # Logic chọn ảnh
+    return {
+        "store_name": row['store_name'],
+        "original_product_name": row['original_product_name'],
+        "description": row['description'],
+        "store_address": row['store_address'],
+        "img": row['real_img'] if row['real_img'] else row['fallback_img'],
+    }
+
 # --------------------------------------------------------
 # 2. API LẤY REVIEW THEO PS_ID (GIỮ NGUYÊN)
 # Endpoint: /api/reviews/<ps_id>
@@ -1,114 +1,136 @@
+import asyncio
+
 from flask import Blueprint, jsonify, request, session
 
 # Import các module từ database và services
-from services.search_service import search_product
+from services.search_service import (
+    search_page, suggest_products, catalog_version, PRICE_RANGES, DEFAULT_SUGGEST_LIMIT, MAX_SUGGEST_LIMIT
+)
+from services.pagination import parse_limit
+from services.product_serializer import serialize_products, json_response
+from services.conditional_get import make_etag, not_modified, add_etag
+from services.correction_cache import normalize_query
+from services.async_search_service import search_page_async, search_by_image_async
 from API.API_groq_search_image import groq_search_product_by_image
 
 # 1. Khởi tạo Blueprint thay vì Flask app
 search_bp = Blueprint("search", __name__)
 
 
-# 2. API tìm kiếm sản phẩm thông thường
-@search_bp.route("/api/products")
-def api_products():
-    search_text = request.args.get("search", "")
+def product_search_args():
+    """Tham số tìm kiếm của /api/products (dùng chung cho bản sync và async)."""
     distance_filter = request.args.get("distance", "")
     price_filter = request.args.get("price", "")
+    return {
+        "search_text": request.args.get("search", ""),
+        "user_lat": session.get("user_lat"),
+        "user_lon": session.get("user_long"),
+        "max_distance": float(distance_filter) if distance_filter else None,
+        "price_range": PRICE_RANGES.get(price_filter) if price_filter else None,
+        "limit": parse_limit(request.args.get("limit")),
+        "cursor": request.args.get("cursor"),
+    }
+
+
+def products_etag(args, fixed_query=None):
+    # Catalog không đổi + cùng tham số + cùng vị trí (+ cùng query Groq đã sửa) → client đã có đúng dữ liệu này
+    return make_etag(
+        catalog_version(load=True), sorted(request.args.items(multi=True)), args["user_lat"], args["user_lon"],
+        fixed_query,
+    )
+
+
+def page_etag(args, etag, results, fixed_query):
+    """
+    ETag của trang vừa tính. Trang không qua LLM → etag kiểm tra trước khi tìm (khớp tên/sửa cục bộ
+    chỉ phụ thuộc catalog nên vẫn đúng). Trang phụ thuộc Groq → gắn query đã sửa vào ETag;
+    Groq lỗi/timeout (trả lại query gốc) hoặc trang rỗng → không gửi ETag, lần sau phải tìm lại.
+    """
+    if fixed_query is None:
+        return etag
+    if not results or normalize_query(fixed_query) == normalize_query(args["search_text"]):
+        return None
+    return products_etag(args, fixed_query)
+
 
-    user_lat = session.get("user_lat")
-    user_lon = session.get("user_long")
-
-    results = search_product(search_text, user_lat, user_lon)
-
-    # Lọc khoảng cách
-    if distance_filter:
-        max_dist = float(distance_filter)
-        for r in results:
-            r["store"] = [
-                s
-                for s in r["store"]
-                if s.get("distance_km") is not None and s["distance_km"] <= max_dist
-            ]
-        results = [r for r in results if r["store"]]
-
-    if price_filter:
-        ranges = {
-            "1": (0, 50000),
-            "2": (50000, 100000),
-            "3": (100000, 200000),
-            "4": (200000, 500000),
-            "5": (500000, 1000000),
-            "6": (1000000, float("inf")),
-        }
-        if price_filter in ranges:
-            low, high = ranges[price_filter]
-            for r in results:
-                r["store"] = [
-                    s
-                    for s in r["store"]
-                    if s.get("ps_min_price_store") is not None
-                    and s.get("ps_max_price_store") is not None
-                    and (
-                        (low <= s["ps_min_price_store"] <= high)
-                        or (low <= s["ps_max_price_store"] <= high)
-                        or (
-                            s["ps_min_price_store"] <= low
-                            and s["ps_max_price_store"] >= high
-                        )
-                    )
-                ]
-            results = [r for r in results if r["store"]]
+def products_response(args, etag, results, next_cursor, fixed_query):
+    etag = page_etag(args, etag, results, fixed_query)
+    if fixed_query is not None:
+        # ETag đã có query Groq sửa → so lại If-None-Match của client
+        cached = not_modified(etag)
+        if cached is not None:
+            return cached
 
     # Format dữ liệu cho JavaScript
-    products = []
-    for p in results:
-        first_store = p["store"][0] if p["store"] else {}
+    response = json_response(serialize_products(results))
+    # Body vẫn là mảng sản phẩm; cursor trang sau nằm ở header (rỗng = hết dữ liệu)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return add_etag(response, etag)
 
-        products.append(
-            {
-                "product_id": p["product"].get("product_id", 0),
-                "product_name": p["product"].get("product_name", "Không có tên"),
-                "product_des": p["product"].get("product_des", ""),
-                "product_image_url": p["product"].get(
-                    "product_image_url", "image/products/default.jpg"
-                ),
-                "location_name": p["location"].get("location_name", ""),
-                "product_min_cost": p["product"].get("product_min_cost", ""),
-                "product_max_cost": p["product"].get("product_max_cost", ""),
-                "stores": [
-                    {
-                        "store_id": store.get("store_id"),
-                        "store_name": store.get("store_name"),
-                        "store_address": store.get("store_address"),
-                        "store_lat": store.get("store_lat"),
-                        "store_long": store.get("store_long"),
-                        "distance_km": store.get("distance_km"),
-                        "ps_min_price_store": store.get("ps_min_price_store"),
-                        "ps_max_price_store": store.get("ps_max_price_store"),
-                        "product_images": [
-                            {
-                                "ps_id": img.get("ps_id"),
-                                "ps_image_id": img.get("ps_image_id"),
-                                "ps_image_url": img.get("ps_image_url"),
-                                "ps_type": img.get("ps_type"),
-                            }
-                            for img in store.get("product_images", [])
-                        ],
-                    }
-                    for store in p.get("store", [])
-                ],
-            }
-        )
 
-    return jsonify(products)
+# 2. API tìm kiếm sản phẩm thông thường
+@search_bp.route("/api/products")
+def api_products():
+    args = product_search_args()
+    etag = products_etag(args)
+    cached = not_modified(etag)
+    if cached is not None:
+        return cached
+
+    # Lọc khoảng cách và giá được đẩy xuống tầng lấy dữ liệu (chỉ mục + SQL);
+    # kết quả xếp theo độ liên quan, chỉ trang hiện tại được lấy dữ liệu chi tiết
+    try:
+        results, next_cursor, fixed_query = search_page(**args)
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+
+    return products_response(args, etag, results, next_cursor, fixed_query)
+
+
+# 2b. Bản async của /api/products: Supabase/Groq gọi bằng httpx async, có deadline cho cả request
+@search_bp.route("/api/async/products")
+async def api_products_async():
+    args = product_search_args()
+    etag = products_etag(args)
+    cached = not_modified(etag)
+    if cached is not None:
+        return cached
+
+    try:
+        results, next_cursor, fixed_query = await search_page_async(**args)
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    except asyncio.TimeoutError:
+        return jsonify({"status": "error", "message": "Hết thời gian xử lý tìm kiếm"}), 504
+
+    return products_response(args, etag, results, next_cursor, fixed_query)
+
 
+# 3. API gợi ý khi đang gõ (typeahead): chỉ đọc chỉ mục tiền tố trong RAM, không gọi DB
+@search_bp.route("/api/products/suggest")
+def api_products_suggest():
+    prefix = request.args.get("q", "")
+    try:
+        limit = int(request.args.get("limit", DEFAULT_SUGGEST_LIMIT))
+    except ValueError:
+        limit = DEFAULT_SUGGEST_LIMIT
+    limit = max(1, min(limit, MAX_SUGGEST_LIMIT))
+
+    try:
+        return json_response(suggest_products(prefix, limit))
+    except Exception as e:
+        print(f"❌ Error in product suggest: {str(e)}")
+        return jsonify({"status": "error", "message": "Lỗi server nội bộ"}), 500
 
-# 3. API tìm kiếm bằng hình ảnh - ĐÃ SỬA: Không dùng fetch_product_names
+
+# 4. API tìm kiếm bằng hình ảnh - ĐÃ SỬA: Không dùng fetch_product_names
 @search_bp.route("/api/search-by-image", methods=["POST"])
 def handle_image_search_api():
     """
     API nhận ảnh từ frontend và tìm sản phẩm
-    Expected JSON: { "image": "base64_string_or_url" }
+    Expected JSON: { "image": "base64_string_or_url", "limit": 50 (tùy chọn) }
+    Trang tiếp theo: /api/products?search=<search_term>&cursor=<next_cursor>
     """
     try:
         if not request.is_json:
@@ -128,55 +150,20 @@ def handle_image_search_api():
             user_lat = session.get("user_lat")
             user_lon = session.get("user_long")
 
-            # Sử dụng hàm search_product hiện có để tìm kiếm
-            search_results = search_product(recognized_product, user_lat, user_lon)
+            # Dùng chung luồng tìm kiếm (xếp hạng + phân trang) với API thông thường
+            search_results, next_cursor, _ = search_page(
+                recognized_product, user_lat, user_lon, limit=parse_limit(data.get("limit"))
+            )
 
             # Format kết quả giống như API thông thường
-            formatted_products = []
-            for p in search_results:
-                formatted_products.append(
-                    {
-                        "product_id": p["product"].get("product_id", 0),
-                        "product_name": p["product"].get(
-                            "product_name", "Không có tên"
-                        ),
-                        "product_des": p["product"].get("product_des", ""),
-                        "product_image_url": p["product"].get(
-                            "product_image_url", "image/products/default.jpg"
-                        ),
-                        "location_name": p["location"].get("location_name", ""),
-                        "product_min_cost": p["product"].get("product_min_cost", ""),
-                        "product_max_cost": p["product"].get("product_max_cost", ""),
-                        "stores": [
-                            {
-                                "store_id": store.get("store_id"),
-                                "store_name": store.get("store_name"),
-                                "store_address": store.get("store_address"),
-                                "store_lat": store.get("store_lat"),
-                                "store_long": store.get("store_long"),
-                                "distance_km": store.get("distance_km"),
-                                "ps_min_price_store": store.get("ps_min_price_store"),
-                                "ps_max_price_store": store.get("ps_max_price_store"),
-                                "product_images": [
-                                    {
-                                        "ps_id": img.get("ps_id"),
-                                        "ps_image_id": img.get("ps_image_id"),
-                                        "ps_image_url": img.get("ps_image_url"),
-                                        "ps_type": img.get("ps_type"),
-                                    }
-                                    for img in store.get("product_images", [])
-                                ],
-                            }
-                            for store in p.get("store", [])
-                        ],
-                    }
-                )
+            formatted_products = serialize_products(search_results)
 
-            return jsonify(
+            return json_response(
                 {
                     "status": "success",
                     "products": formatted_products,
                     "search_term": recognized_product,
+                    "next_cursor": next_cursor,
                     "message": f"Tìm thấy {len(formatted_products)} sản phẩm phù hợp",
                 }
             )
@@ -192,3 +179,46 @@ def handle_image_search_api():
     except Exception as e:
         print(f"❌ Error in image search: {str(e)}")
         return jsonify({"status": "error", "message": f"Lỗi xử lý: {str(e)}"}), 500
+
+
+# 5. Bản async của /api/search-by-image: lấy danh sách sản phẩm và tải ảnh chạy song song, có deadline
+@search_bp.route("/api/async/search-by-image", methods=["POST"])
+async def handle_image_search_api_async():
+    try:
+        if not request.is_json:
+            return jsonify({"status": "error", "message": "Request phải là JSON"}), 400
+
+        data = request.get_json()
+        if "image" not in data:
+            return jsonify({"status": "error", "message": "Thiếu dữ liệu ảnh"}), 400
+
+        recognized_product, search_results, next_cursor = await search_by_image_async(
+            data["image"], session.get("user_lat"), session.get("user_long"), limit=parse_limit(data.get("limit"))
+        )
+
+        if not recognized_product:
+            return jsonify(
+                {
+                    "status": "not_found",
+                    "products": [],
+                    "message": "Không tìm thấy sản phẩm phù hợp trong ảnh",
+                }
+            )
+
+        formatted_products = serialize_products(search_results)
+        return json_response(
+            {
+                "status": "success",
+                "products": formatted_products,
+                "search_term": recognized_product,
+                "next_cursor": next_cursor,
+                "message": f"Tìm thấy {len(formatted_products)} sản phẩm phù hợp",
+            }
+        )
+
+    except asyncio.TimeoutError:
+        return jsonify({"status": "error", "message": "Hết thời gian xử lý ảnh"}), 504
+
+    except Exception as e:
+        print(f"❌ Error in async image search: {str(e)}")
+        return jsonify({"status": "error", "message": f"Lỗi xử lý: {str(e)}"}), 500
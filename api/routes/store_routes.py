@@ -0,0 +1,35 @@
+from flask import Blueprint, jsonify, request, session
+
+from services.store_index_service import store_index
+
+# Khởi tạo Blueprint
+store_bp = Blueprint("store", __name__)
+
+MAX_NEARBY_STORES = 100
+
+
+@store_bp.route("/api/stores/nearby")
+def get_nearby_stores():
+    """
+    Cửa hàng gần nhất quanh 1 điểm (mặc định: vị trí user trong session).
+    Query: lat, long, k (mặc định 10, tối đa 100), radius (km, tùy chọn)
+    """
+    lat = request.args.get("lat", type=float)
+    lon = request.args.get("long", type=float)
+    if lat is None or lon is None:
+        lat = session.get("user_lat")
+        lon = session.get("user_long")
+
+    if lat is None or lon is None:
+        return jsonify({"status": "error", "message": "Thiếu toạ độ (lat, long)"}), 400
+
+    k = request.args.get("k", default=10, type=int)
+    k = max(1, min(k, MAX_NEARBY_STORES))
+    radius = request.args.get("radius", type=float)
+
+    try:
+        stores = store_index.nearby(float(lat), float(lon), k=k, radius_km=radius)
+        return jsonify(stores)
+    except Exception as e:
+        print(f"❌ Error in get_nearby_stores: {str(e)}")
+        return jsonify({"status": "error", "message": "Lỗi server nội bộ"}), 500
@@ -1,10 +1,11 @@
 from flask import Blueprint, jsonify, request, session
 from database.fetch_data_for_suggest_product import (
     fetch_products_by_location,
-    fetch_location_by_gps,
     fetch_location_by_name,
 )
-from API.API_groq_fix_location import get_standard_location
+from services.location_index_service import find_location_by_gps
+from services.location_service import standardize_location
+from services.suggestion_service import location_suggestions
 
 # Khởi tạo Blueprint
 suggest_bp = Blueprint("suggest", __name__)
@@ -30,11 +31,11 @@ def post_suggest_products():
         # Tìm location theo thứ tự ưu tiên: location_name > GPS > mặc định
         target_location = None
 
-        # Ưu tiên 1: Tìm theo tên địa điểm (có chuẩn hóa qua Groq)
+        # Ưu tiên 1: Tìm theo tên địa điểm (chuẩn hóa bằng gazetteer, chỉ hỏi Groq khi không tra được)
         if location_name:
             try:
                 # Chuẩn hóa địa chỉ người dùng nhập (VD: "HN" -> "Hà Nội")
-                standardized_location = get_standard_location(location_name)
+                standardized_location = standardize_location(location_name)
 
                 if standardized_location:
                     print(
@@ -42,19 +43,19 @@ def post_suggest_products():
                     )
                     target_location = fetch_location_by_name(standardized_location)
                 else:
-                    # Nếu Groq không chuẩn hóa được, thử tìm trực tiếp
+                    # Nếu không chuẩn hóa được, thử tìm trực tiếp
                     print(
-                        f"⚠️ Groq không chuẩn hóa được, tìm trực tiếp: '{location_name}'"
+                        f"⚠️ Không chuẩn hóa được địa danh, tìm trực tiếp: '{location_name}'"
                     )
                     target_location = fetch_location_by_name(location_name)
             except Exception as e:
                 print(f"❌ Lỗi khi chuẩn hóa location: {str(e)}")
                 pass
 
-        # Ưu tiên 2: Tìm theo GPS (nếu chưa có location)
+        # Ưu tiên 2: Tìm theo GPS (nếu chưa có location) - tra bounding box trong RAM
         if not target_location and lat and lon:
             try:
-                target_location = fetch_location_by_gps(float(lat), float(lon))
+                target_location = find_location_by_gps(float(lat), float(lon))
             except:
                 pass
 
@@ -66,22 +67,32 @@ def post_suggest_products():
             location_id = target_location.get("location_id")
             result_location_name = target_location.get("location_name")
 
-        # Lấy sản phẩm theo location
-        products_data = fetch_products_by_location(location_id, limit)
+        # Lấy sản phẩm theo location: danh sách dựng sẵn (xếp theo đánh giá) trong RAM,
+        # có GPS thì ưu tiên sản phẩm có store gần user nhất;
+        # chỉ truy vấn DB khi catalog lỗi
+        items = None
+        try:
+            user_lat, user_lon = (float(lat), float(lon)) if lat and lon else (None, None)
+            items = location_suggestions.top(location_id, int(limit), user_lat, user_lon)
+        except Exception as e:
+            print(f"⚠️ Danh sách gợi ý lỗi, lấy trên DB: {e}")
 
-        # Format dữ liệu trả về
-        items = []
-        for row in products_data:
-            items.append(
-                {
-                    "product_id": row.get("product_id"),
-                    "product_name": row.get("product_name"),
-                    "product_image_url": row.get("product_image_url"),
-                    "product_tag": row.get("product_tag"),
-                    "min_price": row.get("product_min_cost"),
-                    "max_price": row.get("product_max_cost"),
-                }
-            )
+        if items is None:
+            products_data = fetch_products_by_location(location_id, limit)
+
+            # Format dữ liệu trả về
+            items = []
+            for row in products_data:
+                items.append(
+                    {
+                        "product_id": row.get("product_id"),
+                        "product_name": row.get("product_name"),
+                        "product_image_url": row.get("product_image_url"),
+                        "product_tag": row.get("product_tag"),
+                        "min_price": row.get("product_min_cost"),
+                        "max_price": row.get("product_max_cost"),
+                    }
+                )
 
         return (
             jsonify(
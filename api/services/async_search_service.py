@@ -0,0 +1,289 @@
+import asyncio
+import os
+
+from database.async_fetch_data import fetch_products_by_search_async, fetch_products_by_ids_async
+from database.async_queries import upstream_client
+from database.fetch_data import split_search_terms
+from API.API_groq_fix_query import async_groq_fix_query, PRODUCT_SCOPE_VERSION
+from API.API_groq_search_image import async_groq_search_product_by_image
+from services.pagination import paginate, paginate_keys, product_sort_key
+from services.search_service import (
+    HEDGED_QUERY_FIX, catalog, catalog_version, compute_search_page, filter_by_distance, filter_grouped,
+    group_products, likely_miss, local_fix_query, localize_page, lookup_search_page, make_store_filter,
+    nearby_store_ids, product_indexes, query_fix_cache, rank_matches, ranked_page, remember_search_page,
+    search_cache_plan,
+)
+
+# Bản async của luồng tìm kiếm (search_service): cùng chỉ mục/cache trong RAM, chỉ khác ở I/O:
+# Supabase (PostgREST) và Groq được gọi bằng httpx.AsyncClient, các lời gọi độc lập chạy chồng
+# lên nhau và toàn bộ request bị giới hạn bởi 1 deadline (hết hạn → hủy các lời gọi còn treo).
+
+# Deadline cho mỗi request (giây)
+SEARCH_DEADLINE_SECONDS = float(os.getenv("SEARCH_DEADLINE_SECONDS", "8"))
+IMAGE_SEARCH_DEADLINE_SECONDS = float(os.getenv("IMAGE_SEARCH_DEADLINE_SECONDS", "30"))
+# Thời gian chừa lại cho lượt fetch dữ liệu sau khi Groq sửa query xong
+FETCH_RESERVE_SECONDS = 1.5
+# Tìm theo ảnh: thời gian tối thiểu cho lượt tìm sau khi nhận diện xong (kể cả khi đã chạm deadline)
+MIN_SEARCH_SECONDS = 2.0
+
+
+class Deadline:
+    """Mốc hết hạn của 1 request theo đồng hồ của event loop."""
+
+    def __init__(self, seconds):
+        self.expires_at = asyncio.get_running_loop().time() + seconds
+
+    def remaining(self, reserve=0.0):
+        return max(0.0, self.expires_at - asyncio.get_running_loop().time() - reserve)
+
+
+async def fix_query_async(client, search_text, timeout):
+    """Như search_service.fix_query (dùng chung cache); timeout = thời gian còn lại cho Groq."""
+    cached = query_fix_cache.get(search_text, PRODUCT_SCOPE_VERSION)
+    if cached is not None:
+        return cached
+    if timeout <= 0:
+        print(f"⚠️ Hết thời gian cho Groq, dùng query gốc: {search_text}")
+        return search_text
+
+    fixed_query = await async_groq_fix_query(search_text, client, timeout=timeout)
+    if fixed_query and fixed_query != search_text:
+        query_fix_cache.set(search_text, PRODUCT_SCOPE_VERSION, fixed_query)
+    return fixed_query
+
+
+async def search_rows_async(client, search_text, price_range=None, store_ids=None):
+    """Như search_service.search_rows; chỉ đường dự phòng LIKE là gọi DB."""
+    store_filter = make_store_filter(price_range, store_ids)
+    terms = split_search_terms(search_text)
+
+    try:
+        product_ids = product_indexes.find_product_ids(terms)
+    except Exception as e:
+        print(f"⚠️ Chỉ mục tên chưa sẵn sàng, dùng LIKE trên DB: {e}")
+        products = await fetch_products_by_search_async(client, search_text) or []
+        return bool(products), None, filter_grouped(products, store_filter)
+
+    return rank_matches(product_ids, terms, store_filter)
+
+
+async def compute_search_page_async(client, deadline, search_text, user_lat=21.0285, user_lon=105.8542,
+                                    max_distance=None, price_range=None, limit=None, cursor=None):
+    """Như search_service.compute_search_page, các lời gọi mạng là async và bị giới hạn bởi deadline."""
+    search_text = (search_text or "").strip()
+
+    # Catalog/chỉ mục cửa hàng có thể phải nạp lần đầu (I/O đồng bộ) → chạy ở thread, không chặn event loop
+    await asyncio.to_thread(catalog_version, True)
+    if not search_text:
+        return await asyncio.to_thread(
+            compute_search_page, "", user_lat, user_lon, max_distance, price_range, limit, cursor
+        )
+    store_ids = await asyncio.to_thread(nearby_store_ids, user_lat, user_lon, max_distance)
+
+    # Query có vẻ sẽ trượt → sửa chính tả cục bộ trước; chỉ khi không sửa được mới gọi Groq ngay,
+    # chạy chồng với lượt tìm đầu tiên
+    predicted_miss = likely_miss(search_text)
+    local_query = local_fix_query(search_text) if predicted_miss else None
+    fix_task = None
+    if HEDGED_QUERY_FIX and predicted_miss and not local_query:
+        fix_task = asyncio.create_task(
+            fix_query_async(client, search_text, deadline.remaining(FETCH_RESERVE_SECONDS))
+        )
+
+    fixed_query = None
+    try:
+        matched, keys, products = await search_rows_async(client, search_text, price_range, store_ids)
+
+        if not matched:
+            if not predicted_miss:
+                local_query = local_fix_query(search_text)
+            if local_query:
+                print(f"📝 Sửa chính tả cục bộ: '{search_text}' -> '{local_query}'")
+                matched, keys, products = await search_rows_async(client, local_query, price_range, store_ids)
+
+        if not matched:
+            if fix_task is None:
+                fix_task = asyncio.create_task(
+                    fix_query_async(client, search_text, deadline.remaining(FETCH_RESERVE_SECONDS))
+                )
+            fixed_query = await fix_task
+            print(f"🔍 Query sau khi Groq sửa: '{fixed_query}'")
+            matched, keys, products = await search_rows_async(client, fixed_query, price_range, store_ids)
+    finally:
+        # Khác bản đồng bộ: hủy task là ngắt luôn request HTTP tới Groq
+        if fix_task is not None and not fix_task.done():
+            fix_task.cancel()
+
+    if keys is None:
+        results = list(group_products(products, user_lat, user_lon).values())
+        page, next_cursor = paginate(filter_by_distance(results, max_distance, store_ids), product_sort_key, limit, cursor)
+        return page, next_cursor, fixed_query
+
+    # Khóa chứa điểm BM25 (chỉ đổi khi tên/tag đổi) → cursor gắn với version từ vựng của catalog
+    page_keys, next_cursor = paginate_keys(keys, limit, cursor, version=catalog.vocabulary_version)
+    if not page_keys:
+        return [], None, fixed_query
+
+    products = await fetch_products_by_ids_async(
+        client, [product_id for _, product_id in page_keys], price_range=price_range, store_ids=store_ids
+    )
+    return ranked_page(page_keys, products, user_lat, user_lon, max_distance, store_ids), next_cursor, fixed_query
+
+
+async def search_page_async(search_text, user_lat=21.0285, user_lon=105.8542, max_distance=None, price_range=None,
+                            limit=None, cursor=None, deadline_seconds=SEARCH_DEADLINE_SECONDS):
+    """
+    Như search_service.search_page (dùng chung search_cache).
+    Quá deadline_seconds → asyncio.TimeoutError, mọi lời gọi còn treo bị hủy.
+    """
+    key, origin = search_cache_plan(search_text, user_lat, user_lon, max_distance, price_range, limit, cursor)
+
+    cached = lookup_search_page(key)
+    if cached is None:
+        async with upstream_client(deadline_seconds) as client:
+            deadline = Deadline(deadline_seconds)
+            cached = await asyncio.wait_for(
+                compute_search_page_async(client, deadline, search_text, *origin, price_range, limit, cursor),
+                deadline_seconds,
+            )
+        remember_search_page(key, search_text, cached)
+
+    page, next_cursor, fixed_query = cached
+    return localize_page(page, user_lat, user_lon, max_distance), next_cursor, fixed_query
+
+
+async def search_by_image_async(image_data, user_lat=21.0285, user_lon=105.8542, limit=None,
+                                deadline_seconds=IMAGE_SEARCH_DEADLINE_SECONDS):
+    """
+    Nhận diện sản phẩm trong ảnh rồi tìm như /api/products, chung 1 deadline.
+    Trả về (tên nhận diện được hoặc None, page, next_cursor).
+    """
+    deadline = Deadline(deadline_seconds)
+    async with upstream_client(deadline_seconds) as client:
+        recognized_product = await asyncio.wait_for(
+            async_groq_search_product_by_image(image_data, client), deadline_seconds
+        )
+    if not recognized_product:
+        return None, [], None
+
+    # Nhận diện ảnh đã tốn gần hết deadline → vẫn dành MIN_SEARCH_SECONDS cho lượt tìm
+    # (wait_for với timeout <= 0 hết hạn ngay, request sẽ 504 dù đã nhận diện được)
+    page, next_cursor, _ = await search_page_async(
+        recognized_product, user_lat, user_lon, limit=limit,
+        deadline_seconds=max(deadline.remaining(), MIN_SEARCH_SECONDS),
+    )
+    return recognized_product, page, next_cursor
+
+
+# Benchmark số request đồng thời / worker với upstream giả lập chạy local (Supabase + Groq có độ trễ):
+# chạy từ thư mục api/ bằng `python -m services.async_search_service`
+if __name__ == "__main__":
+    import json
+    import tempfile
+    import threading
+    import time
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    from supabase import create_client
+
+    import API.API_groq_fix_query as groq_fix_module
+    import database.async_queries as async_queries
+    import database.queries as queries
+    from services.search_service import query_fix_cache, search_page
+
+    DB_LATENCY = 0.03
+    GROQ_LATENCY = 0.2
+    N_PRODUCTS = 2000
+
+    catalog_rows = [
+        {
+            "product": {"product_id": pid, "product_name": f"Phở bò {pid}", "product_des": "", "product_image_url": "",
+                        "product_location_id": 1, "product_tag": "pho", "product_min_cost": 30000,
+                        "product_max_cost": 60000},
+            "location": {"location_id": 1, "location_name": "Hà Nội"},
+            "store": [{"store_id": pid % 50 + 1, "store_name": "Quán", "store_address": "", "store_lat": 21.0,
+                       "store_long": 105.8, "store_location_id": 1, "ps_min_price_store": 30000,
+                       "ps_max_price_store": 60000, "ps_average_rating": 4.5, "ps_total_reviews": 3,
+                       "product_images": []}],
+        }
+        for pid in range(1, N_PRODUCTS + 1)
+    ]
+    by_id = {row["product"]["product_id"]: row for row in catalog_rows}
+
+    class StubUpstream(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            if self.path == "/groq":
+                time.sleep(GROQ_LATENCY)
+                payload = {"choices": [{"message": {"content": "Phở bò"}}]}
+            else:
+                time.sleep(DB_LATENCY)
+                name = self.path.rsplit("/", 1)[-1]
+                if name == "shoppy_catalog_nested":
+                    payload = catalog_rows
+                elif name == "shoppy_product_fingerprints":
+                    payload = [{"product_id": pid, "fingerprint": "x"} for pid in by_id]
+                elif name == "shoppy_products_nested_by_ids":
+                    payload = [by_id[pid] for pid in body.get("p_product_ids", []) if pid in by_id]
+                else:
+                    payload = []
+            data = json.dumps(payload).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    ThreadingHTTPServer.request_queue_size = 256  # backlog mặc định (5) không đủ cho 50 kết nối cùng lúc
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubUpstream)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    stub_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    # Trỏ mọi upstream (sync lẫn async) về stub
+    queries.supabase = create_client(stub_url, "stub-key")
+    async_queries.REST_URL = f"{stub_url}/rest/v1"
+    groq_fix_module.GROQ_API_URL = f"{stub_url}/groq"
+    query_fix_cache.db_path = tempfile.mktemp(suffix=".db3")
+    catalog.ensure_loaded()
+
+    # Query "trượt" (phải nhờ Groq) + mỗi request 1 query khác nhau → không trúng cache nào:
+    # mỗi request = 1 lần gọi Groq + 1 lần fetch trang trên DB
+    counter = iter(range(10**9))
+
+    def next_query():
+        return f"xqz{next(counter)}"
+
+    def run_sync(n):
+        # Worker đồng bộ: xử lý lần lượt từng request
+        for _ in range(n):
+            assert search_page(next_query(), limit=20)[0]
+
+    async def run_async(n):
+        # 1 event loop: n request chạy xen kẽ
+        pages = await asyncio.gather(*(search_page_async(next_query(), limit=20) for _ in range(n)))
+        assert all(page for page, _, _ in pages)
+
+    print(f"Upstream giả lập: DB {DB_LATENCY * 1000:.0f} ms, Groq {GROQ_LATENCY * 1000:.0f} ms / lời gọi")
+    for n in (1, 10, 50):
+        t0 = time.perf_counter()
+        run_sync(n)
+        sync_s = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        asyncio.run(run_async(n))
+        async_s = time.perf_counter() - t0
+        print(f"{n:3} request đồng thời | sync {n / sync_s:6.1f} req/s ({sync_s:5.2f}s)"
+              f" | async {n / async_s:6.1f} req/s ({async_s:5.2f}s)  x{sync_s / async_s:.1f}")
+
+    # Deadline: Groq chậm hơn phần thời gian được chia → lời gọi Groq bị ngắt, request vẫn trả về đúng hạn
+    GROQ_LATENCY = 5.0
+    t0 = time.perf_counter()
+    page, _, _ = asyncio.run(search_page_async(next_query(), limit=20, deadline_seconds=2.0))
+    print(f"Deadline 2s, Groq {GROQ_LATENCY:.0f}s → trả về {len(page)} sản phẩm sau {time.perf_counter() - t0:.2f}s")
+    server.shutdown()
@@ -1,3 +1,6 @@
+import hashlib
+import json
+
 # --- Helper Functions for Data Transformation ---
 # Các hàm trợ giúp này được sử dụng để đảm bảo cấu trúc trả về giống với API /api/products
 
@@ -13,32 +16,78 @@ def extract_product_core_details(item):
         "product_max_cost": item.get("product_max_cost", ""),
     }
 
-def extract_store_details(raw_data):
-    """Trích xuất các trường cấp độ Cửa hàng (Store/Product-Store) và hình ảnh."""
-    if not raw_data or not raw_data[0]:
+def parse_cart_key(key):
+    """Key giỏ hàng "product_id_store_id" -> (product_id, store_id), key không hợp lệ -> None."""
+    if '_' not in key:
+        # Tạm thời bỏ qua key nếu không có '_' (ps_id)
+        print(f"Key '{key}' không có '_' (có thể là ps_id). Bỏ qua.")
+        return None
+
+    parts = key.split('_')
+    if len(parts) != 2:
+        print(f"Key '{key}' không hợp lệ (cần ProductID_StoreID). Bỏ qua.")
         return None
-        
-    item = raw_data[0]
-    
-    # 1. Trích xuất tất cả các hình ảnh liên quan từ các row khác nhau
-    product_images = []
-    for img_row in raw_data:
-        if img_row.get("ps_image_id"):
-            product_images.append({
-                "ps_id": img_row.get("ps_id"),
-                "ps_image_id": img_row.get("ps_image_id"),
-                "ps_image_url": img_row.get("ps_image_url"),
-                "ps_type": img_row.get("ps_type")
-            })
-            
-    # 2. Xây dựng object Store
+    return parts[0], parts[1]
+
+def store_details(store):
+    """
+    Các trường cấp độ Cửa hàng từ 1 store đã gom nhóm (ảnh nằm sẵn trong product_images).
+    Khác cách trích từ row thô (1 row / ảnh) trước đây: ảnh không có ps_image_url bị bỏ và mỗi ảnh chỉ xuất hiện
+    1 lần (DB đã lọc + gom nhóm), thay vì giữ mọi row có ps_image_id kể cả row trùng.
+    """
     return {
-        "store_id": item.get("store_id"),
-        "store_name": item.get("store_name"),
-        "store_address": item.get("store_address"),
-        "store_lat": item.get("store_lat"),
-        "store_long": item.get("store_long"),
-        "ps_min_price_store": item.get("ps_min_price_store"),
-        "ps_max_price_store": item.get("ps_max_price_store"),
-        "product_images": product_images
+        "store_id": store.get("store_id"),
+        "store_name": store.get("store_name"),
+        "store_address": store.get("store_address"),
+        "store_lat": store.get("store_lat"),
+        "store_long": store.get("store_long"),
+        "ps_min_price_store": store.get("ps_min_price_store"),
+        "ps_max_price_store": store.get("ps_max_price_store"),
+        "product_images": [
+            {
+                "ps_id": image.get("ps_id"),
+                "ps_image_id": image.get("ps_image_id"),
+                "ps_image_url": image.get("ps_image_url"),
+                "ps_type": image.get("ps_type")
+            }
+            for image in store.get("product_images") or []
+        ]
     }
+
+def build_cart_item(detail, qty):
+    """
+    Chi tiết 1 mục giỏ hàng theo định dạng product_map từ chi tiết product-store đã gom nhóm
+    ({"product", "location", "store": [1 store]}); None nếu không có store.
+    """
+    if not detail["store"]:
+        return None
+
+    product_core = extract_product_core_details({
+        **detail["product"],
+        "location_name": (detail.get("location") or {}).get("location_name"),
+    })
+    return {
+        **product_core,
+        # Trường 'stores' chỉ chứa một cửa hàng (item) duy nhất này, kèm số lượng (qty)
+        "stores": [{**store_details(detail["store"][0]), "qty": qty}]
+    }
+
+def cart_item_version(item):
+    """
+    Version nội dung của 1 mục giỏ hàng (product, store, giá, ảnh); KHÔNG tính qty
+    vì qty do client giữ. Nội dung đổi → version đổi.
+    """
+    store = item["stores"][0]
+    content = {**item, "stores": [{k: v for k, v in store.items() if k != "qty"}]}
+    raw = json.dumps(content, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.md5(raw.encode("utf-8")).hexdigest()[:16]
+
+def delta_cart_item(item, client_version):
+    """
+    Chế độ delta: client đang giữ đúng version hiện tại → chỉ trả {version, unchanged: True},
+    ngược lại trả đầy đủ kèm version mới.
+    """
+    version = cart_item_version(item)
+    if client_version == version:
+        return {"version": version, "unchanged": True}
+    return {**item, "version": version}
@@ -0,0 +1,209 @@
+import os
+import threading
+import time
+import hashlib
+
+from database.fetch_data import (
+    fetch_full_catalog,
+    fetch_product_fingerprints,
+    fetch_products_by_ids,
+)
+from utils.haversine_function import store_distances
+
+# Chu kỳ kiểm tra thay đổi của catalog (giây)
+CATALOG_REFRESH_SECONDS = int(os.getenv("CATALOG_REFRESH_SECONDS", "60"))
+
+
+class CatalogSnapshot:
+    """
+    Bản sao catalog (product -> location -> stores -> images) nằm trong RAM của worker.
+
+    - Nạp toàn bộ 1 lần ở request đầu tiên.
+    - Thread nền định kỳ lấy fingerprint từng product (1 dòng nhỏ / product),
+      chỉ nạp lại những product có fingerprint thay đổi, bỏ những product đã bị xóa.
+    - Dữ liệu lưu ở dạng đã gom nhóm và KHÔNG có khoảng cách; khoảng cách được
+      tính lại cho từng request trong products().
+    """
+
+    def __init__(self, group_products, refresh_seconds=CATALOG_REFRESH_SECONDS):
+        # group_products: hàm chuyển list product đã gom nhóm (json_agg) thành {product_id: entry}
+        self.group_products = group_products
+        self.refresh_seconds = refresh_seconds
+
+        self._entries = None       # {product_id: entry đã gom nhóm}
+        self._fingerprints = {}    # {product_id: fingerprint}
+        self.version = None        # Đổi mỗi khi catalog thay đổi, SAU khi listener đã cập nhật cache/chỉ mục
+        self.entries_version = None     # Version của _entries (đổi cùng lúc với _entries, trước listener)
+        self.vocabulary_version = None  # Chỉ đổi khi tên/tag hoặc tập product đổi (chỉ mục tên, BM25, chính tả)
+        self.loaded_at = None
+
+        self._load_lock = threading.Lock()
+        self._refresher = None
+        self._listeners = []
+
+    # ----------------------------------------------------
+    # Nạp / làm mới dữ liệu
+    # ----------------------------------------------------
+    def ensure_loaded(self):
+        if self._entries is not None:
+            return
+
+        with self._load_lock:
+            if self._entries is not None:
+                return
+
+            # Lấy fingerprint TRƯỚC dữ liệu: nếu có thay đổi xen giữa 2 lần gọi,
+            # lần refresh kế tiếp sẽ phát hiện và nạp lại.
+            fingerprints = self._fetch_fingerprints()
+            entries = self.group_products(fetch_full_catalog())
+
+            self._fingerprints = fingerprints
+            self._entries = entries
+            self.version = self.entries_version = self._compute_version(fingerprints)
+            self.vocabulary_version = self._compute_vocabulary_version(entries)
+            self.loaded_at = time.time()
+            print(f"📦 [CATALOG] Đã nạp {len(entries)} sản phẩm (version {self.version})")
+
+        self._start_refresher()
+
+    def refresh(self):
+        """Nạp lại những product có thay đổi. Trả về tập product_id đã thay đổi."""
+        if self._entries is None:
+            self.ensure_loaded()
+            return set()
+
+        fingerprints = self._fetch_fingerprints()
+        old = self._fingerprints
+
+        changed_ids = {pid for pid, fp in fingerprints.items() if old.get(pid) != fp}
+        removed_ids = set(old) - set(fingerprints)
+
+        if not changed_ids and not removed_ids:
+            self.loaded_at = time.time()
+            return set()
+
+        fresh = self.group_products(fetch_products_by_ids(changed_ids)) if changed_ids else {}
+
+        # Giữ nguyên thứ tự cũ, product mới được nối vào cuối
+        entries = {}
+        for pid, entry in self._entries.items():
+            if pid in removed_ids:
+                continue
+            entries[pid] = fresh.pop(pid, entry)
+        entries.update(fresh)
+
+        # Gán nguyên khối -> request đang đọc bản cũ không bị ảnh hưởng
+        version = self._compute_version(fingerprints)
+        self._entries = entries
+        self._fingerprints = fingerprints
+        self.entries_version = version
+        self.vocabulary_version = self._compute_vocabulary_version(entries)
+
+        # Listener (xóa cache, cập nhật chỉ mục) chạy TRƯỚC khi công bố version mới: request nào thấy
+        # version mới thì cache/chỉ mục đã là dữ liệu mới; kết quả tính xen giữa chỉ nằm dưới khóa version cũ
+        affected = changed_ids | removed_ids
+        self._notify(affected)
+        self.version = version
+        self.loaded_at = time.time()
+        print(f"🔄 [CATALOG] Làm mới {len(changed_ids)} sản phẩm, xóa {len(removed_ids)} (version {self.version})")
+        return affected
+
+    def on_change(self, callback):
+        """Đăng ký callback(product_ids) được gọi sau mỗi lần catalog thay đổi."""
+        self._listeners.append(callback)
+
+    def _notify(self, product_ids):
+        for callback in self._listeners:
+            try:
+                callback(product_ids)
+            except Exception as e:
+                print(f"⚠️ [CATALOG] Lỗi listener: {e}")
+
+    def _fetch_fingerprints(self):
+        rows = fetch_product_fingerprints() or []
+        return {row["product_id"]: row["fingerprint"] for row in rows}
+
+    @staticmethod
+    def _compute_version(fingerprints):
+        digest = hashlib.md5()
+        for pid in sorted(fingerprints, key=str):
+            digest.update(f"{pid}:{fingerprints[pid]};".encode())
+        return digest.hexdigest()[:16]
+
+    @staticmethod
+    def _compute_vocabulary_version(entries):
+        # Giá, review, ảnh, store đổi → fingerprint đổi nhưng version này giữ nguyên
+        digest = hashlib.md5()
+        for pid in sorted(entries, key=str):
+            product = entries[pid]["product"]
+            digest.update(f"{pid}:{product.get('product_name')}:{product.get('product_tag')};".encode())
+        return digest.hexdigest()[:16]
+
+    def _start_refresher(self):
+        if self._refresher is not None or self.refresh_seconds <= 0:
+            return
+
+        def loop():
+            while True:
+                time.sleep(self.refresh_seconds)
+                try:
+                    self.refresh()
+                except Exception as e:
+                    # Lỗi mạng/DB: giữ nguyên bản cũ, thử lại ở chu kỳ sau
+                    print(f"⚠️ [CATALOG] Refresh lỗi: {e}")
+
+        self._refresher = threading.Thread(target=loop, name="catalog-refresh", daemon=True)
+        self._refresher.start()
+
+    # ----------------------------------------------------
+    # Đọc dữ liệu
+    # ----------------------------------------------------
+    def entries(self):
+        """Danh sách (product_id, entry) hiện tại (entry dùng chung, KHÔNG được sửa)."""
+        self.ensure_loaded()
+        return list(self._entries.items())
+
+    def get_entry(self, product_id):
+        self.ensure_loaded()
+        return self._entries.get(product_id)
+
+    def matching_product_ids(self, product_ids, store_filter):
+        """Các product_id trong product_ids có ít nhất 1 store thỏa store_filter(store)."""
+        self.ensure_loaded()
+        entries = self._entries
+        matched = set()
+        for product_id in product_ids:
+            entry = entries.get(product_id)
+            if entry and any(store_filter(store) for store in entry["store"]):
+                matched.add(product_id)
+        return matched
+
+    def products(self, user_lat=None, user_lon=None, store_filter=None):
+        """
+        Trả về danh sách product cùng cấu trúc với build_product_map(...).values().
+        Mỗi store là bản sao (có distance_km theo vị trí user) để caller
+        thoải mái lọc/sửa mà không làm hỏng snapshot.
+        store_filter: nếu có, chỉ giữ store thỏa store_filter(store) (bỏ product không còn store nào).
+        """
+        self.ensure_loaded()
+
+        results = []
+        all_stores = []
+        for entry in self._entries.values():
+            if store_filter is None:
+                stores = [dict(store) for store in entry["store"]]
+            else:
+                stores = [dict(store) for store in entry["store"] if store_filter(store)]
+                if not stores:
+                    continue
+            all_stores.extend(stores)
+            results.append({
+                "product": entry["product"],
+                "location": entry["location"],
+                "store": stores,
+            })
+
+        # Khoảng cách của mọi store được tính trong 1 lượt vector hóa
+        for store, distance in zip(all_stores, store_distances(user_lat, user_lon, all_stores)):
+            store["distance_km"] = distance
+        return results
@@ -0,0 +1,32 @@
+import hashlib
+import json
+
+from flask import Response, request
+
+
+def make_etag(version, *parts):
+    """
+    ETag mạnh = md5(version dữ liệu + tham số request).
+    version None (dữ liệu chưa nạp) → None: không dùng ETag cho request này.
+    """
+    if version is None:
+        return None
+    raw = json.dumps([version, *parts], sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.md5(raw.encode("utf-8")).hexdigest()
+
+
+def not_modified(etag):
+    """Trả về response 304 nếu If-None-Match của client khớp etag, ngược lại None."""
+    if etag is None or not request.if_none_match.contains(etag):
+        return None
+    response = Response(status=304)
+    return add_etag(response, etag)
+
+
+def add_etag(response, etag):
+    """Gắn ETag cho response 200; no-cache = trình duyệt được lưu nhưng phải hỏi lại (If-None-Match) mỗi lần."""
+    if etag is not None and response.status_code in (200, 304):
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = "no-cache"
+        response.vary.add("Cookie")  # ETag phụ thuộc vị trí user lưu trong session
+    return response
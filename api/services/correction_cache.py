@@ -0,0 +1,163 @@
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+
+from utils.lru_cache import TTLCache
+
+# File SQLite dùng chung cho các cache kết quả LLM (Vercel chỉ cho ghi vào /tmp)
+CORRECTION_CACHE_DB_PATH = os.getenv(
+    "CORRECTION_CACHE_DB_PATH",
+    os.path.join(tempfile.gettempdir(), "shoppy_correction_cache.db3"),
+)
+
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+
+
+def normalize_query(text):
+    """Khóa cache: chữ thường, gộp khoảng trắng (giữ dấu vì LLM xử lý khác nhau)."""
+    return re.sub(r"\s+", " ", (text or "").strip().lower())
+
+
+class CorrectionCache:
+    """
+    Cache 2 tầng cho kết quả sửa/chuẩn hóa của LLM:
+    - Tầng 1: LRU trong RAM của worker (TTLCache)
+    - Tầng 2: SQLite trên đĩa, sống qua restart và dùng chung giữa các worker cùng máy
+    Khóa = (câu truy vấn đã chuẩn hóa, version của từ vựng gửi cho LLM):
+    từ vựng đổi → version đổi → kết quả cũ tự động không còn được dùng.
+    """
+
+    def __init__(self, namespace, db_path=CORRECTION_CACHE_DB_PATH,
+                 memory_size=1000, max_rows=20000, ttl=DEFAULT_TTL_SECONDS):
+        self.namespace = namespace
+        self.db_path = db_path
+        self.max_rows = max_rows
+        self.ttl = ttl
+        self.memory = TTLCache(maxsize=memory_size, ttl=ttl)
+
+        self.disk_hits = 0
+        self.misses = 0
+        self.disk_errors = 0
+        self._lock = threading.Lock()
+        self._table_ready = False
+
+    # ----------------------------------------------------
+    # SQLite
+    # ----------------------------------------------------
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=2)
+        if not self._table_ready:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS correction_cache (
+                    namespace TEXT NOT NULL,
+                    query TEXT NOT NULL,
+                    version TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    PRIMARY KEY (namespace, query, version)
+                )
+            """)
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_correction_cache_age ON correction_cache (namespace, created_at)"
+            )
+            conn.commit()
+            self._table_ready = True
+        return conn
+
+    def _disk_get(self, query, version):
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT value, created_at FROM correction_cache WHERE namespace = ? AND query = ? AND version = ?",
+                (self.namespace, query, version),
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] + self.ttl < time.time():
+                conn.execute(
+                    "DELETE FROM correction_cache WHERE namespace = ? AND query = ? AND version = ?",
+                    (self.namespace, query, version),
+                )
+                conn.commit()
+                return None
+            return row
+        finally:
+            conn.close()
+
+    def _disk_set(self, query, version, value):
+        conn = self._connect()
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO correction_cache (namespace, query, version, value, created_at) VALUES (?, ?, ?, ?, ?)",
+                (self.namespace, query, version, json.dumps(value, ensure_ascii=False), time.time()),
+            )
+            # Hết hạn theo TTL + giới hạn số dòng (xóa các dòng cũ nhất)
+            conn.execute(
+                "DELETE FROM correction_cache WHERE namespace = ? AND created_at < ?",
+                (self.namespace, time.time() - self.ttl),
+            )
+            conn.execute(
+                """
+                DELETE FROM correction_cache WHERE rowid IN (
+                    SELECT rowid FROM correction_cache WHERE namespace = ?
+                    ORDER BY created_at DESC LIMIT -1 OFFSET ?
+                )
+                """,
+                (self.namespace, self.max_rows),
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+    # ----------------------------------------------------
+    # API
+    # ----------------------------------------------------
+    def get(self, query, version, default=None):
+        key = (normalize_query(query), version)
+
+        missing = object()
+        value = self.memory.get(key, missing)
+        if value is not missing:
+            return value
+
+        try:
+            row = self._disk_get(*key)
+        except sqlite3.Error as e:
+            self.disk_errors += 1
+            print(f"⚠️ [CACHE {self.namespace}] Lỗi SQLite: {e}")
+            row = None
+
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return default
+            self.disk_hits += 1
+
+        value = json.loads(row[0])
+        # Nạp lên tầng RAM với thời gian sống còn lại
+        self.memory.set(key, value, ttl=max(row[1] + self.ttl - time.time(), 0))
+        return value
+
+    def set(self, query, version, value):
+        key = (normalize_query(query), version)
+        self.memory.set(key, value)
+        try:
+            self._disk_set(*key, value)
+        except sqlite3.Error as e:
+            self.disk_errors += 1
+            print(f"⚠️ [CACHE {self.namespace}] Lỗi SQLite: {e}")
+
+    def stats(self):
+        memory = self.memory.stats()
+        return {
+            "memory_size": memory["size"],
+            "memory_hits": memory["hits"],
+            "memory_evictions": memory["evictions"],
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "disk_errors": self.disk_errors,
+        }
@@ -1,10 +1,7 @@
-import math
 from flask import session
+from utils.haversine_function import haversine_function
 
 class GPSService:
-    def __init__(self):
-        self.R = 6371.0 
-
     def calculate_distance(self, dest_lat, dest_long):
         # 1. Tự động lấy từ Session
         try:
@@ -27,13 +24,7 @@ class GPSService:
         # 2. Tính toán
         try:
             user_lat, user_long, dest_lat, dest_long = map(float, [user_lat, user_long, dest_lat, dest_long])
-            dlat = math.radians(dest_lat - user_lat)
-            dlon = math.radians(dest_long - user_long)
-            a = (math.sin(dlat / 2) ** 2 +
-                 math.cos(math.radians(user_lat)) * math.cos(math.radians(dest_lat)) *
-                 math.sin(dlon / 2) ** 2)
-            c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-            return round(self.R * c, 2)
+            return round(haversine_function(user_lat, user_long, dest_lat, dest_long), 2)
         except:
             return None
 
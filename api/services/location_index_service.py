@@ -0,0 +1,69 @@
+import os
+import threading
+import time
+
+from database.fetch_data_for_suggest_product import fetch_locations, fetch_location_by_gps
+from utils.box_index import BoxIndex
+
+# Tuổi tối đa của chỉ mục location (giây) trước khi nạp lại; bảng location gần như không đổi
+LOCATION_INDEX_REFRESH_SECONDS = int(os.getenv("LOCATION_INDEX_REFRESH_SECONDS", "3600"))
+
+
+class LocationIndex:
+    """
+    Bounding box (min/max lat, min/max long) của các location trong RAM của worker.
+    GPS → location là 1 lần tra BoxIndex thay vì 1 câu BETWEEN trên DB mỗi request.
+    """
+
+    def __init__(self, refresh_seconds=LOCATION_INDEX_REFRESH_SECONDS):
+        self.refresh_seconds = refresh_seconds
+        self._boxes = None
+        self._locations = {}    # {location_id: row giống shoppy_location_by_gps}
+        self.loaded_at = None
+        self._lock = threading.Lock()
+
+    def ensure_loaded(self):
+        if self._boxes is not None and time.time() - self.loaded_at < self.refresh_seconds:
+            return
+
+        with self._lock:
+            if self._boxes is not None and time.time() - self.loaded_at < self.refresh_seconds:
+                return
+
+            locations = fetch_locations()
+            self._locations = {row["location_id"]: row for row in locations}
+            # Thêm theo location_id: nhiều box chứa cùng 1 điểm → lấy location_id nhỏ nhất
+            self._boxes = BoxIndex(
+                (
+                    row["location_id"],
+                    float(row["location_min_lat"]), float(row["location_max_lat"]),
+                    float(row["location_min_long"]), float(row["location_max_long"]),
+                )
+                for row in locations
+                if None not in (row.get("location_min_lat"), row.get("location_max_lat"),
+                                row.get("location_min_long"), row.get("location_max_long"))
+            )
+            self.loaded_at = time.time()
+            print(f"🗺️ [LOCATION INDEX] Đã nạp {len(self._boxes)} location có bounding box")
+
+    def invalidate(self):
+        """Buộc nạp lại ở lần truy vấn kế tiếp."""
+        self.loaded_at = 0
+
+    def locate(self, lat, lon):
+        """Location chứa điểm (lat, lon) (cùng cấu trúc với fetch_location_by_gps), hoặc None."""
+        self.ensure_loaded()
+        location_id = self._boxes.first(float(lat), float(lon))
+        return self._locations.get(location_id) if location_id is not None else None
+
+
+location_index = LocationIndex()
+
+
+def find_location_by_gps(lat, lon):
+    """Như fetch_location_by_gps nhưng tra chỉ mục trong RAM; chỉ mục lỗi → truy vấn DB như cũ."""
+    try:
+        return location_index.locate(lat, lon)
+    except Exception as e:
+        print(f"⚠️ Chỉ mục location lỗi, tìm trên DB: {e}")
+        return fetch_location_by_gps(lat, lon)
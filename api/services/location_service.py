@@ -0,0 +1,27 @@
+from utils.gazetteer import gazetteer
+from API.API_groq_fix_location import get_standard_location, MODEL as LOCATION_MODEL
+from services.correction_cache import CorrectionCache
+
+# Cache kết quả chuẩn hóa địa danh của Groq (RAM + SQLite); khóa kèm tên model LLM
+location_fix_cache = CorrectionCache("groq_fix_location")
+
+
+def standardize_location(location_name):
+    """
+    Tên tỉnh/thành chuẩn cho địa danh người dùng gõ (VD: "HN" → "Hà Nội", "Q1" → "TP. Hồ Chí Minh").
+    1. Gazetteer offline (tỉnh, quận/huyện, viết tắt, sai chính tả) - vài chục µs
+    2. Không chắc chắn → hỏi Groq, có cache; chỉ cache câu trả lời khác None
+       (None có thể do lỗi/timeout, lần sau thử lại)
+    """
+    standardized = gazetteer.lookup(location_name)
+    if standardized:
+        return standardized
+
+    cached = location_fix_cache.get(location_name, LOCATION_MODEL)
+    if cached is not None:
+        return cached
+
+    standardized = get_standard_location(location_name)
+    if standardized:
+        location_fix_cache.set(location_name, LOCATION_MODEL, standardized)
+    return standardized
@@ -0,0 +1,103 @@
+import base64
+import heapq
+import json
+
+# Số sản phẩm mặc định / tối đa trong 1 trang (server luôn áp giới hạn này)
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 100
+
+
+def parse_limit(value):
+    """Đọc tham số limit, ép về khoảng [1, MAX_PAGE_SIZE]; thiếu/sai -> DEFAULT_PAGE_SIZE."""
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        return DEFAULT_PAGE_SIZE
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def encode_cursor(key, version=None):
+    """
+    Mã hóa khóa sắp xếp của phần tử cuối trang thành chuỗi cursor (base64url).
+    version: version của dữ liệu tạo ra khóa (xem paginate_keys).
+    """
+    payload = list(key) if version is None else {"v": version, "k": list(key)}
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """
+    Giải mã cursor về (tuple khóa sắp xếp, version hoặc None). Cursor hỏng -> ValueError.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except Exception:
+        raise ValueError("cursor không hợp lệ")
+    version = None
+    if isinstance(payload, dict):
+        version = payload.get("v")
+        payload = payload.get("k")
+    if not isinstance(payload, list) or not payload:
+        raise ValueError("cursor không hợp lệ")
+    return tuple(payload), version
+
+
+def paginate(items, key, limit, cursor=None):
+    """
+    Phân trang kiểu keyset: sắp items theo key(item), lấy các phần tử có khóa
+    lớn hơn khóa trong cursor. Vì cursor lưu KHÓA (không lưu vị trí) nên trang sau
+    vẫn đúng khi catalog được làm mới giữa 2 request (với điều kiện key không đổi theo dữ liệu).
+    Trả về (page, next_cursor); next_cursor = None khi đã hết dữ liệu.
+    limit = None → trả toàn bộ (không phân trang).
+    """
+    ordered = sorted(items, key=key)
+    if cursor:
+        after, _ = decode_cursor(cursor)
+        try:
+            ordered = [item for item in ordered if key(item) > after]
+        except TypeError:
+            raise ValueError("cursor không hợp lệ")
+
+    if limit is None:
+        return ordered, None
+
+    page = ordered[:limit]
+    next_cursor = encode_cursor(key(page[-1])) if len(ordered) > limit else None
+    return page, next_cursor
+
+
+def paginate_keys(keys, limit, cursor=None, version=None):
+    """
+    Như paginate nhưng phần tử chính là khóa sắp xếp, và chỉ lấy limit + 1 khóa nhỏ nhất
+    bằng heap (top-k) thay vì sắp xếp toàn bộ.
+    version: dùng khi khóa đổi theo dữ liệu (điểm BM25 phụ thuộc idf / độ dài trung bình của toàn
+    catalog). Cursor của version khác → neo lại theo phần tử cuối của khóa (product_id): trang sau
+    bắt đầu ngay sau khóa HIỆN TẠI của sản phẩm cuối trang trước (sản phẩm đã bị xóa → dùng khóa cũ).
+    Trả về (page_keys, next_cursor).
+    """
+    if cursor:
+        after, cursor_version = decode_cursor(cursor)
+        if version is not None and cursor_version != version:
+            after = next((k for k in keys if k[-1] == after[-1]), after)
+        try:
+            keys = [k for k in keys if k > after]
+        except TypeError:
+            raise ValueError("cursor không hợp lệ")
+
+    if limit is None:
+        return sorted(keys), None
+
+    top = heapq.nsmallest(limit + 1, keys)
+    page = top[:limit]
+    next_cursor = encode_cursor(page[-1], version) if len(top) > limit else None
+    return page, next_cursor
+
+
+def product_sort_key(result):
+    """
+    Khóa sắp xếp của kết quả tìm kiếm: (-điểm liên quan, product_id).
+    Kết quả không có điểm (truy vấn rỗng) → 0, tức là sắp theo product_id.
+    """
+    return (-result.get("score", 0.0), result["product"]["product_id"])
@@ -0,0 +1,119 @@
+import threading
+
+from utils.bm25 import BM25Index
+from utils.prefix_index import PrefixIndex
+from utils.spell_corrector import SpellCorrector
+from utils.trigram_index import TrigramIndex
+
+
+class ProductIndexes:
+    """
+    Các chỉ mục trong RAM dựng từ catalog snapshot.
+    - Dựng lần đầu khi có truy vấn đầu tiên.
+    - Cập nhật từng phần (chỉ các product thay đổi) qua catalog.on_change.
+    - Chính tả / gợi ý dựng lại toàn bộ, chỉ khi tên/tag đổi, ngay trên thread làm mới catalog.
+    """
+
+    def __init__(self, catalog):
+        self.catalog = catalog
+        self.names = TrigramIndex()
+        self.relevance = BM25Index()   # điểm liên quan trên tên + tag
+        self._spelling = None      # (catalog.vocabulary_version, SpellCorrector)
+        self._suggestions = None   # (catalog.vocabulary_version, PrefixIndex)
+        self._built = False
+        self._lock = threading.Lock()
+        self._derived_lock = threading.Lock()   # dựng chính tả / gợi ý
+        catalog.on_change(self._on_catalog_change)
+
+    def ensure_built(self):
+        self.catalog.ensure_loaded()
+        if self._built:
+            return
+
+        with self._lock:
+            if self._built:
+                return
+            for product_id, entry in self.catalog.entries():
+                self._index_entry(product_id, entry)
+            self._built = True
+
+    def _index_entry(self, product_id, entry):
+        product = entry["product"]
+        self.names.add(product_id, product["product_name"] or "")
+        self.relevance.add(product_id, {"name": product["product_name"], "tag": product["product_tag"]})
+
+    def _on_catalog_change(self, product_ids):
+        with self._lock:
+            if self._built:
+                for product_id in product_ids:
+                    self.names.remove(product_id)
+                    self.relevance.remove(product_id)
+                    entry = self.catalog.get_entry(product_id)
+                    if entry:
+                        self._index_entry(product_id, entry)
+        self._rebuild_derived()
+
+    def find_product_ids(self, terms):
+        """Tập product_id có tên chứa ít nhất 1 term (không dấu, không phân biệt hoa/thường)."""
+        self.ensure_built()
+        return self.names.search_any(terms)
+
+    def rank_keys(self, product_ids, text):
+        """
+        Khóa xếp hạng (-điểm BM25, product_id) cho từng product_id, tăng dần = liên quan giảm dần.
+        Product khớp chuỗi con nhưng không khớp trọn token nào có điểm 0 (đứng cuối, theo product_id).
+        """
+        self.ensure_built()
+        candidates = set(product_ids)
+        scores = self.relevance.scores(text, candidates)
+        return [(-scores.get(product_id, 0.0), product_id) for product_id in candidates]
+
+    def spelling(self):
+        """Từ điển sửa chính tả trên các từ của tên sản phẩm."""
+        return self._derived("_spelling", self._build_spelling)
+
+    def suggestions(self):
+        """Chỉ mục tiền tố (typeahead) trên tên + tag sản phẩm."""
+        return self._derived("_suggestions", self._build_suggestions)
+
+    def _build_spelling(self):
+        spelling = SpellCorrector()
+        for _, entry in self.catalog.entries():
+            spelling.add_text(entry["product"]["product_name"] or "")
+        return spelling
+
+    def _build_suggestions(self):
+        return PrefixIndex(
+            (product_id, entry["product"]["product_name"], entry["product"]["product_tag"])
+            for product_id, entry in self.catalog.entries()
+        )
+
+    def _derived(self, attr, build):
+        """
+        Chỉ mục dựng từ toàn bộ tên/tag: request chỉ dựng lần đầu (1 request dựng, các request khác chờ).
+        Từ vựng đổi → thread làm mới catalog dựng bản mới (_rebuild_derived); trong lúc đó vẫn dùng bản cũ.
+        """
+        self.catalog.ensure_loaded()
+        cached = getattr(self, attr)
+        if cached is None:
+            with self._derived_lock:
+                cached = getattr(self, attr)
+                if cached is None:
+                    cached = (self.catalog.vocabulary_version, build())
+                    setattr(self, attr, cached)
+        return cached[1]
+
+    def _rebuild_derived(self):
+        """Dựng lại các chỉ mục đã dùng tới nếu version từ vựng đổi (giá/review/ảnh đổi → bỏ qua)."""
+        version = self.catalog.vocabulary_version
+        with self._derived_lock:
+            for attr, build in (("_spelling", self._build_spelling), ("_suggestions", self._build_suggestions)):
+                cached = getattr(self, attr)
+                if cached is None or cached[0] == version:
+                    continue
+                try:
+                    setattr(self, attr, (version, build()))
+                except Exception as e:
+                    # Không để bản cũ sống mãi: request kế tiếp sẽ dựng lại
+                    setattr(self, attr, None)
+                    print(f"⚠️ [INDEX] Dựng lại {attr.strip('_')} lỗi: {e}")
@@ -0,0 +1,190 @@
+import json
+
+from flask import Response
+
+try:
+    import orjson
+except ImportError:  # orjson không bắt buộc: thiếu thì dùng json chuẩn
+    orjson = None
+
+# Giá trị mặc định khi field bị thiếu (giống các .get(..., mặc định) trước đây)
+PRODUCT_DEFAULTS = {
+    "product_id": 0,
+    "product_name": "Không có tên",
+    "product_des": "",
+    "product_image_url": "image/products/default.jpg",
+    "product_min_cost": "",
+    "product_max_cost": "",
+}
+STORE_FIELDS = ("store_id", "store_name", "store_address", "store_lat", "store_long",
+                "distance_km", "ps_min_price_store", "ps_max_price_store")
+IMAGE_FIELDS = ("ps_id", "ps_image_id", "ps_image_url", "ps_type")
+
+
+def _serialize(result):
+    # Truy cập trực tiếp: dict từ build_product_map luôn đủ field
+    product = result["product"]
+    return {
+        "product_id": product["product_id"],
+        "product_name": product["product_name"],
+        "product_des": product["product_des"],
+        "product_image_url": product["product_image_url"],
+        "location_name": result["location"]["location_name"],
+        "product_min_cost": product["product_min_cost"],
+        "product_max_cost": product["product_max_cost"],
+        "stores": [
+            {
+                "store_id": store["store_id"],
+                "store_name": store["store_name"],
+                "store_address": store["store_address"],
+                "store_lat": store["store_lat"],
+                "store_long": store["store_long"],
+                "distance_km": store["distance_km"],
+                "ps_min_price_store": store["ps_min_price_store"],
+                "ps_max_price_store": store["ps_max_price_store"],
+                "product_images": [
+                    {
+                        "ps_id": img["ps_id"],
+                        "ps_image_id": img["ps_image_id"],
+                        "ps_image_url": img["ps_image_url"],
+                        "ps_type": img["ps_type"],
+                    }
+                    for img in store["product_images"]
+                ],
+            }
+            for store in result["store"]
+        ],
+    }
+
+
+def _with_defaults(result):
+    """Bản sao đã điền đủ field (chỉ dùng khi dữ liệu đầu vào thiếu field)."""
+    product = dict(PRODUCT_DEFAULTS, **(result.get("product") or {}))
+    location = {"location_name": (result.get("location") or {}).get("location_name", "")}
+    stores = []
+    for store in result.get("store", []):
+        filled = {field: store.get(field) for field in STORE_FIELDS}
+        filled["product_images"] = [
+            {field: img.get(field) for field in IMAGE_FIELDS}
+            for img in store.get("product_images", [])
+        ]
+        stores.append(filled)
+    return {"product": product, "location": location, "store": stores}
+
+
+def serialize_product(result):
+    """1 phần tử của search_product (product/location/store) → dict trả cho frontend."""
+    try:
+        return _serialize(result)
+    except KeyError:
+        return _serialize(_with_defaults(result))
+
+
+def serialize_products(results):
+    return [serialize_product(result) for result in results]
+
+
+def dumps(payload):
+    """Mã hóa JSON (bytes UTF-8): orjson nếu có, không thì json chuẩn dạng gọn."""
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def json_response(payload, status=200):
+    """Thay cho jsonify ở các API trả danh sách sản phẩm lớn."""
+    return Response(dumps(payload), status=status, mimetype="application/json")
+
+
+# Benchmark: chạy từ thư mục api/ bằng `python -m services.product_serializer`
+if __name__ == "__main__":
+    import time
+
+    from flask import Flask, jsonify
+
+    def legacy_format(results):
+        products = []
+        for p in results:
+            products.append({
+                "product_id": p["product"].get("product_id", 0),
+                "product_name": p["product"].get("product_name", "Không có tên"),
+                "product_des": p["product"].get("product_des", ""),
+                "product_image_url": p["product"].get("product_image_url", "image/products/default.jpg"),
+                "location_name": p["location"].get("location_name", ""),
+                "product_min_cost": p["product"].get("product_min_cost", ""),
+                "product_max_cost": p["product"].get("product_max_cost", ""),
+                "stores": [
+                    {
+                        "store_id": store.get("store_id"),
+                        "store_name": store.get("store_name"),
+                        "store_address": store.get("store_address"),
+                        "store_lat": store.get("store_lat"),
+                        "store_long": store.get("store_long"),
+                        "distance_km": store.get("distance_km"),
+                        "ps_min_price_store": store.get("ps_min_price_store"),
+                        "ps_max_price_store": store.get("ps_max_price_store"),
+                        "product_images": [
+                            {
+                                "ps_id": img.get("ps_id"),
+                                "ps_image_id": img.get("ps_image_id"),
+                                "ps_image_url": img.get("ps_image_url"),
+                                "ps_type": img.get("ps_type"),
+                            }
+                            for img in store.get("product_images", [])
+                        ],
+                    }
+                    for store in p.get("store", [])
+                ],
+            })
+        return products
+
+    # Catalog giả: 5.000 sản phẩm x 4 store x 3 ảnh
+    results = []
+    for pid in range(5000):
+        stores = []
+        for sid in range(4):
+            stores.append({
+                "store_id": sid, "store_name": f"Quán số {sid}", "store_address": f"{sid} Phố Huế, Hà Nội",
+                "store_lat": 21.0 + sid / 100, "store_long": 105.8 + sid / 100, "store_location_id": 1,
+                "distance_km": 1.234 * sid, "ps_min_price_store": 30000, "ps_max_price_store": 60000,
+                "ps_average_rating": 4.5, "ps_total_reviews": 12,
+                "product_images": [
+                    {"ps_id": pid * 10 + sid, "ps_image_id": i, "ps_image_url": f"https://img/{pid}/{sid}/{i}.jpg",
+                     "ps_type": "food"}
+                    for i in range(3)
+                ],
+            })
+        results.append({
+            "product": {"product_id": pid, "product_name": f"Bún chả số {pid}", "product_des": "Món ngon Hà Nội",
+                        "product_image_url": f"https://img/{pid}.jpg", "product_location_id": 1,
+                        "product_tag": "bun", "product_min_cost": 30000, "product_max_cost": 60000},
+            "location": {"location_id": 1, "location_name": "Hà Nội"},
+            "store": stores,
+        })
+
+    assert serialize_products(results) == legacy_format(results)
+
+    rounds = 5
+    for label, fn in (("format cũ (.get)", legacy_format), ("serialize_products", serialize_products)):
+        t0 = time.perf_counter()
+        for _ in range(rounds):
+            fn(results)
+        print(f"{label:27} {(time.perf_counter() - t0) / rounds * 1000:8.1f} ms (chỉ dựng dict)")
+
+    app = Flask(__name__)
+    with app.app_context():
+        t0 = time.perf_counter()
+        for _ in range(rounds):
+            legacy_body = jsonify(legacy_format(results)).get_data()
+        legacy_ms = (time.perf_counter() - t0) / rounds * 1000
+
+        t0 = time.perf_counter()
+        for _ in range(rounds):
+            body = json_response(serialize_products(results)).get_data()
+        current_ms = (time.perf_counter() - t0) / rounds * 1000
+
+    assert json.loads(body) == json.loads(legacy_body)
+    backend = "orjson" if orjson is not None else "json"
+    print(f"{len(results)} sản phẩm, {len(body) / 1e6:.1f} MB")
+    print(f"format + jsonify:            {legacy_ms:8.1f} ms")
+    print(f"serializer + {backend:14} {current_ms:8.1f} ms  (x{legacy_ms / current_ms:.1f})")
@@ -0,0 +1,87 @@
+import os
+
+from database.fetch_data import fetch_data_by_product_store_pairs, fetch_product_detail
+from database.queries import to_int_ids
+from services.search_service import catalog
+from utils.lru_cache import TTLCache
+
+PRODUCT_STORE_CACHE_SIZE = int(os.getenv("PRODUCT_STORE_CACHE_SIZE", "5000"))
+PRODUCT_STORE_CACHE_TTL_SECONDS = int(os.getenv("PRODUCT_STORE_CACHE_TTL_SECONDS", "60"))
+
+# Chi tiết product-store dùng chung cho giỏ hàng, product_summary và product_detail.
+#   key (product_id, store_id) → {"product": {...}, "location": {...}, "store": [store đó]}
+#   key (product_id, None)     → như trên nhưng "store" là mọi store bán product (giống store_id=None
+#                                của fetch_product_detail)
+# Mọi lần nạp đều đi qua nested_product_select (shoppy_product_nested / shoppy_product_store_pairs)
+# → cùng 1 cặp luôn có cùng tập key và thứ tự ảnh, dù endpoint nào nạp trước
+# (version nội dung của giỏ hàng không đổi theo đường nạp).
+product_store_cache = TTLCache(maxsize=PRODUCT_STORE_CACHE_SIZE, ttl=PRODUCT_STORE_CACHE_TTL_SECONDS)
+
+
+def remember_product(entry, all_stores=False):
+    """Lưu entry đã gom nhóm: từng cặp (product_id, store_id), kèm (product_id, None) nếu entry đủ mọi store."""
+    product_id = entry["product"]["product_id"]
+    if all_stores:
+        product_store_cache.set((product_id, None), entry)
+    for store in entry["store"]:
+        product_store_cache.set((product_id, store["store_id"]), {**entry, "store": [store]})
+
+
+def cached_product_store(product_id, store_id):
+    """Chi tiết của cặp nếu đang có trong cache (không truy vấn DB), ngược lại None."""
+    return product_store_cache.get((product_id, store_id))
+
+
+def product_store_details(pairs):
+    """
+    {(product_id, store_id): chi tiết} cho các cặp tìm thấy (id ép sang int).
+    Các cặp chưa có trong cache được nạp chung trong 1 truy vấn rồi lưu lại.
+    """
+    details = {}
+    missing = set()
+    for pair in pairs:
+        ids = to_int_ids(pair)
+        if len(ids) != 2:
+            continue
+        key = tuple(ids)
+        detail = product_store_cache.get(key)
+        if detail is None:
+            missing.add(key)
+        else:
+            details[key] = detail
+
+    if missing:
+        for entry in fetch_data_by_product_store_pairs(missing):
+            remember_product(entry)
+            for store in entry["store"]:
+                key = (entry["product"]["product_id"], store["store_id"])
+                if key in missing:
+                    details[key] = {**entry, "store": [store]}
+    return details
+
+
+def product_details(product_id):
+    """Chi tiết product kèm mọi store (dạng gom nhóm), hoặc None nếu không tìm thấy."""
+    ids = to_int_ids([product_id])
+    if not ids:
+        return None
+
+    detail = product_store_cache.get((ids[0], None))
+    if detail is not None:
+        return detail
+
+    products = fetch_product_detail(ids[0])
+    if not products:
+        return None
+    remember_product(products[0], all_stores=True)
+    return products[0]
+
+
+def invalidate_products(product_ids):
+    """Xóa mọi chi tiết (mọi store) của các product này."""
+    product_ids = set(product_ids)
+    product_store_cache.invalidate_where(lambda key: key[0] in product_ids)
+
+
+# Catalog phát hiện product thay đổi (product, store, giá, ảnh) → bỏ chi tiết cũ ngay, không đợi TTL
+catalog.on_change(invalidate_products)
@@ -1,6 +1,18 @@
-from database.fetch_data import fetch_full_data, fetch_rows_by_search
-from utils.haversine_function import haversine_function
-from API.API_groq_fix_query import groq_fix_query
+import math
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from database.fetch_data import fetch_products_by_search, fetch_products_by_ids, split_search_terms
+from utils.haversine_function import haversine_function, store_distances
+from utils.text_normalize import tokenize
+from utils.lru_cache import TTLCache
+from utils.spatial_index import KM_PER_DEG
+from API.API_groq_fix_query import groq_fix_query, PRODUCT_SCOPE_VERSION
+from services.catalog_service import CatalogSnapshot
+from services.product_index_service import ProductIndexes
+from services.store_index_service import store_index
+from services.correction_cache import CorrectionCache, normalize_query
+from services.pagination import paginate, paginate_keys, product_sort_key
 
 def build_store_info(row, user_lat=None, user_lon=None):
     store_info = dict(row)  # copy tất cả fields
@@ -24,13 +36,21 @@ def build_store_info(row, user_lat=None, user_lon=None):
     return store_info
 
 def build_product_map(rows, user_lat=None, user_lon=None):
-    """Xây dựng product_map từ các row fetch trực tiếp"""
+    """
+    Xây dựng product_map từ các row fetch trực tiếp.
+    Gom nhóm trong 1 lượt: mỗi product giữ dict store_id -> store, mỗi store giữ
+    set ps_image_id đã thêm → chi phí tuyến tính theo số row, thứ tự giữ nguyên.
+    """
     product_map = {}
+    stores_by_product = {}  # {product_id: {store_id: (store_info, set ps_image_id)}}
+
     for row in rows:
         product_id = row["product_id"]
         store_id = row.get("store_id")
 
-        if product_id not in product_map:
+        stores = stores_by_product.get(product_id)
+        if stores is None:
+            stores = stores_by_product[product_id] = {}
             product_map[product_id] = {
                 "product": {
                     "product_id": row["product_id"],
@@ -53,48 +73,543 @@ def build_product_map(rows, user_lat=None, user_lon=None):
                 "store": []
             }
 
-        if store_id:
-            # Check store tồn tại chưa
-            existing_store = next((s for s in product_map[product_id]["store"] if s["store_id"] == store_id), None)
-            if existing_store:
-                # Thêm ảnh mới nếu chưa có
-                if row.get("ps_image_url") and all(pi["ps_image_id"] != row["ps_image_id"] for pi in existing_store["product_images"]):
-                    existing_store["product_images"].append({
-                        "ps_id": row["ps_id"],
-                        "ps_image_id": row["ps_image_id"],
-                        "ps_image_url": row["ps_image_url"],
-                        "ps_type": row["ps_type"]
-                    })
-            else:
-                store_info = build_store_info(row, user_lat, user_lon)
-                product_map[product_id]["store"].append(store_info)
+        if not store_id:
+            continue
+
+        known = stores.get(store_id)
+        if known is None:
+            # Store mới của product này (khoảng cách tính gộp ở cuối)
+            store_info = build_store_info(row)
+            image_ids = {row["ps_image_id"]} if store_info["product_images"] else set()
+            stores[store_id] = (store_info, image_ids)
+            product_map[product_id]["store"].append(store_info)
+        elif row.get("ps_image_url"):
+            # Thêm ảnh mới nếu chưa có
+            store_info, image_ids = known
+            image_id = row["ps_image_id"]
+            if image_id not in image_ids:
+                image_ids.add(image_id)
+                store_info["product_images"].append({
+                    "ps_id": row["ps_id"],
+                    "ps_image_id": image_id,
+                    "ps_image_url": row["ps_image_url"],
+                    "ps_type": row["ps_type"]
+                })
+
+    # Tính khoảng cách cho toàn bộ store trong 1 lượt
+    if user_lat is not None and user_lon is not None:
+        all_stores = [store for entry in product_map.values() for store in entry["store"]]
+        for store, distance in zip(all_stores, store_distances(user_lat, user_lon, all_stores)):
+            store["distance_km"] = distance
 
     return product_map
 
-def search_product(search_text, user_lat=21.0285, user_lon=105.8542):
+def group_products(products, user_lat=None, user_lon=None):
+    """
+    product_map từ dữ liệu đã gom nhóm sẵn trên DB (fetch_products_*, fetch_full_catalog):
+    chỉ cần đánh chỉ mục theo product_id và gán distance_km, không phải duyệt từng row phẳng.
+    Cùng cấu trúc với build_product_map.
+    """
+    product_map = {}
+    all_stores = []
+    for item in products or []:
+        for store in item["store"]:
+            store["distance_km"] = None
+            all_stores.append(store)
+        product_map[item["product"]["product_id"]] = item
+
+    # Tính khoảng cách cho toàn bộ store trong 1 lượt
+    if user_lat is not None and user_lon is not None:
+        for store, distance in zip(all_stores, store_distances(user_lat, user_lon, all_stores)):
+            store["distance_km"] = distance
+
+    return product_map
+
+# Snapshot catalog của worker (phục vụ truy vấn rỗng mà không cần gọi DB)
+catalog = CatalogSnapshot(group_products=group_products)
+product_indexes = ProductIndexes(catalog)
+catalog.on_change(lambda product_ids: store_index.invalidate())
+
+def catalog_version(load=False):
+    """
+    Version hiện tại của catalog (dùng cho ETag); None nếu chưa nạp.
+    load=True: nạp catalog nếu chưa có (lỗi nạp → None).
+    """
+    if load and catalog.version is None:
+        try:
+            catalog.ensure_loaded()
+        except Exception as e:
+            print(f"⚠️ [CATALOG] Không nạp được catalog: {e}")
+    return catalog.version
+
+def local_fix_query(search_text):
+    """
+    Sửa chính tả cục bộ (symmetric delete trên từ điển tên sản phẩm, không gọi mạng).
+    Trả về query đã sửa (bỏ dấu, các term nối bằng ", ") hoặc None nếu không chắc chắn
+    hoặc không có gì để sửa → khi đó mới cần tới LLM.
+    """
+    try:
+        spelling = product_indexes.spelling()
+    except Exception as e:
+        print(f"⚠️ Từ điển chính tả chưa sẵn sàng: {e}")
+        return None
+
+    corrected_terms = []
+    changed = False
+    for term in split_search_terms(search_text):
+        corrected = spelling.correct(term)
+        if corrected is None:
+            return None
+        changed = changed or corrected != " ".join(tokenize(term))
+        corrected_terms.append(corrected)
+
+    return ", ".join(corrected_terms) if changed else None
+
+# Số gợi ý mặc định / tối đa của /api/products/suggest
+DEFAULT_SUGGEST_LIMIT = 8
+MAX_SUGGEST_LIMIT = 20
+
+def suggest_products(prefix, limit=DEFAULT_SUGGEST_LIMIT):
+    """
+    Gợi ý sản phẩm theo tiền tố của tên/tag (không dấu), đọc hoàn toàn từ RAM.
+    Mỗi phần tử chỉ gồm các field cần cho ô gợi ý tìm kiếm.
+    """
+    product_ids = product_indexes.suggestions().complete(prefix, limit)
+    suggestions = []
+    for product_id in product_ids:
+        entry = catalog.get_entry(product_id)
+        if entry is None:
+            continue
+        product = entry["product"]
+        suggestions.append({
+            "product_id": product_id,
+            "product_name": product["product_name"],
+            "product_image_url": product["product_image_url"],
+            "product_tag": product["product_tag"],
+            "location_name": entry["location"]["location_name"],
+        })
+    return suggestions
+
+# Cache kết quả sửa query của Groq (RAM + SQLite)
+query_fix_cache = CorrectionCache("groq_fix_query")
+
+def fix_query(search_text):
+    """
+    groq_fix_query có cache 2 tầng, khóa = query đã chuẩn hóa + version danh sách sản phẩm.
+    Các lỗi chính tả hay gặp (VD: "bun cha") chỉ tốn 1 lần gọi Groq.
+    """
+    cached = query_fix_cache.get(search_text, PRODUCT_SCOPE_VERSION)
+    if cached is not None:
+        return cached
+
+    fixed_query = groq_fix_query(search_text)
+
+    # groq_fix_query trả lại query gốc khi lỗi/timeout → không cache để lần sau thử lại
+    if fixed_query and fixed_query != search_text:
+        query_fix_cache.set(search_text, PRODUCT_SCOPE_VERSION, fixed_query)
+    return fixed_query
+
+# Hedging: đoán trước query sẽ không khớp → gọi Groq song song với lượt tìm đầu tiên
+HEDGED_QUERY_FIX = os.getenv("HEDGED_QUERY_FIX", "1") == "1"
+query_fix_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="query-fix")
+
+def likely_miss(search_text):
+    """
+    Tín hiệu rẻ (chỉ tra từ điển trong RAM): không token nào của query có trong
+    từ điển tên sản phẩm → nhiều khả năng tìm theo tên sẽ rỗng và phải nhờ LLM.
+    """
+    try:
+        spelling = product_indexes.spelling()
+    except Exception:
+        return False
+    tokens = tokenize(search_text)
+    return bool(tokens) and not any(token in spelling for token in tokens)
+
+def start_fix_query(search_text):
+    """
+    Chạy fix_query ở thread nền, trả về Future.
+    Đã có trong cache → Future hoàn thành ngay, không tốn thread.
+    """
+    cached = query_fix_cache.get(search_text, PRODUCT_SCOPE_VERSION)
+    if cached is not None:
+        future = Future()
+        future.set_result(cached)
+        return future
+    return query_fix_executor.submit(fix_query, search_text)
+
+# Khoảng giá cho tham số price của /api/products
+PRICE_RANGES = {
+    "1": (0, 50000),
+    "2": (50000, 100000),
+    "3": (100000, 200000),
+    "4": (200000, 500000),
+    "5": (500000, 1000000),
+    "6": (1000000, float("inf")),
+}
+
+def price_in_range(store, price_range):
+    """Khoảng giá [min, max] của store có giao với price_range (low, high) không."""
+    low, high = price_range
+    min_price = store.get("ps_min_price_store")
+    max_price = store.get("ps_max_price_store")
+    return (
+        min_price is not None
+        and max_price is not None
+        and (
+            (low <= min_price <= high)
+            or (low <= max_price <= high)
+            or (min_price <= low and max_price >= high)
+        )
+    )
+
+def make_store_filter(price_range=None, store_ids=None):
+    """
+    Điều kiện lọc ở mức store (áp được cho cả row phẳng lẫn store đã gom nhóm).
+    Cùng ngữ nghĩa với STORE_FILTER của shoppy_products_nested_by_ids (SQL). Không có bộ lọc → None.
+    """
+    if price_range is None and store_ids is None:
+        return None
+
+    def store_filter(store):
+        if store_ids is not None and store.get("store_id") not in store_ids:
+            return False
+        return price_range is None or price_in_range(store, price_range)
+
+    return store_filter
+
+def nearby_store_ids(user_lat, user_lon, max_distance):
+    """
+    Tập store_id trong bán kính max_distance (km) lấy từ chỉ mục không gian.
+    - Không lọc khoảng cách → None.
+    - Có lọc nhưng thiếu vị trí user → tập rỗng (không store nào tính được khoảng cách).
+    - Chỉ mục lỗi → None; search_page sẽ lọc theo distance_km sau khi gom nhóm.
+    """
+    if max_distance is None:
+        return None
+    if user_lat is None or user_lon is None:
+        return set()
+    try:
+        return store_index.store_ids_within(user_lat, user_lon, max_distance)
+    except Exception as e:
+        print(f"⚠️ Chỉ mục cửa hàng lỗi, bỏ qua lọc trước theo khoảng cách: {e}")
+        return None
+
+def search_rows(search_text, price_range=None, store_ids=None):
+    """
+    Tìm sản phẩm theo tên. Trả về (matched, keys, products):
+    - matched: có sản phẩm khớp tên hay không (TRƯỚC khi áp bộ lọc giá/khoảng cách)
+    - keys: khóa xếp hạng (-điểm BM25, product_id) của các product thỏa bộ lọc, CHƯA lấy dữ liệu
+    - products: chỉ có ở đường dự phòng (LIKE trên DB), dạng gom nhóm, chỉ gồm các store thỏa bộ lọc
+
+    Đường chính: chỉ mục trigram → tập product_id → bỏ product không có store nào thỏa
+    bộ lọc (dựa trên snapshot) → chấm điểm BM25 trên tên + tag. Dữ liệu chỉ được fetch
+    cho đúng trang cần trả về (xem search_page).
+    Nếu không dựng được chỉ mục (VD: lỗi nạp catalog) → quay về LIKE trên DB như cũ.
+    """
+    store_filter = make_store_filter(price_range, store_ids)
+    terms = split_search_terms(search_text)
+
+    try:
+        product_ids = product_indexes.find_product_ids(terms)
+    except Exception as e:
+        print(f"⚠️ Chỉ mục tên chưa sẵn sàng, dùng LIKE trên DB: {e}")
+        products = fetch_products_by_search(search_text) or []
+        return bool(products), None, filter_grouped(products, store_filter)
+
+    return rank_matches(product_ids, terms, store_filter)
+
+def filter_grouped(products, store_filter):
+    """Chỉ giữ store thỏa bộ lọc trong kết quả đã gom nhóm; product không còn store nào bị bỏ."""
+    if store_filter is None:
+        return products
+    for item in products:
+        item["store"] = [store for store in item["store"] if store_filter(store)]
+    return [item for item in products if item["store"]]
+
+def rank_matches(product_ids, terms, store_filter):
+    """(matched, keys, None) của search_rows từ tập product_id tìm được qua chỉ mục tên."""
+    if not product_ids:
+        return False, [], None
+
+    if store_filter is not None:
+        product_ids = catalog.matching_product_ids(product_ids, store_filter)
+    return True, product_indexes.rank_keys(product_ids, " ".join(terms)), None
+
+def compute_search_page(search_text, user_lat=21.0285, user_lon=105.8542, max_distance=None, price_range=None,
+                        limit=None, cursor=None):
+    """
+    Tìm sản phẩm theo tên (rỗng → toàn bộ catalog), xếp theo độ liên quan giảm dần.
+    max_distance (km) và price_range (low, high) được áp ở mức store ngay khi lấy dữ liệu;
+    product không còn store nào thỏa bộ lọc sẽ bị loại.
+    Trả về (page, next_cursor, fixed_query); limit = None → toàn bộ kết quả. Cursor sai → ValueError.
+    fixed_query: query Groq trả về khi trang phụ thuộc vào LLM (tên gốc và bản sửa cục bộ đều trượt), ngược lại None.
+    """
     search_text = (search_text or "").strip()  # Nếu None → "" và loại khoảng trắng
 
-    # 1. Nếu search_text rỗng → trả toàn bộ dữ liệu
+    # Lọc khoảng cách: lấy trước tập store trong bán kính qua chỉ mục không gian
+    store_ids = nearby_store_ids(user_lat, user_lon, max_distance)
+
+    # 1. Nếu search_text rỗng → trả toàn bộ dữ liệu (đọc từ snapshot trong RAM)
     if not search_text:
-        rows = fetch_full_data()
-        product_map = build_product_map(rows, user_lat, user_lon)
-        return list(product_map.values())
-
-    # 2. Tìm DB bằng search_text gốc
-    rows = fetch_rows_by_search(search_text)
-    product_map = build_product_map(rows, user_lat, user_lon)
-    results = list(product_map.values())
-    
-    if results:  # Có kết quả → trả luôn
-        return results
-    
-    # 3. Nếu rỗng → Gemini fix query
-    fixed_query = groq_fix_query(search_text)
-    print(f"[DEBUG] Fixed query after Gemini: {fixed_query}")
-    
-    # 4. Tìm lại DB bằng fixed_query
-    rows = fetch_rows_by_search(fixed_query)
-    product_map = build_product_map(rows, user_lat, user_lon)
-    results = list(product_map.values())
-    
+        results = catalog.products(user_lat, user_lon, make_store_filter(price_range, store_ids))
+        page, next_cursor = paginate(filter_by_distance(results, max_distance, store_ids), product_sort_key, limit, cursor)
+        return page, next_cursor, None
+
+    # Query có vẻ sẽ trượt → sửa chính tả cục bộ trước (không gọi mạng); chỉ khi không sửa được
+    # mới gọi Groq ngay, song song với lượt tìm đầu tiên
+    predicted_miss = likely_miss(search_text)
+    local_query = local_fix_query(search_text) if predicted_miss else None
+    fix_future = start_fix_query(search_text) if HEDGED_QUERY_FIX and predicted_miss and not local_query else None
+
+    # 2. Tìm bằng search_text gốc
+    matched, keys, products = search_rows(search_text, price_range, store_ids)
+    fixed_query = None
+
+    if not matched:
+        # 3. Nếu rỗng → thử sửa chính tả cục bộ trước (không tốn round trip mạng; đã tính sẵn nếu đoán trượt)
+        if not predicted_miss:
+            local_query = local_fix_query(search_text)
+        if local_query:
+            print(f"📝 Sửa chính tả cục bộ: '{search_text}' -> '{local_query}'")
+            matched, keys, products = search_rows(local_query, price_range, store_ids)
+
+    if matched and fix_future is not None:
+        # Đoán sai: không cần LLM nữa. Chỉ hủy được khi Future chưa chạy; request HTTP đang chạy
+        # thì không ngắt được (thread tự kết thúc, timeout 10s) và kết quả vẫn được ghi vào cache
+        fix_future.cancel()
+
+    if not matched:
+        # 4. Vẫn rỗng → Gemini fix query (đã chạy sẵn nếu hedging)
+        if fix_future is not None:
+            try:
+                fixed_query = fix_future.result()
+            except Exception as e:
+                print(f"⚠️ Lỗi fix query song song: {e}")
+                fixed_query = search_text
+        else:
+            fixed_query = fix_query(search_text)
+        print(f"[DEBUG] Fixed query after Gemini: {fixed_query}")
+
+        # 5. Tìm lại bằng fixed_query
+        matched, keys, products = search_rows(fixed_query, price_range, store_ids)
+
+    if keys is None:
+        # Đường dự phòng LIKE: đã có toàn bộ kết quả, phân trang theo product_id
+        results = list(group_products(products, user_lat, user_lon).values())
+        page, next_cursor = paginate(filter_by_distance(results, max_distance, store_ids), product_sort_key, limit, cursor)
+        return page, next_cursor, fixed_query
+
+    # 6. Chỉ lấy top-k của trang hiện tại rồi mới fetch dữ liệu cho đúng các product đó
+    # Khóa chứa điểm BM25 (chỉ đổi khi tên/tag đổi) → cursor gắn với version từ vựng của catalog
+    page_keys, next_cursor = paginate_keys(keys, limit, cursor, version=catalog.vocabulary_version)
+    if not page_keys:
+        return [], None, fixed_query
+
+    products = fetch_products_by_ids(
+        [product_id for _, product_id in page_keys], price_range=price_range, store_ids=store_ids
+    )
+    return ranked_page(page_keys, products, user_lat, user_lon, max_distance, store_ids), next_cursor, fixed_query
+
+def ranked_page(page_keys, products, user_lat, user_lon, max_distance, store_ids):
+    """Sắp dữ liệu vừa fetch theo thứ tự của page_keys và gắn điểm liên quan (score)."""
+    product_map = group_products(products, user_lat, user_lon)
+
+    results = []
+    for neg_score, product_id in page_keys:
+        entry = product_map.get(product_id)
+        if entry is not None:
+            entry["score"] = -neg_score
+            results.append(entry)
+    return filter_by_distance(results, max_distance, store_ids)
+
+# Cache kết quả tìm kiếm (theo worker): khóa = version catalog + query đã chuẩn hóa
+# + ô lưới vị trí + bộ lọc + trang; catalog đổi version → xóa sạch
+SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", "500"))
+SEARCH_CACHE_TTL_SECONDS = int(os.getenv("SEARCH_CACHE_TTL_SECONDS", "300"))
+SEARCH_CACHE_CELL_DEG = 0.01  # ~1.1 km
+# Khoảng cách xa nhất từ tâm ô tới 1 điểm trong ô (cận trên, lấy theo xích đạo)
+SEARCH_CACHE_CELL_RADIUS_KM = KM_PER_DEG * SEARCH_CACHE_CELL_DEG * math.sqrt(2) / 2
+
+search_cache = TTLCache(maxsize=SEARCH_CACHE_SIZE, ttl=SEARCH_CACHE_TTL_SECONDS)
+catalog.on_change(lambda product_ids: search_cache.clear())
+
+def location_cell(user_lat, user_lon):
+    """(hàng, cột) của ô lưới chứa vị trí user; thiếu vị trí → None."""
+    if user_lat is None or user_lon is None:
+        return None
+    return (math.floor(user_lat / SEARCH_CACHE_CELL_DEG), math.floor(user_lon / SEARCH_CACHE_CELL_DEG))
+
+def localize_page(page, user_lat, user_lon, max_distance):
+    """
+    Bản sao trang kết quả (dùng chung trong cache) với distance_km tính theo vị trí thật của user;
+    có lọc khoảng cách → bỏ store ngoài bán kính và product không còn store nào.
+    """
+    results = []
+    for entry in page:
+        stores = [dict(store) for store in entry["store"]]
+        for store, distance in zip(stores, store_distances(user_lat, user_lon, stores)):
+            store["distance_km"] = distance
+        if max_distance is not None:
+            stores = [s for s in stores if s["distance_km"] is not None and s["distance_km"] <= max_distance]
+            if not stores:
+                continue
+        results.append({**entry, "store": stores})
     return results
+
+def search_page(search_text, user_lat=21.0285, user_lon=105.8542, max_distance=None, price_range=None,
+                limit=None, cursor=None):
+    """
+    compute_search_page có cache. Kết quả lưu trong cache không phụ thuộc vị trí chính xác:
+    - Không lọc khoảng cách → không cần ô vị trí (mọi user dùng chung).
+    - Có lọc khoảng cách → tính 1 lần từ TÂM ô với bán kính nới thêm SEARCH_CACHE_CELL_RADIUS_KM
+      (tập cha của kết quả cho mọi vị trí trong ô), sau đó lọc lại theo vị trí thật ở mỗi request.
+    Khoảng cách luôn được tính lại cho từng request (localize_page).
+    Trả về (page, next_cursor, fixed_query) như compute_search_page.
+    """
+    key, origin = search_cache_plan(search_text, user_lat, user_lon, max_distance, price_range, limit, cursor)
+
+    cached = lookup_search_page(key)
+    if cached is None:
+        cached = compute_search_page(search_text, *origin, price_range, limit, cursor)
+        remember_search_page(key, search_text, cached)
+
+    page, next_cursor, fixed_query = cached
+    return localize_page(page, user_lat, user_lon, max_distance), next_cursor, fixed_query
+
+def search_cache_plan(search_text, user_lat, user_lon, max_distance, price_range, limit, cursor):
+    """(khóa cache, (lat, lon, bán kính) dùng để tính trang khi cache chưa có)."""
+    cell = location_cell(user_lat, user_lon) if max_distance is not None else None
+    key = (catalog.version, normalize_query(search_text), cell, max_distance, price_range, limit, cursor)
+    if cell is None:
+        return key, (user_lat, user_lon, max_distance)
+    center_lat = (cell[0] + 0.5) * SEARCH_CACHE_CELL_DEG
+    center_lon = (cell[1] + 0.5) * SEARCH_CACHE_CELL_DEG
+    return key, (center_lat, center_lon, max_distance + SEARCH_CACHE_CELL_RADIUS_KM)
+
+def lookup_search_page(key):
+    # Catalog chưa có version (đang dùng đường dự phòng) → không dùng cache
+    return search_cache.get(key) if key[0] is not None else None
+
+def remember_search_page(key, search_text, result):
+    """
+    Không cache kết quả rỗng của query có chữ (có thể do LLM lỗi/timeout, lần sau thử lại)
+    và không cache khi catalog chưa có version hoặc vừa đổi version trong lúc tính.
+    """
+    version = key[0]
+    if version is not None and version == catalog.version and (result[0] or not (search_text or "").strip()):
+        search_cache.set(key, result)
+
+def search_product(search_text, user_lat=21.0285, user_lon=105.8542, max_distance=None, price_range=None):
+    """Toàn bộ kết quả của search_page (không phân trang), xếp theo độ liên quan."""
+    return search_page(search_text, user_lat, user_lon, max_distance, price_range)[0]
+
+def filter_by_distance(results, max_distance, store_ids):
+    """
+    Lọc distance_km <= max_distance sau khi gom nhóm.
+    Chỉ cần khi chỉ mục cửa hàng lỗi (store_ids = None); bình thường đã cắt tỉa từ trước.
+    """
+    if max_distance is None or store_ids is not None:
+        return results
+
+    for r in results:
+        r["store"] = [
+            s for s in r["store"]
+            if s.get("distance_km") is not None and s["distance_km"] <= max_distance
+        ]
+    return [r for r in results if r["store"]]
+
+# Benchmark gom nhóm: chạy từ thư mục api/ bằng `python -m services.search_service`
+if __name__ == "__main__":
+    import time
+
+    def legacy_build_product_map(rows, user_lat=None, user_lon=None):
+        # Cách cũ: quét list store bằng next(...) và list ảnh bằng all(...) cho mỗi row
+        product_map = {}
+        for row in rows:
+            product_id = row["product_id"]
+            store_id = row.get("store_id")
+            if product_id not in product_map:
+                product_map[product_id] = {"product": {}, "location": {}, "store": []}
+            if store_id:
+                existing_store = next((s for s in product_map[product_id]["store"] if s["store_id"] == store_id), None)
+                if existing_store:
+                    if row.get("ps_image_url") and all(pi["ps_image_id"] != row["ps_image_id"] for pi in existing_store["product_images"]):
+                        existing_store["product_images"].append({
+                            "ps_id": row["ps_id"],
+                            "ps_image_id": row["ps_image_id"],
+                            "ps_image_url": row["ps_image_url"],
+                            "ps_type": row["ps_type"]
+                        })
+                else:
+                    product_map[product_id]["store"].append(build_store_info(row, user_lat, user_lon))
+        return product_map
+
+    def synthetic_rows(n_products, n_stores, n_images):
+        # Mô phỏng kết quả join: product x store x image
+        rows = []
+        for p in range(n_products):
+            for s in range(n_stores):
+                ps_id = p * 1000 + s
+                for i in range(n_images):
+                    rows.append({
+                        "product_id": p, "product_name": f"P{p}", "product_des": "", "product_image_url": "",
+                        "product_location_id": 1, "product_tag": "", "product_min_cost": 0, "product_max_cost": 0,
+                        "location_id": 1, "location_name": "", "location_max_long": 0, "location_min_long": 0,
+                        "location_max_lat": 0, "location_min_lat": 0,
+                        "store_id": s + 1, "store_name": f"S{s}", "store_address": "",
+                        "store_lat": 21.0 + s / 1000, "store_long": 105.8 + s / 1000, "store_location_id": 1,
+                        "ps_id": ps_id, "ps_store_id": s + 1, "ps_product_id": p,
+                        "ps_average_rating": 4.5, "ps_total_reviews": 10,
+                        "ps_min_price_store": 10000, "ps_max_price_store": 50000,
+                        "ps_image_id": ps_id * 100 + i, "ps_image_url": f"img{i}", "ps_type": "photo",
+                    })
+        return rows
+
+    for n_products, n_stores, n_images in ((20, 50, 20), (20, 100, 30)):
+        rows = synthetic_rows(n_products, n_stores, n_images)
+
+        t0 = time.perf_counter()
+        legacy = legacy_build_product_map(rows, 21.0285, 105.8542)
+        legacy_ms = (time.perf_counter() - t0) * 1000
+
+        t0 = time.perf_counter()
+        current = build_product_map(rows, 21.0285, 105.8542)
+        current_ms = (time.perf_counter() - t0) * 1000
+
+        # distance_km so sánh có sai số (bản vector hóa NumPy lệch ở vài chữ số cuối)
+        strip = lambda stores: [{**st, "distance_km": round(st["distance_km"], 9)} for st in stores]
+        assert [strip(p["store"]) for p in legacy.values()] == [strip(p["store"]) for p in current.values()]
+        print(f"{n_products} sp x {n_stores} store x {n_images} ảnh ({len(rows)} row) | "
+              f"cũ {legacy_ms:8.1f} ms | mới {current_ms:8.1f} ms")
+
+    # Dạng phẳng (1 row / product x store x ảnh) vs dạng gom nhóm json_agg (1 phần tử / product):
+    # kích thước payload và thời gian decode JSON + gom nhóm
+    import json
+
+    nested_store_fields = ("store_id", "store_name", "store_address", "store_lat", "store_long", "store_location_id",
+                           "ps_id", "ps_average_rating", "ps_total_reviews", "ps_min_price_store", "ps_max_price_store")
+    for n_products, n_stores, n_images in ((500, 5, 5), (2000, 5, 10)):
+        rows = synthetic_rows(n_products, n_stores, n_images)
+        nested = [
+            {
+                "product": entry["product"],
+                "location": entry["location"],
+                "store": [
+                    {**{k: store[k] for k in nested_store_fields}, "product_images": store["product_images"]}
+                    for store in entry["store"]
+                ],
+            }
+            for entry in build_product_map(rows).values()
+        ]
+        flat_body, nested_body = json.dumps(rows), json.dumps(nested)
+
+        t0 = time.perf_counter()
+        build_product_map(json.loads(flat_body), 21.0285, 105.8542)
+        flat_ms = (time.perf_counter() - t0) * 1000
+
+        t0 = time.perf_counter()
+        group_products(json.loads(nested_body), 21.0285, 105.8542)
+        nested_ms = (time.perf_counter() - t0) * 1000
+
+        print(f"{n_products} sp x {n_stores} store x {n_images} ảnh | phẳng {len(flat_body) / 1e6:6.1f} MB {flat_ms:7.1f} ms"
+              f" | gom nhóm {len(nested_body) / 1e6:6.1f} MB {nested_ms:7.1f} ms")
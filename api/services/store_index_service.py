@@ -0,0 +1,77 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+from database.fetch_data import fetch_stores
+from utils.spatial_index import GridIndex
+
+# Tuổi tối đa của chỉ mục cửa hàng (giây) trước khi nạp lại
+STORE_INDEX_REFRESH_SECONDS = int(os.getenv("STORE_INDEX_REFRESH_SECONDS", "300"))
+
+
+class StoreIndex:
+    """
+    Chỉ mục không gian các cửa hàng (store.lat/long) trong RAM của worker.
+    Trả lời truy vấn bán kính và k-gần-nhất mà không phải tính khoảng cách tới mọi store.
+    """
+
+    def __init__(self, refresh_seconds=STORE_INDEX_REFRESH_SECONDS, fetch=fetch_stores):
+        # fetch: hàm trả về danh sách store (mặc định đọc qua client Supabase chung)
+        self.fetch = fetch
+        self.refresh_seconds = refresh_seconds
+        self._grid = None
+        self._stores = {}       # {store_id: store dict}
+        self.version = None     # md5 nội dung danh sách store (dùng cho ETag)
+        self.loaded_at = None
+        self._lock = threading.Lock()
+
+    def ensure_loaded(self):
+        if self._grid is not None and time.time() - self.loaded_at < self.refresh_seconds:
+            return
+
+        with self._lock:
+            if self._grid is not None and time.time() - self.loaded_at < self.refresh_seconds:
+                return
+
+            stores = self.fetch()
+            self._stores = {s["store_id"]: s for s in stores}
+            self._grid = GridIndex(
+                (s["store_id"], float(s["lat"]), float(s["long"]))
+                for s in stores
+                if s.get("lat") is not None and s.get("long") is not None
+            )
+            self.version = hashlib.md5(
+                json.dumps(sorted(stores, key=lambda s: str(s["store_id"])), sort_keys=True, default=str).encode("utf-8")
+            ).hexdigest()[:16]
+            self.loaded_at = time.time()
+            print(f"🗺️ [STORE INDEX] Đã nạp {len(self._grid)} cửa hàng có toạ độ")
+
+    def invalidate(self):
+        """Buộc nạp lại ở lần truy vấn kế tiếp."""
+        self.loaded_at = 0
+
+    def stores(self):
+        """Toàn bộ cửa hàng (cấu trúc giống /map/api/stores), dùng chung, KHÔNG được sửa."""
+        self.ensure_loaded()
+        return list(self._stores.values())
+
+    def store_ids_within(self, lat, lon, radius_km):
+        """{store_id: distance_km} của các cửa hàng trong bán kính radius_km."""
+        self.ensure_loaded()
+        return {store_id: distance for distance, store_id in self._grid.within(lat, lon, radius_km)}
+
+    def nearby(self, lat, lon, k=10, radius_km=None):
+        """
+        k cửa hàng gần nhất (tùy chọn giới hạn trong radius_km), sắp theo khoảng cách.
+        Mỗi phần tử có cấu trúc giống /map/api/stores kèm distance_km.
+        """
+        self.ensure_loaded()
+        return [
+            {**self._stores[store_id], "distance_km": distance}
+            for distance, store_id in self._grid.nearest(lat, lon, k, radius_km)
+        ]
+
+
+store_index = StoreIndex()
@@ -0,0 +1,256 @@
+import math
+import os
+import threading
+
+from services.search_service import catalog
+from utils.haversine_function import np, haversine_array, haversine_batch
+
+# Có vị trí user: xếp theo store gần nhất trong top N theo đánh giá (request xin nhiều hơn → trong top limit)
+SUGGESTION_TOP_N = int(os.getenv("SUGGESTION_TOP_N", "50"))
+# Số review "ảo" kéo điểm về trung bình toàn catalog: 1 review 5 sao không vượt được 200 review 4.8 sao
+SUGGESTION_PRIOR_REVIEWS = float(os.getenv("SUGGESTION_PRIOR_REVIEWS", "5"))
+
+
+def product_rating(entry):
+    """(điểm trung bình theo số review, tổng số review) trên mọi store bán product."""
+    total_reviews = 0
+    weighted = 0.0
+    for store in entry["store"]:
+        reviews = store.get("ps_total_reviews") or 0
+        rating = store.get("ps_average_rating")
+        if reviews <= 0 or rating is None:
+            continue
+        total_reviews += reviews
+        weighted += float(rating) * reviews
+    return (weighted / total_reviews if total_reviews else 0.0), total_reviews
+
+
+def suggestion_item(product):
+    """Cùng cấu trúc với item của /api/suggest_products."""
+    return {
+        "product_id": product.get("product_id"),
+        "product_name": product.get("product_name"),
+        "product_image_url": product.get("product_image_url"),
+        "product_tag": product.get("product_tag"),
+        "min_price": product.get("product_min_cost"),
+        "max_price": product.get("product_max_cost"),
+    }
+
+
+class SuggestionPool:
+    """
+    Gợi ý dựng sẵn của 1 location: item đã xếp theo đánh giá + toạ độ store dạng mảng phẳng.
+    - lats/lons: toạ độ các store khác nhau của location (vị trí 0 là store "rỗng", toạ độ nan).
+    - pair_stores: vị trí store của từng cặp (product, store), các cặp của cùng product nằm liền nhau
+      bắt đầu tại offsets[i]; product không có store trỏ vào store rỗng → đoạn nào cũng khác rỗng.
+    Khoảng cách tới store gần nhất của mọi product = 1 lượt haversine trên các store + 1 lần reduceat.
+    """
+
+    def __init__(self, items, entries):
+        self.items = items
+        positions = {}          # {store_id: vị trí trong lats/lons}
+        lats, lons = [math.nan], [math.nan]
+        pair_stores, offsets = [], []
+        for entry in entries:
+            offsets.append(len(pair_stores))
+            start = len(pair_stores)
+            for store in entry["store"]:
+                store_id = store.get("store_id")
+                position = positions.get(store_id)
+                if position is None:
+                    position = positions[store_id] = len(lats)
+                    has_coords = store.get("store_lat") and store.get("store_long")
+                    lats.append(float(store["store_lat"]) if has_coords else math.nan)
+                    lons.append(float(store["store_long"]) if has_coords else math.nan)
+                pair_stores.append(position)
+            if len(pair_stores) == start:
+                pair_stores.append(0)
+
+        if np is not None:
+            self.lats, self.lons = np.array(lats), np.array(lons)
+            self.pair_stores, self.offsets = np.array(pair_stores, dtype=np.intp), np.array(offsets, dtype=np.intp)
+        else:
+            self.lats, self.lons, self.pair_stores, self.offsets = lats, lons, pair_stores, offsets
+
+    def nearest_distances(self, user_lat, user_lon, size=None):
+        """
+        Khoảng cách km tới store gần nhất của `size` item đầu (mặc định tất cả, theo thứ tự items);
+        None nếu không có toạ độ.
+        """
+        size = len(self.items) if size is None else min(size, len(self.items))
+        if not size:
+            return []
+        end = self.offsets[size] if size < len(self.items) else len(self.pair_stores)
+        if np is not None:
+            distances = haversine_array(user_lat, user_lon, self.lats, self.lons)
+            nearest = np.fmin.reduceat(distances[self.pair_stores[:end]], self.offsets[:size])  # fmin bỏ qua nan
+            return [None if d != d else d for d in nearest.tolist()]
+
+        distances = haversine_batch(user_lat, user_lon, [None if v != v else v for v in self.lats],
+                                    [None if v != v else v for v in self.lons])
+        ends = self.offsets[1:size] + [end]
+        nearest = []
+        for start, stop in zip(self.offsets[:size], ends):
+            known = [distances[p] for p in self.pair_stores[start:stop] if distances[p] is not None]
+            nearest.append(min(known) if known else None)
+        return nearest
+
+    def by_distance(self, user_lat, user_lon, limit, candidates=None):
+        """
+        `limit` item có store gần user nhất trong `candidates` item đầu (theo đánh giá; mặc định tất cả),
+        kèm distance_km; cùng khoảng cách thì giữ thứ tự đánh giá, item không có toạ độ đứng cuối.
+        """
+        nearest = self.nearest_distances(user_lat, user_lon, candidates)
+        order = sorted(range(len(nearest)), key=lambda i: math.inf if nearest[i] is None else nearest[i])
+        return [{**self.items[i], "distance_km": nearest[i]} for i in order[:limit]]
+
+
+class LocationSuggestions:
+    """
+    Danh sách gợi ý dựng sẵn cho từng location: mọi sản phẩm xếp theo điểm đánh giá
+    (trung bình Bayes của product_store.average_rating) rồi theo tổng total_reviews.
+    - Dựng từ catalog snapshot, dựng lại khi catalog đổi version (review thay đổi làm đổi fingerprint
+      của product_store → thread làm mới của catalog gọi on_change → dựng lại ngay, không đợi request).
+    - Mỗi request chỉ là 1 lần tra dict + cắt list; có vị trí user thì xếp lại theo store gần nhất
+      trên mảng toạ độ dựng sẵn của location (không truy vấn thêm theo từng product).
+    """
+
+    def __init__(self, catalog, top_n=SUGGESTION_TOP_N, prior_reviews=SUGGESTION_PRIOR_REVIEWS):
+        self.catalog = catalog
+        self.top_n = top_n
+        self.prior_reviews = prior_reviews
+        self._pools = None    # (catalog.entries_version, {location_id: SuggestionPool})
+        self._lock = threading.Lock()
+        catalog.on_change(self._on_catalog_change)
+
+    def _on_catalog_change(self, product_ids):
+        if self._pools is not None:
+            self.rebuild()
+
+    def rebuild(self):
+        self.catalog.ensure_loaded()
+        with self._lock:
+            version = self.catalog.entries_version
+            if self._pools is not None and self._pools[0] == version:
+                return self._pools[1]
+
+            ratings = []   # (location_id, rating, total_reviews, entry)
+            all_reviews = 0
+            all_weighted = 0.0
+            for _, entry in self.catalog.entries():
+                product = entry["product"]
+                location_id = product.get("product_location_id")
+                if location_id is None:
+                    continue
+                rating, total_reviews = product_rating(entry)
+                all_reviews += total_reviews
+                all_weighted += rating * total_reviews
+                ratings.append((location_id, rating, total_reviews, entry))
+
+            # Điểm Bayes: (C*m + Σ rating*reviews) / (m + Σ reviews), C = trung bình toàn catalog
+            prior_mean = all_weighted / all_reviews if all_reviews else 0.0
+            prior_weight = prior_mean * self.prior_reviews
+            ranked = {}
+            for location_id, rating, total_reviews, entry in ratings:
+                score = (prior_weight + rating * total_reviews) / (self.prior_reviews + total_reviews) \
+                    if self.prior_reviews + total_reviews else 0.0
+                ranked.setdefault(location_id, []).append(
+                    (-score, -total_reviews, entry["product"]["product_id"], entry))
+
+            pools = {}
+            for location_id, rows in ranked.items():
+                rows.sort(key=lambda row: row[:3])
+                pools[location_id] = SuggestionPool(
+                    [suggestion_item(row[3]["product"]) for row in rows], [row[3] for row in rows])
+
+            self._pools = (version, pools)
+            print(f"⭐ [SUGGEST] Dựng {len(pools)} danh sách gợi ý (version {version})")
+            return pools
+
+    def top(self, location_id, limit, user_lat=None, user_lon=None):
+        """
+        Top `limit` gợi ý của location, cùng 1 cách xếp dù limit lớn hay nhỏ.
+        Có vị trí user: trong top max(N, limit) theo đánh giá, ưu tiên sản phẩm có store gần nhất.
+        Không có: theo đánh giá (list item dùng chung, không sửa).
+        """
+        self.catalog.ensure_loaded()
+        cached = self._pools
+        pools = cached[1] if cached is not None and cached[0] == self.catalog.entries_version else self.rebuild()
+        pool = pools.get(location_id)
+        if pool is None:
+            return []
+        if user_lat is None or user_lon is None:
+            return pool.items[:limit]
+        return pool.by_distance(user_lat, user_lon, limit, max(self.top_n, limit))
+
+
+# Dùng chung snapshot catalog với tìm kiếm
+location_suggestions = LocationSuggestions(catalog)
+
+
+# Benchmark: chạy từ thư mục api/ bằng `python -m services.suggestion_service`
+if __name__ == "__main__":
+    import random
+    import time
+
+    from utils.haversine_function import haversine_function
+
+    class BenchCatalog:
+        def __init__(self, entries):
+            self._entries = entries
+            self.entries_version = "bench"
+
+        def ensure_loaded(self):
+            pass
+
+        def on_change(self, callback):
+            pass
+
+        def entries(self):
+            return self._entries.items()
+
+    def bench_entries(n_products, n_stores, stores_per_product, rnd):
+        stores = [{"store_id": s, "store_lat": rnd.uniform(20.9, 21.1), "store_long": rnd.uniform(105.7, 105.9)}
+                  for s in range(n_stores)]
+        entries = {}
+        for pid in range(n_products):
+            entries[pid] = {
+                "product": {"product_id": pid, "product_name": f"sp {pid}", "product_location_id": 1},
+                "store": [{**store, "ps_average_rating": rnd.uniform(3, 5), "ps_total_reviews": rnd.randint(0, 50)}
+                          for store in rnd.sample(stores, min(stores_per_product, n_stores))],
+            }
+        return entries
+
+    def per_product_loop(suggestions, user_lat, user_lon, limit):
+        # Cách làm thẳng: duyệt store của từng product bằng Python
+        pool = suggestions.rebuild()[1]  # location_id 1
+        nearest = []
+        for item in pool.items[:suggestions.top_n]:
+            entry = suggestions.catalog._entries[item["product_id"]]
+            nearest.append(min(haversine_function(user_lat, user_lon, s["store_lat"], s["store_long"])
+                               for s in entry["store"]))
+        order = sorted(range(len(nearest)), key=nearest.__getitem__)
+        return [pool.items[i]["product_id"] for i in order[:limit]]
+
+    rnd = random.Random(0)
+    rounds = 300
+    user_lat, user_lon = 21.0285, 105.8542
+    print(f"{'store/location':>14} {'store/sp':>9} | {'vector (ms)':>11} | {'vòng lặp (ms)':>13}")
+    for n_stores in (10, 100, 1000, 5000):
+        stores_per_product = max(1, n_stores // 10)
+        suggestions = LocationSuggestions(BenchCatalog(bench_entries(200, n_stores, stores_per_product, rnd)))
+        suggestions.rebuild()
+
+        fast = [item["product_id"] for item in suggestions.top(1, 8, user_lat, user_lon)]
+        assert fast == per_product_loop(suggestions, user_lat, user_lon, 8)
+
+        t0 = time.perf_counter()
+        for _ in range(rounds):
+            suggestions.top(1, 8, user_lat, user_lon)
+        vector_ms = (time.perf_counter() - t0) / rounds * 1000
+
+        t0 = time.perf_counter()
+        for _ in range(rounds // 10):
+            per_product_loop(suggestions, user_lat, user_lon, 8)
+        loop_ms = (time.perf_counter() - t0) / (rounds // 10) * 1000
+        print(f"{n_stores:>14} {stores_per_product:>9} | {vector_ms:>11.3f} | {loop_ms:>13.2f}")
@@ -0,0 +1,99 @@
+import math
+import threading
+from collections import Counter
+
+from utils.text_normalize import tokenize
+
+# Tham số BM25 chuẩn: K1 = độ bão hòa tần suất từ, B = mức chuẩn hóa theo độ dài
+K1 = 1.2
+B = 0.75
+
+# Trọng số mỗi trường: khớp tên quan trọng hơn khớp tag
+DEFAULT_FIELD_WEIGHTS = {"name": 1.0, "tag": 0.5}
+
+
+class BM25Index:
+    """
+    Chấm điểm liên quan kiểu BM25F trên nhiều trường văn bản (VD: tên + tag sản phẩm),
+    token đã bỏ dấu (fold_vietnamese).
+    - Thống kê (document frequency, độ dài từng trường, tổng độ dài) được cập nhật
+      ngay khi add/remove → lúc truy vấn chỉ còn tra posting list và cộng điểm.
+    - tf của các trường được chuẩn hóa theo độ dài rồi cộng có trọng số trước khi bão hòa.
+    """
+
+    def __init__(self, field_weights=None):
+        self.field_weights = dict(field_weights or DEFAULT_FIELD_WEIGHTS)
+        self._docs = {}        # {doc_id: {field: (Counter token, độ dài)}}
+        self._postings = {}    # {token: set(doc_id)}
+        self._total_length = {field: 0 for field in self.field_weights}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._docs)
+
+    def add(self, doc_id, fields):
+        """fields: {tên trường: văn bản}; trường không có trong field_weights bị bỏ qua."""
+        doc = {}
+        for field in self.field_weights:
+            tokens = tokenize(fields.get(field) or "")
+            doc[field] = (Counter(tokens), len(tokens))
+
+        with self._lock:
+            if doc_id in self._docs:
+                self._remove_locked(doc_id)
+            self._docs[doc_id] = doc
+            for field, (counts, length) in doc.items():
+                self._total_length[field] += length
+                for token in counts:
+                    self._postings.setdefault(token, set()).add(doc_id)
+
+    def remove(self, doc_id):
+        with self._lock:
+            self._remove_locked(doc_id)
+
+    def _remove_locked(self, doc_id):
+        doc = self._docs.pop(doc_id, None)
+        if doc is None:
+            return
+        for field, (counts, length) in doc.items():
+            self._total_length[field] -= length
+            for token in counts:
+                ids = self._postings.get(token)
+                if ids is not None:
+                    ids.discard(doc_id)
+                    if not ids:
+                        del self._postings[token]
+
+    def scores(self, text, candidates=None):
+        """
+        {doc_id: điểm} cho các doc chứa ít nhất 1 token của text.
+        candidates: nếu có, chỉ chấm điểm các doc trong tập này.
+        """
+        query_tokens = set(tokenize(text))
+        with self._lock:
+            n_docs = len(self._docs)
+            if not n_docs or not query_tokens:
+                return {}
+
+            # Hệ số chuẩn hóa độ dài của từng trường: 1 - B + B * len / avg_len
+            avg_length = {field: (total / n_docs) or 1 for field, total in self._total_length.items()}
+
+            result = {}
+            for token in query_tokens:
+                ids = self._postings.get(token)
+                if not ids:
+                    continue
+                df = len(ids)
+                idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+                if candidates is not None:
+                    ids = ids & candidates
+
+                for doc_id in ids:
+                    tf = 0.0
+                    for field, (counts, length) in self._docs[doc_id].items():
+                        count = counts.get(token)
+                        if count:
+                            norm = 1 - B + B * length / avg_length[field]
+                            tf += self.field_weights[field] * count / norm
+                    result[doc_id] = result.get(doc_id, 0.0) + idf * tf * (K1 + 1) / (K1 + tf)
+            return result
@@ -0,0 +1,71 @@
+from bisect import bisect_right
+
+
+class BoxIndex:
+    """
+    Chỉ mục "điểm thuộc hình chữ nhật nào" (bounding box lat/long, biên tính cả 2 đầu như BETWEEN).
+    Chia trục lat thành các dải (slab) giữa những mốc min_lat/max_lat khác nhau; mỗi dải lưu sẵn
+    các box phủ trọn dải đó (theo thứ tự thêm vào).
+    Truy vấn = 1 lần bisect tìm dải + kiểm tra long của vài box trong dải → O(log n + k).
+    Chỉ mục bất biến: dữ liệu đổi thì dựng bản mới.
+    """
+
+    def __init__(self, boxes=()):
+        # boxes: iterable (key, min_lat, max_lat, min_lon, max_lon); box rỗng/suy biến theo lat bị bỏ qua
+        self._boxes = [tuple(box) for box in boxes if box[1] < box[2] and box[3] <= box[4]]
+        self._order = {id(box): i for i, box in enumerate(self._boxes)}
+        self._bounds = sorted({lat for box in self._boxes for lat in (box[1], box[2])})
+        self._slabs = [
+            [box for box in self._boxes if box[1] <= low and high <= box[2]]
+            for low, high in zip(self._bounds, self._bounds[1:])
+        ]
+
+    def __len__(self):
+        return len(self._boxes)
+
+    def _candidates(self, lat):
+        i = bisect_right(self._bounds, lat) - 1
+        if i < 0:
+            return []
+        candidates = list(self._slabs[i]) if i < len(self._slabs) else []
+        if self._bounds[i] == lat and i > 0:
+            # Điểm nằm đúng trên mốc: thêm các box kết thúc tại mốc này (thuộc dải bên dưới)
+            candidates += [box for box in self._slabs[i - 1] if box[2] == lat]
+        return candidates
+
+    def containing(self, lat, lon):
+        """Key của các box chứa điểm (lat, lon), theo thứ tự thêm vào."""
+        hits = [box for box in self._candidates(lat) if box[1] <= lat <= box[2] and box[3] <= lon <= box[4]]
+        if len(hits) > 1:
+            hits.sort(key=lambda box: self._order[id(box)])
+        return [box[0] for box in hits]
+
+    def first(self, lat, lon):
+        """Key của box đầu tiên (theo thứ tự thêm vào) chứa điểm, hoặc None."""
+        keys = self.containing(lat, lon)
+        return keys[0] if keys else None
+
+
+# Benchmark: chạy từ thư mục api/ bằng `python -m utils.box_index`
+if __name__ == "__main__":
+    import random
+    import time
+
+    rnd = random.Random(0)
+    boxes = []
+    for key in range(63):
+        lat, lon = rnd.uniform(8.5, 23.4), rnd.uniform(102.1, 109.5)
+        boxes.append((key, lat, lat + rnd.uniform(0.2, 1.5), lon, lon + rnd.uniform(0.2, 1.5)))
+    index = BoxIndex(boxes)
+
+    points = [(rnd.uniform(8, 24), rnd.uniform(102, 110)) for _ in range(20000)]
+    points += [(box[2], box[3]) for box in boxes]  # điểm nằm đúng trên biên
+    for lat, lon in points:
+        expected = [b[0] for b in boxes if b[1] <= lat <= b[2] and b[3] <= lon <= b[4]]
+        assert index.containing(lat, lon) == expected
+
+    t0 = time.perf_counter()
+    for lat, lon in points:
+        index.first(lat, lon)
+    per_query_us = (time.perf_counter() - t0) / len(points) * 1e6
+    print(f"{len(index)} box, {len(index._slabs)} dải | {per_query_us:.2f} µs / truy vấn")
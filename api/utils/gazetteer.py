@@ -0,0 +1,220 @@
+import re
+
+from utils.spell_corrector import MAX_EDIT_DISTANCE, deletes, edit_distance
+from utils.text_normalize import tokenize
+
+HCM = "TP. Hồ Chí Minh"
+HA_NOI = "Hà Nội"
+
+# 63 tỉnh/thành (tên chuẩn trả về giống prompt của get_standard_location) kèm tên gọi khác,
+# viết tắt, thành phố/địa danh nổi tiếng trực thuộc. TP.HCM và Hà Nội đứng đầu:
+# alias trùng nhau giữa 2 tỉnh thì tỉnh đăng ký trước được giữ (ưu tiên TP.HCM như prompt LLM).
+PROVINCES = {
+    HCM: ["Hồ Chí Minh", "Thành phố Hồ Chí Minh", "TP HCM", "TPHCM", "HCM", "HCMC", "Ho Chi Minh City",
+          "Sài Gòn", "Saigon", "SG", "Thủ Đức", "Bình Thạnh", "Gò Vấp", "Phú Nhuận", "Tân Bình", "Tân Phú",
+          "Bình Tân", "Bình Chánh", "Hóc Môn", "Củ Chi", "Nhà Bè", "Cần Giờ", "Chợ Lớn"],
+    HA_NOI: ["HN", "Hanoi", "Thủ đô", "Ba Đình", "Hoàn Kiếm", "Hai Bà Trưng", "Đống Đa", "Tây Hồ", "Cầu Giấy",
+             "Thanh Xuân", "Hoàng Mai", "Long Biên", "Từ Liêm", "Bắc Từ Liêm", "Nam Từ Liêm", "Hà Đông",
+             "Sơn Tây", "Ba Vì", "Chương Mỹ", "Đan Phượng", "Đông Anh", "Gia Lâm", "Hoài Đức", "Mê Linh",
+             "Mỹ Đức", "Phú Xuyên", "Phúc Thọ", "Quốc Oai", "Sóc Sơn", "Thạch Thất", "Thanh Oai", "Thanh Trì",
+             "Thường Tín", "Ứng Hòa", "Phố cổ"],
+    "Hải Phòng": ["HP", "Cát Bà", "Đồ Sơn", "Thủy Nguyên"],
+    "Đà Nẵng": ["Danang", "Hải Châu", "Sơn Trà", "Ngũ Hành Sơn", "Liên Chiểu", "Thanh Khê", "Cẩm Lệ",
+                "Hòa Vang", "Bà Nà"],
+    "Cần Thơ": ["Ninh Kiều", "Cái Răng", "Bình Thủy"],
+    "An Giang": ["Long Xuyên", "Châu Đốc"],
+    "Bà Rịa - Vũng Tàu": ["BRVT", "Vũng Tàu", "Bà Rịa", "Côn Đảo", "Long Hải"],
+    "Bắc Giang": [],
+    "Bắc Kạn": ["Bắc Cạn"],
+    "Bạc Liêu": [],
+    "Bắc Ninh": ["Từ Sơn"],
+    "Bến Tre": [],
+    "Bình Định": ["Quy Nhơn"],
+    "Bình Dương": ["Thủ Dầu Một", "Dĩ An", "Thuận An"],
+    "Bình Phước": ["Đồng Xoài"],
+    "Bình Thuận": ["Phan Thiết", "Mũi Né"],
+    "Cà Mau": [],
+    "Cao Bằng": [],
+    "Đắk Lắk": ["Đắc Lắc", "Buôn Ma Thuột", "Buôn Mê Thuột", "BMT"],
+    "Đắk Nông": ["Gia Nghĩa"],
+    "Điện Biên": ["Điện Biên Phủ"],
+    "Đồng Nai": ["Biên Hòa", "Long Khánh"],
+    "Đồng Tháp": ["Cao Lãnh", "Sa Đéc"],
+    "Gia Lai": ["Pleiku"],
+    "Hà Giang": [],
+    "Hà Nam": ["Phủ Lý"],
+    "Hà Tĩnh": [],
+    "Hải Dương": [],
+    "Hậu Giang": ["Vị Thanh"],
+    "Hòa Bình": ["Mai Châu"],
+    "Hưng Yên": [],
+    "Khánh Hòa": ["Nha Trang", "Cam Ranh"],
+    "Kiên Giang": ["Phú Quốc", "Rạch Giá", "Hà Tiên"],
+    "Kon Tum": [],
+    "Lai Châu": [],
+    "Lâm Đồng": ["Đà Lạt", "Bảo Lộc"],
+    "Lạng Sơn": [],
+    "Lào Cai": ["Sa Pa", "Sapa"],
+    "Long An": ["Tân An"],
+    "Nam Định": [],
+    "Nghệ An": ["Vinh", "Cửa Lò"],
+    "Ninh Bình": ["Tràng An", "Tam Cốc"],
+    "Ninh Thuận": ["Phan Rang"],
+    "Phú Thọ": ["Việt Trì"],
+    "Phú Yên": ["Tuy Hòa"],
+    "Quảng Bình": ["Đồng Hới", "Phong Nha"],
+    "Quảng Nam": ["Hội An", "Tam Kỳ"],
+    "Quảng Ngãi": [],
+    "Quảng Ninh": ["Hạ Long", "Móng Cái", "Cẩm Phả", "Uông Bí"],
+    "Quảng Trị": ["Đông Hà"],
+    "Sóc Trăng": [],
+    "Sơn La": ["Mộc Châu"],
+    "Tây Ninh": [],
+    "Thái Bình": [],
+    "Thái Nguyên": [],
+    "Thanh Hóa": ["Sầm Sơn"],
+    "Thừa Thiên Huế": ["Huế", "TT Huế", "TTH"],
+    "Tiền Giang": ["Mỹ Tho"],
+    "Trà Vinh": [],
+    "Tuyên Quang": [],
+    "Vĩnh Long": [],
+    "Vĩnh Phúc": ["Vĩnh Yên", "Tam Đảo"],
+    "Yên Bái": [],
+}
+
+# Quận số của TP.HCM (gồm cả Quận 2, 9 cũ nay thuộc Thủ Đức): "Quận 1", "Q1", "Q.1"
+HCM_NUMBERED_DISTRICTS = (1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12)
+
+# Tiền tố hành chính bỏ đi khi tra lần 2 ("Thành phố Đà Nẵng" → "Đà Nẵng")
+ADMIN_PREFIXES = (
+    ("thanh", "pho"), ("tp",), ("tinh",), ("quan",), ("q",), ("huyen",), ("thi", "xa"), ("tx",),
+    ("thi", "tran"), ("tt",), ("phuong",), ("xa",),
+)
+# Các phần của địa chỉ không mang thông tin tỉnh/thành
+IGNORED_PARTS = {"vietnam", "vn"}
+
+
+def location_key(text):
+    """Khóa tra cứu: bỏ dấu, bỏ ký tự đặc biệt và khoảng trắng ("Hà  Nội" / "hanoi" → "hanoi")."""
+    return "".join(tokenize(text))
+
+
+def fuzzy_edits(key):
+    """Số lỗi cho phép khi khớp mờ: chặt hơn tên sản phẩm vì tên địa danh ngắn rất dễ giống nhau ("vinh"/"binh")."""
+    if len(key) <= 4:
+        return 0
+    if len(key) <= 7:
+        return 1
+    return 2
+
+
+def strip_admin_prefix(tokens):
+    for prefix in ADMIN_PREFIXES:
+        if len(tokens) > len(prefix) and tuple(tokens[:len(prefix)]) == prefix:
+            return tokens[len(prefix):]
+    return tokens
+
+
+class Gazetteer:
+    """
+    Tra tên tỉnh/thành chuẩn từ tên người dùng gõ (tỉnh, quận/huyện, địa danh, viết tắt, sai chính tả).
+    - Khớp chính xác: 1 lần tra dict trên khóa không dấu, không khoảng trắng.
+    - Khớp mờ: symmetric delete (như SpellCorrector) trên các khóa, chấp nhận khi
+      ứng viên gần nhất duy nhất hoặc mọi ứng viên gần nhất cùng 1 tỉnh.
+    """
+
+    def __init__(self, provinces=PROVINCES):
+        self._provinces = {}   # {khóa: tên tỉnh chuẩn}
+        self._deletes = {}     # {biến thể xóa: set(khóa)}
+        for name, aliases in provinces.items():
+            for alias in (name, *aliases):
+                self._add(alias, name)
+                self._add(" ".join(strip_admin_prefix(tokenize(alias))), name)
+        for number in HCM_NUMBERED_DISTRICTS:
+            for alias in (f"quận {number}", f"q{number}"):
+                self._add(alias, HCM)
+
+    def _add(self, alias, name):
+        key = location_key(alias)
+        if not key or key in self._provinces:
+            return
+        self._provinces[key] = name
+        # Viết tắt ("hn", "sg") và quận số ("q1") chỉ khớp chính xác
+        if len(key) > 2 and not any(ch.isdigit() for ch in key):
+            for variant in deletes(key, MAX_EDIT_DISTANCE):
+                self._deletes.setdefault(variant, set()).add(key)
+
+    def __len__(self):
+        return len(self._provinces)
+
+    def exact(self, text):
+        tokens = tokenize(text)
+        if not tokens:
+            return None
+        name = self._provinces.get("".join(tokens))
+        if name is None:
+            name = self._provinces.get("".join(strip_admin_prefix(tokens)))
+        return name
+
+    def fuzzy(self, text):
+        key = location_key(" ".join(strip_admin_prefix(tokenize(text))))
+        limit = fuzzy_edits(key)
+        if not limit:
+            return None
+
+        candidates = set()
+        for variant in deletes(key, limit):
+            candidates |= self._deletes.get(variant, set())
+
+        best_distance = limit + 1
+        names = set()
+        for candidate in candidates:
+            distance = edit_distance(key, candidate, limit)
+            if distance < best_distance:
+                best_distance, names = distance, {self._provinces[candidate]}
+            elif distance == best_distance:
+                names.add(self._provinces[candidate])
+
+        if best_distance > limit or len(names) != 1:
+            return None
+        return names.pop()
+
+    def lookup(self, text):
+        """
+        Tên tỉnh/thành chuẩn cho text, hoặc None nếu không chắc chắn.
+        Text có thể là địa chỉ nhiều phần ("12 Lê Lợi, Q.1, TP.HCM"): thử cả chuỗi rồi từng phần
+        từ cuối lên (tỉnh thường nằm cuối), khớp chính xác trước rồi mới khớp mờ.
+        """
+        parts = [text] + [part for part in reversed(re.split(r"[,;/|]| - ", text or "")) if part.strip()]
+        parts = [part for part in parts if location_key(part) not in IGNORED_PARTS]
+        for match in (self.exact, self.fuzzy):
+            for part in parts:
+                name = match(part)
+                if name:
+                    return name
+        return None
+
+
+gazetteer = Gazetteer()
+
+
+# Benchmark: chạy từ thư mục api/ bằng `python -m utils.gazetteer`
+if __name__ == "__main__":
+    import time
+
+    assert len(PROVINCES) == 63
+
+    cases = ["HN", "Q1", "q.3", "sai gon", "tp hcm", "TP.HCM", "Hội An", "quan cau giay", "Thành phố Đà Nẵng",
+             "ha noi", "hanoi", "Ha Nol", "Da Nang", "đà lạt", "nha trang", "vung tau", "Đắc Lắc", "hue",
+             "12 Lê Lợi, Phường Bến Nghé, Quận 1, TP. Hồ Chí Minh", "Cầu Giấy, Hà Nội, Việt Nam",
+             "thanh hoa", "quang ngai", "abc xyz linh tinh"]
+    for case in cases:
+        print(f"{case!r:56} -> {gazetteer.lookup(case)!r}")
+
+    rounds = 2000
+    t0 = time.perf_counter()
+    for _ in range(rounds):
+        for case in cases:
+            gazetteer.lookup(case)
+    per_lookup_us = (time.perf_counter() - t0) / (rounds * len(cases)) * 1e6
+    print(f"{len(gazetteer)} khóa | {per_lookup_us:.1f} µs / lần tra (LLM: ~0.5-10 s / lần gọi)")
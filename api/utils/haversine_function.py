@@ -1,10 +1,19 @@
 import math
 
+try:
+    import numpy as np
+except ImportError:  # NumPy không bắt buộc: thiếu thì dùng vòng lặp Python
+    np = None
+
+R = 6371  # bán kính Trái Đất (km)
+
+# Lô nhỏ hơn ngưỡng này thì vòng lặp Python nhanh hơn chi phí tạo mảng NumPy
+NUMPY_MIN_BATCH = 16
+
 def haversine_function(lat1, lon1, lat2, lon2):
     """
     Trả về khoảng cách km giữa 2 điểm GPS.
     """
-    R = 6371  # bán kính Trái Đất (km)
     phi1, phi2 = math.radians(lat1), math.radians(lat2)
     d_phi = math.radians(lat2 - lat1)
     d_lambda = math.radians(lon2 - lon1)
@@ -12,3 +21,47 @@ def haversine_function(lat1, lon1, lat2, lon2):
     a = math.sin(d_phi/2)**2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda/2)**2
     c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
     return R * c
+
+def haversine_batch(lat, lon, lats, lons):
+    """
+    Khoảng cách km từ 1 điểm (lat, lon) tới nhiều điểm (lats[i], lons[i]) trong 1 lượt.
+    Điểm có toạ độ None -> None ở vị trí tương ứng. Trả về list float/None.
+    """
+    if np is None or len(lats) < NUMPY_MIN_BATCH:
+        return [
+            haversine_function(lat, lon, lat2, lon2) if lat2 is not None and lon2 is not None else None
+            for lat2, lon2 in zip(lats, lons)
+        ]
+
+    distances = haversine_array(lat, lon, np.array(lats, dtype=float), np.array(lons, dtype=float))  # None -> nan
+    return [None if d != d else d for d in distances.tolist()]  # nan -> None
+
+def haversine_array(lat, lon, lats, lons):
+    """
+    Như haversine_batch nhưng nhận và trả mảng NumPy float (toạ độ nan -> khoảng cách nan).
+    Dùng cho mảng toạ độ dựng sẵn, không tốn chi phí chuyển list <-> mảng ở mỗi request.
+    """
+    lat2 = np.radians(lats)
+    lon2 = np.radians(lons)
+    phi1 = math.radians(lat)
+
+    a = np.sin((lat2 - phi1) / 2) ** 2 + math.cos(phi1) * np.cos(lat2) * np.sin((lon2 - math.radians(lon)) / 2) ** 2
+    return 2 * R * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+def store_distances(user_lat, user_lon, stores):
+    """
+    Khoảng cách từ user tới từng store (dict có store_lat/store_long) theo thứ tự.
+    Store thiếu toạ độ hoặc chưa có vị trí user -> None.
+    """
+    if user_lat is None or user_lon is None:
+        return [None] * len(stores)
+
+    lats, lons = [], []
+    for store in stores:
+        if store.get("store_lat") and store.get("store_long"):
+            lats.append(store["store_lat"])
+            lons.append(store["store_long"])
+        else:
+            lats.append(None)
+            lons.append(None)
+    return haversine_batch(user_lat, user_lon, lats, lons)
@@ -0,0 +1,89 @@
+from bisect import bisect_left
+
+from utils.text_normalize import tokenize
+
+
+def fold_phrase(text):
+    """Chuỗi không dấu, các từ cách nhau 1 khoảng trắng: "Bún  Chả!" -> "bun cha"."""
+    return " ".join(tokenize(text))
+
+
+class PrefixIndex:
+    """
+    Gợi ý hoàn thành (typeahead) theo tiền tố trên tên + tag đã bỏ dấu.
+    Dữ liệu là các mảng đã sắp xếp (tra bằng bisect), chia theo mức ưu tiên:
+      0. Tên bắt đầu bằng tiền tố           ("bun c"  -> "Bún chả Hà Nội")
+      1. Một từ giữa tên bắt đầu bằng tiền tố ("ha n"   -> "Bún chả Hà Nội")
+      2. Tag bắt đầu bằng tiền tố
+    Mỗi truy vấn = vài lần bisect + đọc tối đa limit phần tử mỗi mức → O(log n + limit).
+    Chỉ mục bất biến: catalog đổi thì dựng bản mới.
+    """
+
+    def __init__(self, items=()):
+        # items: iterable (doc_id, name, tag)
+        tiers = ([], [], [])
+        for doc_id, name, tag in items:
+            words = fold_phrase(name).split()
+            if words:
+                tiers[0].append((" ".join(words), doc_id))
+                for i in range(1, len(words)):
+                    tiers[1].append((" ".join(words[i:]), doc_id))
+            folded_tag = fold_phrase(tag)
+            if folded_tag:
+                tiers[2].append((folded_tag, doc_id))
+
+        self._keys = []
+        self._ids = []
+        for entries in tiers:
+            entries.sort()
+            self._keys.append([key for key, _ in entries])
+            self._ids.append([doc_id for _, doc_id in entries])
+        self._size = len(tiers[0])
+
+    def __len__(self):
+        return self._size
+
+    def complete(self, prefix, limit=10):
+        """Tối đa limit doc_id (không trùng) khớp tiền tố, theo mức ưu tiên rồi thứ tự chữ cái."""
+        prefix = fold_phrase(prefix)
+        if not prefix or limit <= 0:
+            return []
+
+        found = []
+        seen = set()
+        for keys, ids in zip(self._keys, self._ids):
+            i = bisect_left(keys, prefix)
+            while i < len(keys) and keys[i].startswith(prefix):
+                doc_id = ids[i]
+                if doc_id not in seen:
+                    seen.add(doc_id)
+                    found.append(doc_id)
+                    if len(found) >= limit:
+                        return found
+                i += 1
+        return found
+
+
+# Benchmark: chạy từ thư mục api/ bằng `python -m utils.prefix_index`
+if __name__ == "__main__":
+    import random
+    import time
+
+    words = ["bún", "chả", "phở", "bò", "cơm", "tấm", "sườn", "bánh", "mì", "trà", "sữa", "gỏi", "cuốn",
+             "lẩu", "thái", "hải", "sản", "đặc", "biệt", "hà", "nội", "huế", "nướng", "chiên", "xào"]
+    rnd = random.Random(0)
+    for n in (10_000, 100_000):
+        items = [(i, " ".join(rnd.choice(words) for _ in range(rnd.randint(2, 5))), rnd.choice(words))
+                 for i in range(n)]
+        t0 = time.perf_counter()
+        index = PrefixIndex(items)
+        build_ms = (time.perf_counter() - t0) * 1000
+
+        queries = ["b", "bu", "bun c", "pho b", "ha n", "com tam s", "xyz"]
+        rounds = 2000
+        t0 = time.perf_counter()
+        for _ in range(rounds):
+            for q in queries:
+                index.complete(q, 10)
+        per_query_us = (time.perf_counter() - t0) / (rounds * len(queries)) * 1e6
+        print(f"{n} sản phẩm | dựng {build_ms:7.1f} ms | {per_query_us:6.1f} µs / truy vấn (top 10)")
@@ -0,0 +1,96 @@
+import math
+
+from utils.haversine_function import R, haversine_batch
+
+KM_PER_DEG = 2 * math.pi * R / 360
+# Biên an toàn: khoảng cách theo vòng tròn lớn lệch chút so với hình bao phẳng theo độ
+SAFETY = 1.01
+
+
+class GridIndex:
+    """
+    Chỉ mục không gian dạng lưới (giống geohash): mỗi ô cell_deg x cell_deg độ
+    chứa danh sách điểm nằm trong nó.
+    - within(): chỉ xét các ô giao với hình bao của bán kính.
+    - nearest(): mở rộng dần theo từng vòng ô quanh điểm truy vấn, dừng khi
+      k điểm tốt nhất chắc chắn gần hơn mọi ô chưa xét.
+    """
+
+    def __init__(self, points=(), cell_deg=0.05):
+        # points: iterable (key, lat, lon); cell 0.05° ~ 5.5 km
+        self.cell_deg = cell_deg
+        self._cells = {}
+        self._size = 0
+        for key, lat, lon in points:
+            self.add(key, lat, lon)
+
+    def __len__(self):
+        return self._size
+
+    def _cell(self, lat, lon):
+        return (math.floor(lat / self.cell_deg), math.floor(lon / self.cell_deg))
+
+    def add(self, key, lat, lon):
+        self._cells.setdefault(self._cell(lat, lon), []).append((key, lat, lon))
+        self._size += 1
+
+    def _measure(self, lat, lon, cells):
+        points = [p for cell in cells for p in self._cells.get(cell, ())]
+        distances = haversine_batch(lat, lon, [p[1] for p in points], [p[2] for p in points])
+        return [(d, p[0]) for d, p in zip(distances, points)]
+
+    def within(self, lat, lon, radius_km):
+        """Các (distance_km, key) trong bán kính radius_km, sắp theo khoảng cách tăng dần."""
+        d_lat = SAFETY * radius_km / KM_PER_DEG
+        d_lon = SAFETY * radius_km / (KM_PER_DEG * max(math.cos(math.radians(min(abs(lat) + d_lat, 90))), 0.01))
+
+        min_row, min_col = self._cell(lat - d_lat, lon - d_lon)
+        max_row, max_col = self._cell(lat + d_lat, lon + d_lon)
+
+        if (max_row - min_row + 1) * (max_col - min_col + 1) > len(self._cells):
+            # Bán kính phủ nhiều ô hơn số ô có dữ liệu -> duyệt thẳng các ô có dữ liệu
+            cells = [c for c in self._cells if min_row <= c[0] <= max_row and min_col <= c[1] <= max_col]
+        else:
+            cells = [(r, c) for r in range(min_row, max_row + 1) for c in range(min_col, max_col + 1)]
+
+        hits = [(d, key) for d, key in self._measure(lat, lon, cells) if d <= radius_km]
+        hits.sort(key=lambda hit: hit[0])
+        return hits
+
+    def nearest(self, lat, lon, k, max_radius_km=None):
+        """k điểm gần nhất dạng (distance_km, key), tùy chọn giới hạn trong max_radius_km."""
+        if k <= 0 or not self._cells:
+            return []
+
+        row0, col0 = self._cell(lat, lon)
+        rows = [c[0] for c in self._cells]
+        cols = [c[1] for c in self._cells]
+        max_ring = max(abs(row0 - min(rows)), abs(row0 - max(rows)), abs(col0 - min(cols)), abs(col0 - max(cols)))
+
+        found = []
+        for ring in range(max_ring + 1):
+            if ring == 0:
+                cells = [(row0, col0)]
+            else:
+                # Chỉ các ô nằm trên viền vòng thứ ring
+                span = range(-ring, ring + 1)
+                inner = range(-ring + 1, ring)
+                cells = ([(row0 - ring, col0 + dc) for dc in span] + [(row0 + ring, col0 + dc) for dc in span]
+                         + [(row0 + dr, col0 - ring) for dr in inner] + [(row0 + dr, col0 + ring) for dr in inner])
+            found.extend(self._measure(lat, lon, cells))
+
+            # Khoảng cách tối thiểu tới các ô thuộc vòng kế tiếp: ring x cạnh ngắn nhất của 1 ô
+            edge_lat = min(abs(lat) + (ring + 1) * self.cell_deg, 90)
+            cell_km = self.cell_deg * KM_PER_DEG * max(math.cos(math.radians(edge_lat)), 0.0)
+            frontier_km = ring * cell_km / SAFETY
+            if max_radius_km is not None and frontier_km > max_radius_km:
+                break
+            if len(found) >= k:
+                found.sort(key=lambda hit: hit[0])
+                if found[k - 1][0] <= frontier_km:
+                    break
+
+        if max_radius_km is not None:
+            found = [hit for hit in found if hit[0] <= max_radius_km]
+        found.sort(key=lambda hit: hit[0])
+        return found[:k]
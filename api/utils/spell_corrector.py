@@ -0,0 +1,147 @@
+from utils.text_normalize import tokenize
+
+# Số lỗi tối đa mà từ điển hỗ trợ (độ sâu biến thể xóa khi dựng)
+MAX_EDIT_DISTANCE = 2
+
+
+def max_edits(word):
+    """Số lỗi cho phép theo độ dài từ: từ càng ngắn càng phải khớp chặt."""
+    if len(word) <= 2:
+        return 0
+    if len(word) <= 4:
+        return 1
+    return 2
+
+
+def deletes(word, distance):
+    """Mọi biến thể thu được khi xóa tối đa `distance` ký tự của word (kể cả chính nó)."""
+    variants = {word}
+    frontier = {word}
+    for _ in range(distance):
+        frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))} - variants
+        variants |= frontier
+    return variants
+
+
+def edit_distance(a, b, limit):
+    """Khoảng cách Damerau-Levenshtein (OSA) giữa a và b; vượt limit → limit + 1."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+
+    prev2 = None
+    prev = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                cur[j] = min(cur[j], prev2[j - 2] + 1)
+        if min(cur) > limit:
+            return limit + 1
+        prev2, prev = prev, cur
+    return prev[-1]
+
+
+class SpellCorrector:
+    """
+    Sửa lỗi chính tả cục bộ bằng thuật toán symmetric delete (kiểu SymSpell)
+    trên các từ (đã bỏ dấu) trong tên sản phẩm.
+    - Dựng: với mỗi từ trong từ điển, lưu mọi biến thể xóa tối đa 2 ký tự.
+    - Tra: sinh biến thể xóa của từ nhập, tra dict → ứng viên → tính khoảng cách thật.
+    Không cần so với toàn bộ từ điển nên mỗi từ chỉ tốn vài micro giây.
+    """
+
+    def __init__(self, words=()):
+        self._counts = {}    # {từ: số sản phẩm chứa từ đó}
+        self._deletes = {}   # {biến thể xóa: set(từ gốc)}
+        for word in words:
+            self.add_word(word)
+
+    def __contains__(self, word):
+        return word in self._counts
+
+    def __len__(self):
+        return len(self._counts)
+
+    def add_word(self, word, count=1):
+        if word in self._counts:
+            self._counts[word] += count
+            return
+        self._counts[word] = count
+        for variant in deletes(word, MAX_EDIT_DISTANCE):
+            self._deletes.setdefault(variant, set()).add(word)
+
+    def add_text(self, text):
+        """Thêm các từ (không trùng) của một tên sản phẩm vào từ điển."""
+        for word in set(tokenize(text)):
+            self.add_word(word)
+
+    def lookup(self, token):
+        """
+        Từ đúng gần nhất cho token (đã bỏ dấu) dạng (word, distance),
+        hoặc None nếu không có ứng viên hoặc có nhiều ứng viên ngang nhau (không chắc chắn).
+        """
+        if token in self._counts:
+            return token, 0
+
+        limit = max_edits(token)
+        candidates = set()
+        for variant in deletes(token, limit):
+            candidates |= self._deletes.get(variant, set())
+
+        best = None
+        ambiguous = False
+        for word in candidates:
+            distance = edit_distance(token, word, limit)
+            if distance > limit:
+                continue
+            rank = (distance, -self._counts[word])
+            if best is None or rank < best[0]:
+                best, ambiguous = (rank, word), False
+            elif rank == best[0]:
+                ambiguous = True
+
+        if best is None or ambiguous:
+            return None
+        return best[1], best[0][0]
+
+    def correct(self, text):
+        """
+        Sửa từng từ của text. Trả về chuỗi đã sửa (bỏ dấu, có thể không đổi) nếu MỌI từ
+        đều được nhận ra chắc chắn; ngược lại trả về None.
+        """
+        tokens = tokenize(text)
+        if not tokens:
+            return None
+
+        corrected = []
+        for token in tokens:
+            match = self.lookup(token)
+            if match is None:
+                return None
+            corrected.append(match[0])
+        return " ".join(corrected)
+
+
+# Benchmark: chạy từ thư mục api/ bằng `python -m utils.spell_corrector`
+if __name__ == "__main__":
+    import time
+
+    names = ["Bún chả Hà Nội", "Bún bò Huế", "Phở bò tái", "Cơm tấm sườn bì", "Bánh mì đặc biệt",
+             "Trà sữa trân châu", "Gỏi cuốn tôm thịt", "Lẩu thái hải sản", "Đậu phụ sốt cà chua"]
+    corrector = SpellCorrector()
+    for name in names:
+        corrector.add_text(name)
+
+    queries = ["bun cha", "pho boo", "com tammm", "tra sua tran chau", "laau thai", "dau phuu", "xyz abc"]
+    rounds = 2000
+    t0 = time.perf_counter()
+    for _ in range(rounds):
+        for q in queries:
+            corrector.correct(q)
+    per_query_us = (time.perf_counter() - t0) / (rounds * len(queries)) * 1e6
+
+    for q in queries:
+        print(f"{q!r:24} -> {corrector.correct(q)!r}")
+    print(f"{per_query_us:.1f} µs / query ({len(corrector)} từ trong từ điển)")
@@ -0,0 +1,18 @@
+import re
+import unicodedata
+
+def fold_vietnamese(text):
+    """
+    Chuẩn hóa chuỗi tiếng Việt để so khớp không dấu (tương đương unaccent(lower(...)) trên Postgres).
+    VD: "Bún Chả Đặc Biệt" -> "bun cha dac biet"
+    """
+    if not text:
+        return ""
+    text = text.lower().replace("đ", "d")
+    text = unicodedata.normalize("NFD", text)
+    text = "".join(ch for ch in text if unicodedata.category(ch) != "Mn")
+    return unicodedata.normalize("NFC", text)
+
+def tokenize(text):
+    """Tách chuỗi đã chuẩn hóa không dấu thành các từ (chỉ chữ và số)."""
+    return re.findall(r"\w+", fold_vietnamese(text))
@@ -0,0 +1,124 @@
+import threading
+
+from utils.text_normalize import fold_vietnamese
+
+
+def trigrams(text):
+    """Tập các trigram (3 ký tự liên tiếp) của một chuỗi đã chuẩn hóa."""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class TrigramIndex:
+    """
+    Chỉ mục trigram trên tên sản phẩm đã bỏ dấu (đ -> d, bỏ thanh điệu).
+    search(term) cho kết quả giống hệt unaccent(lower(name)) LIKE '%term%':
+      1. Giao các posting list của trigram trong term -> tập ứng viên nhỏ
+      2. Kiểm tra lại bằng phép "in" trên tên đã chuẩn hóa
+    Term ngắn hơn 3 ký tự không có trigram -> quét tuyến tính tên (vẫn trong RAM).
+    """
+
+    def __init__(self, items=()):
+        self._names = {}      # {product_id: tên đã chuẩn hóa}
+        self._postings = {}   # {trigram: set(product_id)}
+        self._lock = threading.Lock()
+        for product_id, name in items:
+            self.add(product_id, name)
+
+    def __len__(self):
+        return len(self._names)
+
+    def add(self, product_id, name):
+        folded = fold_vietnamese(name)
+        with self._lock:
+            if product_id in self._names:
+                self._remove_locked(product_id)
+            self._names[product_id] = folded
+            for gram in trigrams(folded):
+                self._postings.setdefault(gram, set()).add(product_id)
+
+    def remove(self, product_id):
+        with self._lock:
+            self._remove_locked(product_id)
+
+    def _remove_locked(self, product_id):
+        folded = self._names.pop(product_id, None)
+        if folded is None:
+            return
+        for gram in trigrams(folded):
+            ids = self._postings.get(gram)
+            if ids is not None:
+                ids.discard(product_id)
+                if not ids:
+                    del self._postings[gram]
+
+    def search(self, term):
+        """Trả về set product_id có tên chứa term (không phân biệt dấu, hoa/thường)."""
+        term = fold_vietnamese(term)
+        with self._lock:
+            grams = trigrams(term)
+            if not grams:
+                return {pid for pid, name in self._names.items() if term in name}
+
+            postings = []
+            for gram in grams:
+                ids = self._postings.get(gram)
+                if not ids:
+                    return set()
+                postings.append(ids)
+
+            postings.sort(key=len)
+            candidates = set(postings[0])
+            for ids in postings[1:]:
+                candidates &= ids
+                if not candidates:
+                    return candidates
+
+            names = self._names
+            return {pid for pid in candidates if term in names[pid]}
+
+    def search_any(self, terms):
+        """Hợp kết quả của nhiều term (tương đương nhiều điều kiện LIKE nối bằng OR)."""
+        result = set()
+        for term in terms:
+            result |= self.search(term)
+        return result
+
+
+# Benchmark: chạy từ thư mục api/ bằng `python -m utils.trigram_index`
+if __name__ == "__main__":
+    import random
+    import time
+
+    WORDS = ["bún", "chả", "phở", "bò", "cơm", "tấm", "gà", "xối", "mỡ", "trà", "sữa",
+             "trân", "châu", "bánh", "mì", "đặc", "biệt", "huế", "nướng", "chiên",
+             "đậu", "phụ", "gỏi", "cuốn", "lẩu", "thái", "hải", "sản", "nem", "rán"]
+    QUERIES = ["bun cha", "Phở bò", "com", "tra sua tran chau", "đậu phụ chiên", "lau thai hai"]
+
+    def like_scan(names, term):
+        # Mô phỏng Postgres: unaccent(lower(name)) cho TỪNG dòng rồi LIKE '%term%'
+        term = fold_vietnamese(term)
+        return {pid for pid, name in names if term in fold_vietnamese(name)}
+
+    for size in (10_000, 100_000):
+        rnd = random.Random(size)
+        names = [(pid, " ".join(rnd.choice(WORDS) for _ in range(rnd.randint(2, 5))).capitalize())
+                 for pid in range(1, size + 1)]
+
+        t0 = time.perf_counter()
+        index = TrigramIndex(names)
+        build_ms = (time.perf_counter() - t0) * 1000
+
+        like_total = index_total = 0.0
+        for q in QUERIES:
+            t0 = time.perf_counter()
+            expected = like_scan(names, q)
+            like_total += time.perf_counter() - t0
+
+            t0 = time.perf_counter()
+            got = index.search(q)
+            index_total += time.perf_counter() - t0
+            assert got == expected, q
+
+        n = len(QUERIES)
+        print(f"{size:>7} sản phẩm | build {build_ms:8.1f} ms | LIKE scan {like_total / n * 1000:8.2f} ms/query"
+              f" | trigram {index_total / n * 1000:8.3f} ms/query")
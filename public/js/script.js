@@ -39,9 +39,8 @@ async function fetchSuggestions(query) {
 	}
 
 	try {
-		// Giả lập gọi API gợi ý tìm kiếm (chỉ lấy 5 sản phẩm đầu tiên)
-		// CẦN THAY THẾ bằng API thật khi triển khai
-		const res = await fetch(`/api/products?search=${encodeURIComponent(query)}&limit=5`);
+		// API gợi ý theo tiền tố (đọc từ RAM, không chạy truy vấn tìm kiếm đầy đủ)
+		const res = await fetch(`/api/products/suggest?q=${encodeURIComponent(query)}&limit=5`);
 		const suggestions = await res.json();
 
 		renderSuggestions(suggestions, query);
@@ -114,19 +113,18 @@ function navigateToProductSummary(productId) {
 }
 // --------------------------------------------------------------------------
 
+// Trang tiếp theo của lần tìm kiếm hiện tại (server trả 50 sản phẩm / trang, cursor ở header X-Next-Cursor)
+let productQuery = null;   // {search, distance, price} của lần tìm gần nhất
+let nextCursor = null;     // null = đã hết dữ liệu
+
 // Load sản phẩm từ API với 3 tham số lọc
 async function loadProducts(search = '', distance = '', price = '') {
-	try {
-		// Gọi API kèm query filter
-		// CẦN THAY THẾ bằng API thật khi triển khai
-		const res = await fetch(`/api/products?search=${encodeURIComponent(search)}&distance=${distance}&price=${price}`);
-
-		// Kết quả JSON chứa danh sách sản phẩm
-		PRODUCTS = await res.json();
-
-		// Render lên giao diện
-		renderProducts();
+	productQuery = {search, distance, price};
+	nextCursor = null;
+	PRODUCTS = [];
 
+	try {
+		await fetchProductPage();
 	} catch (err) {
 		console.error("Lỗi khi load sản phẩm:", err);
 
@@ -135,6 +133,54 @@ async function loadProducts(search = '', distance = '', price = '') {
 	}
 }
 
+// Lấy 1 trang của lần tìm hiện tại (cursor = null → trang đầu) rồi nối vào PRODUCTS
+async function fetchProductPage(cursor = null) {
+	const {search, distance, price} = productQuery;
+	let url = `/api/products?search=${encodeURIComponent(search)}&distance=${distance}&price=${price}`;
+	if (cursor) url += `&cursor=${encodeURIComponent(cursor)}`;
+
+	const res = await fetch(url);
+	if (!res.ok) throw new Error(`HTTP ${res.status}`);
+
+	// Kết quả JSON chứa danh sách sản phẩm của trang này
+	PRODUCTS = PRODUCTS.concat(await res.json());
+	nextCursor = res.headers.get('X-Next-Cursor');
+
+	// Render lên giao diện
+	renderProducts();
+	updateLoadMoreButton();
+}
+
+// Nút "Xem thêm": tải trang kế tiếp
+async function loadMoreProducts() {
+	if (!productQuery || !nextCursor) return;
+
+	const button = $('#load-more-products');
+	button.disabled = true;
+	try {
+		await fetchProductPage(nextCursor);
+	} catch (err) {
+		console.error("Lỗi khi tải thêm sản phẩm:", err);
+		button.disabled = false;
+	}
+}
+
+function updateLoadMoreButton() {
+	let button = $('#load-more-products');
+	if (!button) {
+		const wrap = $('#product-list');
+		if (!wrap) return;
+		button = document.createElement('button');
+		button.id = 'load-more-products';
+		button.textContent = 'Xem thêm';
+		button.style.cssText = 'display:none; margin:20px auto; padding:10px 24px; border:none; border-radius:8px; background:#1867f8; color:white; cursor:pointer;';
+		button.addEventListener('click', loadMoreProducts);
+		wrap.insertAdjacentElement('afterend', button);
+	}
+	button.disabled = false;
+	button.style.display = nextCursor ? 'block' : 'none';
+}
+
 // Render danh sách sản phẩm theo cấu trúc mới: HIỂN THỊ KHOẢNG GIÁ
 function renderProducts() {
 	const wrap = $('#product-list');
@@ -725,8 +771,13 @@ async function searchWithImage() {
 			// QUAN TRỌNG: Cập nhật danh sách sản phẩm TOÀN CỤC
 			PRODUCTS = data.products || [];
 
+			// Trang tiếp theo: /api/products với từ khóa nhận diện được
+			productQuery = {search : data.search_term || '', distance : '', price : ''};
+			nextCursor = data.next_cursor || null;
+
 			// Render lại sản phẩm với kết quả mới
 			renderProducts();
+			updateLoadMoreButton();
 
 			// Cập nhật search input với từ khóa tìm được
 			const searchInput = document.getElementById('search_input');
@@ -746,7 +797,9 @@ async function searchWithImage() {
 			showError(`❌ ${data.message}`);
 			// Hiển thị danh sách rỗng
 			PRODUCTS = [];
+			nextCursor = null;
 			renderProducts();
+			updateLoadMoreButton();
 		} else {
 			showError(`❌ Lỗi: ${data.message}`);
 		}